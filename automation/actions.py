@@ -0,0 +1,245 @@
+"""
+Click sinks and the action executor.
+
+Runners decide on the analysis thread and hand clicks to an ActionExecutor,
+which performs them on its own thread so a slow mouse (or pyautogui's
+pauses) never holds up analysis.
+"""
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from utils.latency import percentile_line
+
+DEFAULT_COOLDOWN = 1.0  # seconds between clicks on one target unless told otherwise
+
+
+# -------------------------------
+# Click sinks
+# -------------------------------
+class ClickSink:
+    """
+    Where the runners send clicks. Every click is recorded with the delay
+    from the capture of the frame that caused it (frame.timestamp).
+    """
+
+    def __init__(self):
+        self.clicks = []  # {"x", "y", "reason", "frame_id", "latency"}
+
+    def click(self, x, y, frame=None, reason=""):
+        self._click(int(x), int(y))
+        latency = time.perf_counter() - frame.timestamp if frame is not None else None
+        self.clicks.append({"x": int(x), "y": int(y), "reason": reason,
+                            "frame_id": frame.frame_id if frame is not None else None,
+                            "latency": latency})
+
+    def _click(self, x, y):
+        raise NotImplementedError
+
+    def stop_requested(self):
+        """True when the user asked the runner to stop (emergency key)."""
+        return False
+
+    def close(self):
+        pass
+
+
+class PyAutoGuiClickSink(ClickSink):
+    """
+    Real mouse clicks; with enabled=False clicks are only recorded.
+
+    The emergency stop key is watched by a pynput keyboard listener, which
+    latches a flag when the key goes down: stop_requested() is a flag read,
+    and a press between two checks is not missed.
+    """
+
+    def __init__(self, enabled=True, stop_key="esc"):
+        super().__init__()
+        # imported here: pyautogui needs a display
+        import pyautogui
+        pyautogui.PAUSE = 0  # its default 0.1 s sleep after every call blocks the executor
+        self.pyautogui = pyautogui
+        self.enabled = enabled
+        self.stop_key = stop_key
+        self._stop_pressed = threading.Event()
+        self._listener = self._listen(stop_key) if stop_key else None
+
+    def _listen(self, stop_key):
+        try:
+            from pynput import keyboard
+        except ImportError:
+            print(f"⚠️ pynput not installed; emergency stop key '{stop_key}' is disabled")
+            return None
+
+        key = getattr(keyboard.Key, stop_key, None) or keyboard.KeyCode.from_char(stop_key)
+
+        def on_press(pressed):
+            if pressed == key:
+                self._stop_pressed.set()
+
+        listener = keyboard.Listener(on_press=on_press)
+        listener.daemon = True
+        listener.start()
+        return listener
+
+    def _click(self, x, y):
+        if self.enabled:
+            self.pyautogui.click(x, y)
+
+    def stop_requested(self):
+        return self._stop_pressed.is_set()
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+
+class NullClickSink(ClickSink):
+    """Records intended clicks without touching the mouse (replays, CI)."""
+
+    def _click(self, x, y):
+        pass
+
+
+# -------------------------------
+# Action executor
+# -------------------------------
+class ClickAction:
+    def __init__(self, target, x, y, frame=None, reason="", cooldown=DEFAULT_COOLDOWN,
+                 box=None, on_done=None):
+        self.target = target      # coalescing / cooldown key, usually the region name
+        self.x, self.y = x, y
+        self.frame = frame
+        self.reason = reason
+        self.cooldown = cooldown
+        self.box = box            # (x, y, w, h) to pick a random point in (random_inset)
+        self.on_done = on_done    # called with the perf_counter after the click
+        self.queued = time.perf_counter()
+
+    def point(self, rng):
+        if self.box is None:
+            return self.x, self.y
+        # x / y hold the box center plus the click offset
+        bx, by, bw, bh = self.box
+        ox, oy = self.x - (bx + bw // 2), self.y - (by + bh // 2)
+        return bx + rng.randrange(bw) + ox, by + rng.randrange(bh) + oy
+
+
+class ActionExecutor:
+    """
+    Performs clicks on a dedicated thread.
+
+    submit() queues a click and returns at once. The queue holds at most one
+    click per target: a click for a target that is already waiting
+    replaces its position (coalesced) and keeps its place. A click within
+    its cooldown of the last executed click on the same target is dropped
+    (debounced), both when submitted and when its turn comes. stop()
+    drops everything pending and refuses new clicks; the sink's emergency
+    key is checked before every click.
+
+    summary() reports the queue delay (submit to start) and execution time
+    of the clicks.
+    """
+
+    def __init__(self, sink, rng=None):
+        self.sink = sink
+        self.rng = rng or random.Random()
+        self.pending = OrderedDict()  # target -> ClickAction
+        self.last_click = {}          # target -> perf_counter of the last executed click
+        self.stopped = False
+        self.queue_delays = []
+        self.exec_times = []
+        self.counts = {"submitted": 0, "executed": 0, "coalesced": 0, "debounced": 0, "cancelled": 0}
+        self._cond = threading.Condition()
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name="actions", daemon=True)
+        self._thread.start()
+
+    # ---------------- Analysis thread ----------------
+
+    def submit(self, action):
+        """Queue a ClickAction; False if it was refused (stopped or debounced)."""
+        with self._cond:
+            self.counts["submitted"] += 1
+            if self.stopped:
+                self.counts["cancelled"] += 1
+                return False
+            if self._cooling(action, time.perf_counter()):
+                self.counts["debounced"] += 1
+                return False
+            waiting = self.pending.get(action.target)
+            if waiting is not None:
+                action.queued = waiting.queued  # delay counts from the first request
+                self.counts["coalesced"] += 1
+            self.pending[action.target] = action  # replacing keeps the queue position
+            self._cond.notify()
+        return True
+
+    def cancel(self, prefix=""):
+        """Drop pending clicks whose target starts with prefix (all by default)."""
+        with self._cond:
+            for target in [t for t in self.pending if t.startswith(prefix)]:
+                del self.pending[target]
+                self.counts["cancelled"] += 1
+
+    def stop(self):
+        """A stop action: nothing pending or submitted later is clicked."""
+        with self._cond:
+            self.stopped = True
+        self.cancel()
+
+    def close(self, wait=True):
+        """Finish the pending clicks (wait=True) or drop them, then end the thread."""
+        if not wait:
+            self.cancel()
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        self._thread.join()
+
+    # ---------------- Executor thread ----------------
+
+    def _cooling(self, action, now):
+        last = self.last_click.get(action.target)
+        return last is not None and now - last < action.cooldown
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self.pending and not self._closing:
+                    self._cond.wait()
+                if not self.pending:
+                    return
+                _, action = self.pending.popitem(last=False)
+                if self.stopped:
+                    continue
+                start = time.perf_counter()
+                if self._cooling(action, start):
+                    self.counts["debounced"] += 1
+                    continue
+                self.last_click[action.target] = start
+
+            if self.sink.stop_requested():
+                self.stop()
+                continue
+            x, y = action.point(self.rng)
+            self.sink.click(x, y, action.frame, action.reason)
+            done = time.perf_counter()
+            self.queue_delays.append(start - action.queued)
+            self.exec_times.append(done - start)
+            self.counts["executed"] += 1
+            if action.on_done is not None:
+                action.on_done(done)
+
+    # ---------------- Reporting ----------------
+
+    def summary(self):
+        c = self.counts
+        return "\n".join([
+            f"Actions: {c['executed']} executed of {c['submitted']} submitted, "
+            f"{c['coalesced']} coalesced, {c['debounced']} debounced, {c['cancelled']} cancelled",
+            "  " + percentile_line("queue delay", self.queue_delays),
+            "  " + percentile_line("execution", self.exec_times),
+        ])
@@ -0,0 +1,171 @@
+"""
+Capture backends.
+
+Every backend exposes `monitor` ({"left", "top", "width", "height"}) and
+grab_frame(rect=None) -> Frame, with rect relative to the monitor as in
+ScreenCapture. grab_frame returns None once a finite source is exhausted.
+
+ReplayCapture plays a recorded run folder (debug_runs/run_*) back as if it
+were the screen, so the live loop can be run and benchmarked without a
+display:
+  * realtime: the frame shown at any moment is the one recorded at that
+    offset into the run (frames.jsonl timestamps, or the recorder's fps),
+    so a slow loop drops frames just like it would live;
+  * fast: every frame in order, as fast as the loop takes them, with the
+    next frame decoded in the background.
+"""
+import bisect
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+
+from capture.frame import Frame, FrameBuffers
+
+TIMESTAMPS_NAME = "frames.jsonl"  # {"frame": "000001.png", "t": seconds since start}
+DEFAULT_FPS = 5
+
+
+class CaptureBackend:
+    """
+    Interface shared by ScreenCapture and ReplayCapture. Frames are
+    stamped with next_frame_id() and the perf_counter() before the grab.
+    """
+
+    monitor = None
+    captured = 0
+
+    def next_frame_id(self):
+        self.captured += 1
+        return self.captured
+
+    def grab_frame(self, rect=None):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def open_capture(monitor=1, replay=None, realtime=True):
+    """A ReplayCapture for `replay` (a run folder), else the screen."""
+    if replay is not None:
+        return ReplayCapture(replay, realtime=realtime)
+    # imported here so replays work without mss / a display
+    from capture.screen_capture import ScreenCapture
+    return ScreenCapture(monitor=monitor)
+
+
+# -------------------------------
+# Replay
+# -------------------------------
+def load_timestamps(run_dir, frames):
+    """
+    Recorded offsets (seconds) of `frames`, from frames.jsonl when the
+    recorder wrote one, else evenly spaced at meta.json's fps.
+    """
+    run_dir = Path(run_dir)
+    stamps = {}
+    path = run_dir / TIMESTAMPS_NAME
+    if path.exists():
+        with open(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    rec = json.loads(line)
+                    stamps[rec["frame"]] = float(rec["t"])
+
+    fps = DEFAULT_FPS
+    meta = run_dir / "meta.json"
+    if meta.exists():
+        fps = json.loads(meta.read_text()).get("fps") or DEFAULT_FPS
+
+    times, last = [], -1.0
+    for i, p in enumerate(frames):
+        t = stamps.get(p.name, i / fps)
+        last = max(t, last)  # keep the timeline monotonic
+        times.append(last)
+    return times
+
+
+class ReplayCapture(CaptureBackend):
+    def __init__(self, run_dir, realtime=True, loop=False):
+        self.run_dir = Path(run_dir)
+        self.frames = sorted(self.run_dir.glob("frames/*.png"))
+        if not self.frames:
+            raise FileNotFoundError(f"No frames in {self.run_dir / 'frames'}")
+        self.times = load_timestamps(self.run_dir, self.frames)
+        # the last frame stays up for one more frame interval
+        gap = self.times[-1] - self.times[-2] if len(self.times) > 1 else 1.0 / DEFAULT_FPS
+        self.end = self.times[-1] + gap
+        self.realtime = realtime
+        self.loop = loop
+
+        first = cv2.imread(str(self.frames[0]))
+        if first is None:
+            raise ValueError(f"Could not read {self.frames[0]}")
+        h, w = first.shape[:2]
+        self.monitor = {"left": 0, "top": 0, "width": w, "height": h}
+        self.buffers = FrameBuffers()
+
+        self.position = -1       # index of the frame last returned
+        self.delivered = 0
+        self._started = None
+        self._cached = (0, first)
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="replay")
+        self._prefetch = None    # (index, future)
+
+    @property
+    def duration(self):
+        return self.end - self.times[0]
+
+    def _next_index(self):
+        if not self.realtime:
+            return self.position + 1
+        now = time.perf_counter()
+        if self._started is None:
+            self._started = now
+        offset = self.times[0] + now - self._started
+        if self.loop and self.duration > 0:
+            offset = self.times[0] + (offset - self.times[0]) % self.duration
+        if offset >= self.end:
+            return len(self.frames)
+        return max(bisect.bisect_right(self.times, offset) - 1, 0)
+
+    def _decode(self, index):
+        if self._cached[0] == index:
+            return self._cached[1]
+        if self._prefetch and self._prefetch[0] == index:
+            img = self._prefetch[1].result()
+        else:
+            img = cv2.imread(str(self.frames[index]))
+        self._prefetch = None
+        if img is None:
+            raise ValueError(f"Could not read {self.frames[index]}")
+        self._cached = (index, img)
+        return img
+
+    def grab_frame(self, rect=None):
+        t = time.perf_counter()
+        index = self._next_index()
+        if index >= len(self.frames):
+            if not self.loop:
+                return None
+            index = 0
+        img = self._decode(index)
+        self.position = index
+        self.delivered += 1
+
+        if not self.realtime and index + 1 < len(self.frames):
+            nxt = index + 1
+            self._prefetch = (nxt, self._pool.submit(cv2.imread, str(self.frames[nxt])))
+
+        origin = (0, 0)
+        if rect is not None:
+            x, y, w, h = rect
+            img = img[y:y + h, x:x + w]
+            origin = (x, y)
+        return Frame.from_bgr(img, self.buffers, origin, t, self.next_frame_id())
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,167 @@
+import time
+
+import numpy as np
+import cv2
+
+# Tile edge (px) used to track which parts of a frame were already converted.
+TILE = 64
+
+
+# -------------------------------
+# Reusable output planes
+# -------------------------------
+class FrameBuffers:
+    """
+    Preallocated BGR / gray planes shared by consecutive frames.
+
+    Buffers are (re)allocated only when the capture size changes, so in the
+    steady state a tick does not allocate any full-frame arrays.
+    Views handed out by a Frame stay valid until the next frame is built on
+    the same buffers.
+    """
+
+    def __init__(self, tile=TILE):
+        self.tile = tile
+        self.shape = None
+        self.bgr = None
+        self.gray = None
+        self.bgr_done = None
+        self.gray_done = None
+
+    def acquire(self, h, w):
+        if self.shape != (h, w):
+            ty = (h + self.tile - 1) // self.tile
+            tx = (w + self.tile - 1) // self.tile
+            self.bgr = np.empty((h, w, 3), dtype=np.uint8)
+            self.gray = np.empty((h, w), dtype=np.uint8)
+            self.bgr_done = np.zeros((ty, tx), dtype=bool)
+            self.gray_done = np.zeros((ty, tx), dtype=bool)
+            self.shape = (h, w)
+        else:
+            self.bgr_done.fill(False)
+            self.gray_done.fill(False)
+        return self
+
+
+# -------------------------------
+# Frame
+# -------------------------------
+class Frame:
+    """
+    A single captured frame with lazily converted color planes.
+
+    `source` is either the raw BGRA capture (wrapped, not copied) or an
+    already decoded BGR image. BGR and gray are only computed for the tiles
+    covered by the rects analyzers ask for, and each tile is converted at
+    most once per frame.
+
+    `origin` is the (x, y) of the source's top-left pixel in region
+    coordinates, for captures that only grab part of the screen. Rects
+    passed to bgr() / gray() are always in region coordinates.
+
+    `timestamp` is the time.perf_counter() at capture and `frame_id` the
+    capture's running frame number, for latency tracing (utils.latency).
+    """
+
+    def __init__(self, source, buffers=None, origin=(0, 0), timestamp=None, frame_id=None):
+        if source.ndim != 3 or source.shape[2] not in (3, 4):
+            raise ValueError(f"Expected a BGR or BGRA image, got shape {source.shape}")
+
+        self.source = source
+        self.origin = (int(origin[0]), int(origin[1]))
+        self.timestamp = time.perf_counter() if timestamp is None else timestamp
+        self.frame_id = frame_id
+        self.is_bgra = source.shape[2] == 4
+        self.height, self.width = source.shape[:2]
+        self.buffers = (buffers or FrameBuffers()).acquire(self.height, self.width)
+
+    @classmethod
+    def from_bgra(cls, raw, buffers=None, origin=(0, 0), timestamp=None, frame_id=None):
+        return cls(raw, buffers, origin, timestamp, frame_id)
+
+    @classmethod
+    def from_bgr(cls, img, buffers=None, origin=(0, 0), timestamp=None, frame_id=None):
+        return cls(img, buffers, origin, timestamp, frame_id)
+
+    @property
+    def shape(self):
+        return (self.height, self.width)
+
+    # ---------------- Public API ----------------
+
+    def bgr(self, rect=None):
+        """
+        Return a BGR view of `rect` ([x, y, w, h], clipped to the frame).
+        The whole frame is returned when rect is None.
+        """
+        bounds = self._clip(rect)
+        if bounds is None:
+            return self._empty(3)
+
+        x0, y0, x1, y1 = bounds
+        if not self.is_bgra:
+            return self.source[y0:y1, x0:x1]
+
+        self._convert(bounds, self.buffers.bgr, self.buffers.bgr_done,
+                      cv2.COLOR_BGRA2BGR)
+        return self.buffers.bgr[y0:y1, x0:x1]
+
+    def gray(self, rect=None):
+        """
+        Return a grayscale view of `rect` ([x, y, w, h], clipped to the frame).
+        """
+        bounds = self._clip(rect)
+        if bounds is None:
+            return self._empty(None)
+
+        x0, y0, x1, y1 = bounds
+        code = cv2.COLOR_BGRA2GRAY if self.is_bgra else cv2.COLOR_BGR2GRAY
+        self._convert(bounds, self.buffers.gray, self.buffers.gray_done, code)
+        return self.buffers.gray[y0:y1, x0:x1]
+
+    # ---------------- Internals ----------------
+
+    def _clip(self, rect):
+        if rect is None:
+            return 0, 0, self.width, self.height
+
+        x, y, w, h = (int(v) for v in rect)
+        x -= self.origin[0]
+        y -= self.origin[1]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, self.width), min(y + h, self.height)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return x0, y0, x1, y1
+
+    def _empty(self, channels):
+        shape = (0, 0) if channels is None else (0, 0, channels)
+        return np.empty(shape, dtype=np.uint8)
+
+    def _convert(self, bounds, dst, done, code):
+        """
+        Convert every not-yet-converted tile touched by `bounds` into `dst`.
+        Consecutive pending tiles in a tile row are converted in one call.
+        """
+        tile = self.buffers.tile
+        x0, y0, x1, y1 = bounds
+        tx0, ty0 = x0 // tile, y0 // tile
+        tx1, ty1 = (x1 - 1) // tile + 1, (y1 - 1) // tile + 1
+
+        pending = ~done[ty0:ty1, tx0:tx1]
+        if not pending.any():
+            return
+
+        for row in np.flatnonzero(pending.any(axis=1)):
+            ty = ty0 + row
+            cols = pending[row]
+            # start / end columns of each run of pending tiles
+            edges = np.flatnonzero(np.diff(np.concatenate(([0], cols.view(np.int8), [0]))))
+            py0 = ty * tile
+            py1 = min(py0 + tile, self.height)
+            for start, end in zip(edges[::2], edges[1::2]):
+                px0 = (tx0 + start) * tile
+                px1 = min((tx0 + end) * tile, self.width)
+                cv2.cvtColor(self.source[py0:py1, px0:px1], code,
+                             dst=dst[py0:py1, px0:px1])
+            done[ty, tx0:tx1] |= cols
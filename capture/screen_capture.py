@@ -1,16 +1,58 @@
+import time
+
 import mss
 import numpy as np
 import cv2
 
-class ScreenCapture:
+from capture.backends import CaptureBackend
+from capture.frame import Frame, FrameBuffers
+
+class ScreenCapture(CaptureBackend):
     def __init__(self, monitor=1):
+        """
+        monitor: mss monitor index, or a window rect given as
+        {"left", "top", "width", "height"} in desktop coordinates.
+        """
         self.sct = mss.mss()
-        self.monitor = self.sct.monitors[monitor]
+        if isinstance(monitor, dict):
+            self.monitor = dict(monitor)
+        else:
+            self.monitor = self.sct.monitors[monitor]
+        self.buffers = FrameBuffers()
 
     def grab(self):
         img = np.array(self.sct.grab(self.monitor))
         return cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
 
+    def grab_frame(self, rect=None):
+        """
+        Grab the monitor as a Frame wrapping the raw BGRA bytes (no copy).
+        Color conversion reuses this capture's buffers across calls.
+
+        rect ([x, y, w, h] relative to the monitor, e.g. a capture plan from
+        RegionTable.bounding_rect) limits the grab to that area; the Frame
+        keeps monitor coordinates.
+        """
+        monitor = self.monitor
+        origin = (0, 0)
+        if rect is not None:
+            x, y, w, h = rect
+            monitor = {
+                "left": self.monitor["left"] + x,
+                "top": self.monitor["top"] + y,
+                "width": w,
+                "height": h,
+            }
+            origin = (x, y)
+
+        t = time.perf_counter()
+        shot = self.sct.grab(monitor)
+        raw = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+        return Frame.from_bgra(raw, self.buffers, origin, t, self.next_frame_id())
+
+    def close(self):
+        self.sct.close()
+
     def grab_region(self, region):
         monitor = {
             "top": region["y"],
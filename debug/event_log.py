@@ -0,0 +1,388 @@
+"""
+Append-only binary event log for runs.
+
+One fixed-width record per region per frame, stored next to the frames:
+
+    events.bin      16-byte header + EVENT_DTYPE records, frames ascending
+    events.strings  region names, one per line; a record's `region` is the
+                    line number
+    events.idx      INDEX_DTYPE entries: (frame, first record, count), one
+                    per write_frame() call
+
+Readers memory-map events.bin, so opening a log is instant and a frame
+range query only touches the pages it needs. If events.idx lags behind the
+records (e.g. the writer was killed) it is rebuilt from the frame column.
+
+events.jsonl (the replay viewer's original format) converts both ways with
+import_jsonl() / EventLog.to_jsonl().
+
+    python -m debug.event_log import <run_dir>
+    python -m debug.event_log export <run_dir> [out.jsonl]
+"""
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+MAGIC = b"UVEVLOG1"
+HEADER_SIZE = 16
+
+EVENT_DTYPE = np.dtype([
+    ("frame", "<u4"),
+    ("time", "<f8"),
+    ("region", "<u2"),
+    ("template_conf", "<f4"),
+    ("ocr_conf", "<f4"),
+    ("hybrid_conf", "<f4"),
+    ("loc_x", "<i4"),          # template match offset in the region, -1 if none
+    ("loc_y", "<i4"),
+    ("found", "u1"),           # template found
+    ("ocr_valid", "u1"),
+    ("decision", "u1"),        # final_decision
+])
+
+INDEX_DTYPE = np.dtype([
+    ("frame", "<u4"),
+    ("start", "<u8"),
+    ("count", "<u4"),
+])
+
+LOG_NAME = "events.bin"
+STRINGS_NAME = "events.strings"
+INDEX_NAME = "events.idx"
+
+
+def _header():
+    return MAGIC + np.array([EVENT_DTYPE.itemsize, 0], dtype="<u4").tobytes()
+
+
+# -------------------------------
+# Writer
+# -------------------------------
+class EventLogWriter:
+    """
+    Appends events to a run's log. Frames must be written in ascending
+    order; all events of a frame should go in one write_frame() call.
+    """
+
+    def __init__(self, run_dir):
+        self.run_dir = Path(run_dir)
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        log_path = self.run_dir / LOG_NAME
+
+        self.names = _read_strings(self.run_dir / STRINGS_NAME)
+        self._ids = {n: i for i, n in enumerate(self.names)}
+        self.last_frame = -1
+        index_path = self.run_dir / INDEX_NAME
+        index = np.zeros(0, dtype=INDEX_DTYPE)
+        index_ok = not index_path.exists() or index_path.stat().st_size == 0
+
+        if log_path.exists() and log_path.stat().st_size >= HEADER_SIZE:
+            _check_header(log_path)
+            records = (log_path.stat().st_size - HEADER_SIZE) // EVENT_DTYPE.itemsize
+            if records:
+                existing = EventLog(self.run_dir)
+                self.last_frame = int(existing.records["frame"][-1])
+                index, index_ok = existing.index, not existing.index_rebuilt
+                existing.close()
+            self._log = open(log_path, "r+b")
+            # drop a torn trailing record
+            self._log.truncate(HEADER_SIZE + records * EVENT_DTYPE.itemsize)
+            self._log.seek(0, os.SEEK_END)
+            self.count = records
+        else:
+            self._log = open(log_path, "wb")
+            self._log.write(_header())
+            self.count = 0
+
+        self._strings = open(self.run_dir / STRINGS_NAME, "a", encoding="utf-8")
+        if not index_ok:
+            # lagging or torn index: appending to it would leave it out of
+            # step with the records for good, so write the rebuilt one
+            index.tofile(index_path)
+        self._index = open(index_path, "ab")
+
+    def region_id(self, name):
+        rid = self._ids.get(name)
+        if rid is None:
+            rid = len(self.names)
+            self._ids[name] = rid
+            name = str(name).replace("\n", " ")
+            self.names.append(name)
+            self._strings.write(name + "\n")
+            self._strings.flush()
+        return rid
+
+    def write_frame(self, frame, events, t=None):
+        """
+        Append one frame's events. Each event is a dict with region,
+        template_conf, ocr_conf, hybrid_conf, loc (x, y) or None, found,
+        ocr_valid and decision; missing keys default to 0 / False.
+        """
+        if frame < self.last_frame:
+            raise ValueError(f"Frame {frame} written after frame {self.last_frame}")
+        if not events:
+            return
+
+        locs = [e.get("loc") or (-1, -1) for e in events]
+        rec = np.zeros(len(events), dtype=EVENT_DTYPE)
+        rec["frame"] = frame
+        rec["time"] = time.time() if t is None else t
+        rec["region"] = [self.region_id(e["region"]) for e in events]
+        rec["template_conf"] = [e.get("template_conf", 0.0) for e in events]
+        rec["ocr_conf"] = [e.get("ocr_conf", 0.0) for e in events]
+        rec["hybrid_conf"] = [e.get("hybrid_conf", 0.0) for e in events]
+        rec["loc_x"] = [l[0] for l in locs]
+        rec["loc_y"] = [l[1] for l in locs]
+        rec["found"] = [bool(e.get("found", False)) for e in events]
+        rec["ocr_valid"] = [bool(e.get("ocr_valid", False)) for e in events]
+        rec["decision"] = [bool(e.get("decision", False)) for e in events]
+
+        self._log.write(rec.tobytes())
+        self._log.flush()
+        entry = np.array([(frame, self.count, len(rec))], dtype=INDEX_DTYPE)
+        self._index.write(entry.tobytes())
+        self._index.flush()
+        self.count += len(rec)
+        self.last_frame = frame
+
+    def write_regions(self, frame, regions, decisions=None, t=None):
+        """
+        Log main.Region objects after analyze_region(). `decisions` names
+        the regions whose action fired this frame; when it is empty or None
+        each region's decision is region.matched.
+        """
+        if not decisions:
+            decisions = None
+        self.write_frame(frame, [region_event(r, None if decisions is None else r.name in decisions)
+                                 for r in regions], t)
+
+    def close(self):
+        for f in (self._log, self._strings, self._index):
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def region_event(region, decision=None):
+    """Event dict for an analyzed main.Region."""
+    return {
+        "region": region.name,
+        "template_conf": region.template_confidence,
+        "ocr_conf": region.ocr_confidence,
+        "hybrid_conf": region.hybrid_confidence,
+        "loc": region.template_match_loc,
+        "found": region.template_match_loc is not None,
+        "ocr_valid": region.type in ("ocr", "hybrid") and region.ocr_confidence > 0,
+        "decision": region.matched if decision is None else decision,
+    }
+
+
+# -------------------------------
+# Reader
+# -------------------------------
+class EventLog:
+    """
+    Memory-mapped view of a run's event log.
+
+    `records` is the full structured array (nothing is read until it is
+    indexed); range() and get() go through the frame index.
+    """
+
+    def __init__(self, run_dir):
+        self.run_dir = Path(run_dir)
+        log_path = self.run_dir / LOG_NAME
+        _check_header(log_path)
+
+        n = (log_path.stat().st_size - HEADER_SIZE) // EVENT_DTYPE.itemsize
+        self.records = (
+            np.memmap(log_path, dtype=EVENT_DTYPE, mode="r", offset=HEADER_SIZE, shape=(n,))
+            if n else np.zeros(0, dtype=EVENT_DTYPE)
+        )
+        self.names = _read_strings(self.run_dir / STRINGS_NAME)
+        self.index_rebuilt = False
+        self.index = self._load_index()
+
+    @staticmethod
+    def exists(run_dir):
+        return (Path(run_dir) / LOG_NAME).exists()
+
+    def _load_index(self):
+        path = self.run_dir / INDEX_NAME
+        size = path.stat().st_size if path.exists() else 0
+        whole = size // INDEX_DTYPE.itemsize
+        index = np.fromfile(path, dtype=INDEX_DTYPE, count=whole) if whole else np.zeros(0, INDEX_DTYPE)
+        covered = int(index["count"].sum()) if len(index) else 0
+        if covered == len(self.records) and size == whole * INDEX_DTYPE.itemsize:
+            return index
+
+        # index is behind the records (or torn): rebuild from the frame column
+        self.index_rebuilt = True
+        frames = np.asarray(self.records["frame"])
+        starts = np.flatnonzero(np.r_[True, frames[1:] != frames[:-1]]) if len(frames) else []
+        index = np.zeros(len(starts), dtype=INDEX_DTYPE)
+        if len(starts):
+            index["frame"] = frames[starts]
+            index["start"] = starts
+            index["count"] = np.diff(np.r_[starts, len(frames)])
+        return index
+
+    def close(self):
+        mm = getattr(self.records, "_mmap", None)
+        if mm is not None:
+            mm.close()
+        self.records = np.zeros(0, dtype=EVENT_DTYPE)
+
+    # ---------------- Queries ----------------
+
+    def __len__(self):
+        return len(self.records)
+
+    def frames(self):
+        """Distinct frame numbers that have events."""
+        return np.unique(self.index["frame"])
+
+    def range(self, first, last):
+        """Records for frames first..last (inclusive), as a memmap slice."""
+        frames = self.index["frame"]
+        lo = np.searchsorted(frames, first, side="left")
+        hi = np.searchsorted(frames, last, side="right")
+        if hi <= lo:
+            return self.records[:0]
+        start = int(self.index["start"][lo])
+        end = int(self.index["start"][hi - 1] + self.index["count"][hi - 1])
+        return self.records[start:end]
+
+    def next_frame(self, frame, step=1, decision=True):
+        """
+        Next (step=1) or previous (step=-1) frame after `frame` with an
+        event whose decision matches, or None.
+        """
+        if step > 0:
+            rec = self.records[self._start_of(frame + 1):]
+        else:
+            rec = self.records[:self._start_of(frame)]
+        hits = np.flatnonzero(rec["decision"] == decision)
+        if not len(hits):
+            return None
+        return int(rec["frame"][hits[0] if step > 0 else hits[-1]])
+
+    def _start_of(self, frame):
+        lo = np.searchsorted(self.index["frame"], frame, side="left")
+        if lo >= len(self.index):
+            return len(self.records)
+        return int(self.index["start"][lo])
+
+    def get(self, frame, default=None):
+        """Events of one frame as events.jsonl-style dicts."""
+        rec = self.range(frame, frame)
+        if not len(rec):
+            return default
+        return [self.to_dict(r) for r in rec]
+
+    def to_dict(self, r):
+        found = bool(r["found"])
+        return {
+            "frame": int(r["frame"]),
+            "time": float(r["time"]),
+            "region": self.names[int(r["region"])],
+            "template": {
+                "confidence": float(r["template_conf"]),
+                "found": found,
+                "location": [int(r["loc_x"]), int(r["loc_y"])] if found else None,
+            },
+            "ocr_confidence": float(r["ocr_conf"]),
+            "hybrid_confidence": float(r["hybrid_conf"]),
+            "ocr_valid": bool(r["ocr_valid"]),
+            "final_decision": bool(r["decision"]),
+        }
+
+    # ---------------- JSONL bridge ----------------
+
+    def to_jsonl(self, path, chunk=65536):
+        with open(path, "w") as f:
+            for start in range(0, len(self.records), chunk):
+                for r in self.records[start:start + chunk]:
+                    f.write(json.dumps(self.to_dict(r)) + "\n")
+
+
+def import_jsonl(jsonl_path, run_dir):
+    """
+    Convert events.jsonl into a binary log in run_dir. Events are grouped
+    per frame and written in frame order. Returns the number of events.
+    """
+    by_frame = {}
+    with open(jsonl_path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            e = json.loads(line)
+            template = e.get("template") or {}
+            by_frame.setdefault(int(e["frame"]), []).append({
+                "region": e["region"],
+                "template_conf": template.get("confidence", 0.0),
+                "ocr_conf": e.get("ocr_confidence", 0.0),
+                "hybrid_conf": e.get("hybrid_confidence", 0.0),
+                "loc": template.get("location") if template.get("found") else None,
+                "found": template.get("found", False),
+                "ocr_valid": e.get("ocr_valid", False),
+                "decision": e.get("final_decision", False),
+                "time": e.get("time", 0.0),
+            })
+
+    with EventLogWriter(run_dir) as writer:
+        for frame in sorted(by_frame):
+            events = by_frame[frame]
+            writer.write_frame(frame, events, t=events[0]["time"])
+    return sum(len(v) for v in by_frame.values())
+
+
+# -------------------------------
+# Helpers
+# -------------------------------
+def _read_strings(path):
+    if not Path(path).exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f]
+
+
+def _check_header(path):
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+    if header[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not an event log")
+    size = int(np.frombuffer(header[len(MAGIC):len(MAGIC) + 4], dtype="<u4")[0])
+    if size != EVENT_DTYPE.itemsize:
+        raise ValueError(f"{path}: record size {size}, expected {EVENT_DTYPE.itemsize}")
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ("import", "export"):
+        print(__doc__)
+        sys.exit(1)
+
+    run_dir = Path(sys.argv[2])
+    if sys.argv[1] == "import":
+        if EventLog.exists(run_dir):
+            print(f"{run_dir / LOG_NAME} already exists")
+            sys.exit(1)
+        t0 = time.perf_counter()
+        n = import_jsonl(run_dir / "events.jsonl", run_dir)
+        print(f"Imported {n} events in {time.perf_counter() - t0:.2f}s")
+    else:
+        out = Path(sys.argv[3]) if len(sys.argv) > 3 else run_dir / "events.jsonl"
+        log = EventLog(run_dir)
+        log.to_jsonl(out)
+        print(f"Exported {len(log)} events to {out}")
+
+
+if __name__ == "__main__":
+    main()
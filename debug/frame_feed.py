@@ -0,0 +1,229 @@
+"""
+Shared-memory feed of the live runner's frames and analysis results.
+
+The runner owns a ring of SLOTS frame slots in one shared-memory block and
+publishes every captured frame into the next slot, as captured (BGRA from
+the screen, BGR from a replay) so the runner never converts a whole frame
+for it. Observers (the feed viewer, a recorder, ...) attach by name and read
+the newest slot as a read-only numpy view of the shared block, so nothing is
+copied or pickled per frame and no drawing happens in the runner.
+
+Every slot carries a sequence counter used as a seqlock: it is odd while
+the runner writes the slot and even once the slot is complete. A reader
+notes the counter, reads, and checks the counter again; a changed counter
+means the runner lapped the ring and the read must be dropped.
+
+Layout:  HEADER_DTYPE | SLOTS x (SLOT_DTYPE | image bytes | result bytes)
+"""
+import json
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+import cv2
+import numpy as np
+
+FEED_NAME = "ui_vision_feed"
+SLOTS = 4
+MAX_RESULT_BYTES = 64 * 1024
+MAGIC = 0x55495632  # "UIV2"
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "<u4"),
+    ("slots", "<u4"),
+    ("max_w", "<u4"),
+    ("max_h", "<u4"),
+    ("slot_bytes", "<u8"),
+    ("published", "<u8"),     # frames published so far
+])
+
+SLOT_DTYPE = np.dtype([
+    ("seq", "<u8"),           # seqlock: odd while being written
+    ("frame_id", "<u8"),
+    ("time", "<f8"),
+    ("w", "<u4"),
+    ("h", "<u4"),
+    ("channels", "<u4"),      # 3 = BGR, 4 = BGRA
+    ("origin_x", "<i4"),
+    ("origin_y", "<i4"),
+    ("result_bytes", "<u4"),
+])
+
+
+def _align(n, to=64):
+    return (n + to - 1) // to * to
+
+
+def _layout(max_w, max_h):
+    image_bytes = max_w * max_h * 4
+    slot_bytes = _align(SLOT_DTYPE.itemsize) + _align(image_bytes) + MAX_RESULT_BYTES
+    return image_bytes, slot_bytes
+
+
+class _Slot:
+    """Views of one slot inside the shared block."""
+
+    def __init__(self, buf, offset, max_w, max_h):
+        image_bytes, _ = _layout(max_w, max_h)
+        self.meta = np.ndarray((), dtype=SLOT_DTYPE, buffer=buf, offset=offset)
+        image_offset = offset + _align(SLOT_DTYPE.itemsize)
+        self.image = np.ndarray((image_bytes,), dtype=np.uint8, buffer=buf, offset=image_offset)
+        self.results = np.ndarray((MAX_RESULT_BYTES,), dtype=np.uint8, buffer=buf,
+                                  offset=image_offset + _align(image_bytes))
+
+
+# -------------------------------
+# Publisher (runner side)
+# -------------------------------
+class FramePublisher:
+    """
+    Creates the feed and publishes frames into it. Frames larger than
+    max_size are cropped to it; results are a JSON-serializable list.
+    """
+
+    def __init__(self, max_size, name=FEED_NAME, slots=SLOTS):
+        max_w, max_h = int(max_size[0]), int(max_size[1])
+        _, slot_bytes = _layout(max_w, max_h)
+        size = _align(HEADER_DTYPE.itemsize) + slots * slot_bytes
+
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # left behind by a runner that did not shut down cleanly
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        self.header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self.shm.buf)
+        self.header["magic"] = MAGIC
+        self.header["slots"] = slots
+        self.header["max_w"], self.header["max_h"] = max_w, max_h
+        self.header["slot_bytes"] = slot_bytes
+        self.header["published"] = 0
+        self.slots = [
+            _Slot(self.shm.buf, _align(HEADER_DTYPE.itemsize) + i * slot_bytes, max_w, max_h)
+            for i in range(slots)
+        ]
+        self.max_w, self.max_h = max_w, max_h
+        self.frame_id = 0
+
+    def publish(self, image, results=(), origin=(0, 0), t=0.0):
+        """Copy one BGR or BGRA frame (and its results) into the next slot."""
+        h, w = min(image.shape[0], self.max_h), min(image.shape[1], self.max_w)
+        c = image.shape[2]
+        payload = json.dumps(list(results)).encode()
+        if len(payload) > MAX_RESULT_BYTES:
+            payload = b"[]"
+
+        slot = self.slots[self.frame_id % len(self.slots)]
+        meta = slot.meta
+        meta["seq"] += 1  # odd: writing
+        np.copyto(slot.image[:h * w * c].reshape(h, w, c), image[:h, :w])
+        slot.results[:len(payload)] = np.frombuffer(payload, dtype=np.uint8)
+        meta["frame_id"] = self.frame_id
+        meta["time"] = t
+        meta["w"], meta["h"] = w, h
+        meta["channels"] = c
+        meta["origin_x"], meta["origin_y"] = origin
+        meta["result_bytes"] = len(payload)
+        meta["seq"] += 1  # even: complete
+
+        self.frame_id += 1
+        self.header["published"] = self.frame_id
+
+    def close(self):
+        # drop numpy views first, they pin the buffer
+        self.header = None
+        self.slots = []
+        self.shm.close()
+        self.shm.unlink()
+
+
+# -------------------------------
+# Observer side
+# -------------------------------
+class FeedFrame:
+    """
+    One frame read from the feed. `image` is a read-only view into shared
+    memory, BGR or BGRA as the runner captured it (see bgr()); check
+    still_valid() after using it (or copy it) before trusting it.
+    """
+
+    def __init__(self, slot, seq, frame_id, t, image, origin, results):
+        self._slot = slot
+        self._seq = seq
+        self.frame_id = frame_id
+        self.time = t
+        self.image = image
+        self.origin = origin
+        self.results = results
+
+    def still_valid(self):
+        return int(self._slot.meta["seq"]) == self._seq
+
+    def bgr(self):
+        """A BGR copy of image."""
+        if self.image.shape[2] == 4:
+            return cv2.cvtColor(self.image, cv2.COLOR_BGRA2BGR)
+        return self.image.copy()
+
+
+class FrameFeed:
+    """Read-only attachment to a runner's feed."""
+
+    def __init__(self, name=FEED_NAME):
+        self.shm = shared_memory.SharedMemory(name=name)
+        if sys.version_info < (3, 13):
+            # Attaching registers the block with this process's resource
+            # tracker, which would unlink it (under the runner) on exit.
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+
+        # observers only read; views of this buffer cannot be written to
+        self.buf = self.shm.buf.toreadonly()
+        self.header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self.buf)
+        if int(self.header["magic"]) != MAGIC:
+            self.header = None
+            self.buf.release()
+            self.shm.close()
+            raise ValueError(f"Shared memory '{name}' is not a frame feed")
+        max_w, max_h = int(self.header["max_w"]), int(self.header["max_h"])
+        slot_bytes = int(self.header["slot_bytes"])
+        self.slots = [
+            _Slot(self.buf, _align(HEADER_DTYPE.itemsize) + i * slot_bytes, max_w, max_h)
+            for i in range(int(self.header["slots"]))
+        ]
+
+    @property
+    def published(self):
+        return int(self.header["published"])
+
+    def latest(self, after=-1):
+        """
+        Newest complete frame with frame_id > after, or None. The image is
+        not copied.
+        """
+        published = self.published
+        if published == 0 or published - 1 <= after:
+            return None
+
+        for frame_id in range(published - 1, max(after, published - len(self.slots) - 1), -1):
+            slot = self.slots[frame_id % len(self.slots)]
+            seq = int(slot.meta["seq"])
+            if seq % 2 or int(slot.meta["frame_id"]) != frame_id:
+                continue  # being written / already overwritten
+            w, h, c = int(slot.meta["w"]), int(slot.meta["h"]), int(slot.meta["channels"])
+            image = slot.image[:h * w * c].reshape(h, w, c)
+            n = int(slot.meta["result_bytes"])
+            results = json.loads(slot.results[:n].tobytes()) if n else []
+            origin = (int(slot.meta["origin_x"]), int(slot.meta["origin_y"]))
+            t = float(slot.meta["time"])
+            if int(slot.meta["seq"]) != seq:
+                continue  # lapped while reading
+            return FeedFrame(slot, seq, frame_id, t, image, origin, results)
+        return None
+
+    def close(self):
+        self.header = None
+        self.slots = []
+        self.buf.release()
+        self.shm.close()
@@ -1,3 +1,5 @@
+import time
+
 import cv2
 import numpy as np
 
@@ -28,3 +30,187 @@ class DebugOverlay:
         for item in ocr_results:
             pts = [(int(x), int(y)) for x, y in item["box"]]
             cv2.polylines(frame, [np.array(pts)], True, (0, 255, 255), 2)
+
+
+class PreviewOverlay:
+    """
+    Debug preview for the live loop that costs far less than
+    draw_debug_overlay + imshow at full resolution.
+
+    The frame is scaled into a reusable preview buffer (no full-size copy);
+    a BGRA capture is scaled first and only the preview converted to BGR.
+    Region annotations live on a separate layer plus mask of the same size;
+    a region is redrawn on that layer only when what it shows changed
+    (rect, match, displayed confidences, label). Rendering is capped at
+    max_fps independently of the analysis rate, and the time spent is
+    tracked in render_ms / avg_ms.
+    """
+
+    FONT = cv2.FONT_HERSHEY_SIMPLEX
+    INTERPOLATION = cv2.INTER_LINEAR  # INTER_AREA looks nicer but costs ~7x at 4K
+
+    def __init__(self, max_width=1280, max_fps=10.0, click_point=None):
+        self.max_width = max_width
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.click_point = click_point  # region -> (x, y), e.g. main.click_point
+
+        self.scale = 1.0
+        self.base = None   # scaled frame, then composited preview
+        self.scaled = None # scaled BGRA frame, for BGRA sources
+        self.layer = None  # annotations
+        self.mask = None   # where the layer is drawn
+        self._drawn = {}   # region name -> (state, bbox on the layer)
+        self._last = 0.0
+
+        # stats
+        self.render_ms = 0.0
+        self.avg_ms = 0.0
+        self.rendered = 0
+        self.skipped = 0
+        self.redrawn = 0
+
+    # ---------------- Public API ----------------
+
+    def due(self):
+        """
+        Whether the fps cap allows a render now. Check it before preparing
+        the frame to pass to render(); a False counts as a skipped frame.
+        """
+        if time.perf_counter() - self._last >= self.min_interval:
+            return True
+        self.skipped += 1
+        return False
+
+    def render(self, frame, regions, origin=(0, 0), force=False):
+        """
+        Return the preview for this BGR or BGRA frame, or None if the fps
+        cap says to skip it. The returned image is reused by the next call.
+        """
+        if not force and not self.due():
+            return None
+        now = self._last = time.perf_counter()
+
+        self._prepare(frame.shape[:2])
+        size = self.base.shape[1::-1]
+        if frame.shape[2] == 4:
+            cv2.resize(frame, size, dst=self.scaled, interpolation=self.INTERPOLATION)
+            cv2.cvtColor(self.scaled, cv2.COLOR_BGRA2BGR, dst=self.base)
+        else:
+            cv2.resize(frame, size, dst=self.base, interpolation=self.INTERPOLATION)
+
+        self.redrawn = self._update_layer(regions, origin)
+        cv2.copyTo(self.layer, self.mask, self.base)
+
+        self.render_ms = (time.perf_counter() - now) * 1000.0
+        self.avg_ms = self.render_ms if not self.rendered else 0.9 * self.avg_ms + 0.1 * self.render_ms
+        self.rendered += 1
+        return self.base
+
+    def report(self):
+        return (f"Overlay: {self.rendered} rendered, {self.skipped} skipped by fps cap, "
+                f"avg {self.avg_ms:.1f} ms (last {self.render_ms:.1f} ms)")
+
+    # ---------------- Internals ----------------
+
+    def _prepare(self, shape):
+        h, w = shape
+        scale = min(1.0, self.max_width / w)
+        size = (max(int(h * scale), 1), max(int(w * scale), 1))
+        if self.base is None or self.base.shape[:2] != size:
+            self.scale = scale
+            self.base = np.empty(size + (3,), dtype=np.uint8)
+            self.scaled = np.empty(size + (4,), dtype=np.uint8)
+            self.layer = np.zeros(size + (3,), dtype=np.uint8)
+            self.mask = np.zeros(size, dtype=np.uint8)
+            self._drawn = {}
+
+    def _state(self, r, origin):
+        """Everything the annotation of r shows, at display precision."""
+        click = self.click_point(r) if self.click_point and r.click else None
+        return (
+            tuple(r.rect), tuple(origin), r.type, bool(r.matched),
+            round(r.template_confidence, 2), round(r.ocr_confidence, 2),
+            round(r.hybrid_confidence, 2), r.label,
+            r.template_match_loc, r.template_size,
+            tuple(map(tuple, r.template_matches or ())), click,
+        )
+
+    def _update_layer(self, regions, origin):
+        states = {r.name: (r, self._state(r, origin)) for r in regions}
+        dirty = [n for n, (_, st) in states.items()
+                 if n not in self._drawn or self._drawn[n][0] != st]
+        removed = [n for n in self._drawn if n not in states]
+        if not dirty and not removed:
+            return 0
+
+        # clear old annotations; neighbours they overlapped need redrawing
+        cleared = []
+        for n in dirty + removed:
+            if n in self._drawn:
+                bbox = self._drawn.pop(n)[1]
+                self._clear(bbox)
+                cleared.append(bbox)
+        redraw = set(dirty)
+        for n, (_, bbox) in self._drawn.items():
+            if any(_overlaps(bbox, c) for c in cleared):
+                redraw.add(n)
+
+        for n in redraw:
+            r, st = states[n]
+            self._drawn[n] = (st, self._draw(r, origin))
+        return len(redraw)
+
+    def _clear(self, bbox):
+        x0, y0, x1, y1 = bbox
+        self.layer[y0:y1, x0:x1] = 0
+        self.mask[y0:y1, x0:x1] = 0
+
+    def _draw(self, r, origin):
+        """Draw one region on the layer and mask; returns its bbox."""
+        s = self.scale
+        x, y, w, h = r.rect
+        x0, y0 = int((x - origin[0]) * s), int((y - origin[1]) * s)
+        x1, y1 = int((x - origin[0] + w) * s), int((y - origin[1] + h) * s)
+        color = (0, 255, 0) if r.matched else (0, 0, 255)
+        shapes = [("rect", (x0, y0), (x1, y1), color, 1)]
+
+        if r.template_matches and r.template_size:
+            tw, th = r.template_size
+            for mx, my, _ in r.template_matches:
+                p = (x0 + int(mx * s), y0 + int(my * s))
+                shapes.append(("rect", p, (p[0] + int(tw * s), p[1] + int(th * s)), (255, 255, 0), 1))
+
+        if self.click_point and r.click:
+            cx, cy = self.click_point(r)
+            shapes.append(("dot", (int((cx - origin[0]) * s), int((cy - origin[1]) * s)), 3, (255, 0, 0)))
+
+        label = f"{r.name} T:{r.template_confidence:.2f} O:{r.ocr_confidence:.2f}"
+        if r.type == "hybrid":
+            label += f" H:{r.hybrid_confidence:.2f}"
+        elif r.type == "classify":
+            label += f" {r.label}"
+        (tw, th), base = cv2.getTextSize(label, self.FONT, 0.4, 1)
+        ty = max(y0 - 4, th + 1)
+        shapes.append(("text", label, (x0, ty), (0, 255, 255)))
+
+        for target, fill in ((self.layer, None), (self.mask, 255)):
+            for shape in shapes:
+                kind = shape[0]
+                if kind == "rect":
+                    cv2.rectangle(target, shape[1], shape[2], fill or shape[3], shape[4])
+                elif kind == "dot":
+                    cv2.circle(target, shape[1], shape[2], fill or shape[3], -1)
+                else:
+                    cv2.putText(target, shape[1], shape[2], self.FONT, 0.4, fill or shape[3], 1)
+
+        # bbox covering everything drawn, clipped to the layer
+        ph, pw = self.mask.shape
+        bx0 = max(x0 - 4, 0)
+        by0 = max(min(y0, ty - th) - 4, 0)
+        bx1 = min(max(x1, x0 + tw) + 4, pw)
+        by1 = min(max(y1, ty + base) + 4, ph)
+        return bx0, by0, bx1, by1
+
+
+def _overlaps(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
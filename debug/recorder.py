@@ -2,10 +2,11 @@ from pathlib import Path
 from datetime import datetime
 import time
 import cv2
-import numpy as np
-import mss
 import json
 
+from capture.backends import TIMESTAMPS_NAME
+from capture.screen_capture import ScreenCapture
+
 class FrameRecorder:
     def __init__(self, root="debug_runs", fps=5, monitor=2):
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -22,16 +23,20 @@ class FrameRecorder:
         self.fps = fps
         self.monitor = monitor
         self.idx = 0
-        self.sct = mss.mss()
+        self.capture = ScreenCapture(monitor=monitor)
+        self.start = None
+        # capture offsets, so replays can reproduce the recorded timing
+        self.timestamps = open(self.run_dir / TIMESTAMPS_NAME, "w")
 
     def capture_frame(self):
-        monitor = self.sct.monitors[self.monitor]
-        img = np.array(self.sct.grab(monitor))
-        img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+        frame = self.capture.grab_frame()
+        if self.start is None:
+            self.start = frame.timestamp
 
         self.idx += 1
         path = self.frames_dir / f"{self.idx:06d}.png"
-        cv2.imwrite(str(path), img)
+        cv2.imwrite(str(path), frame.bgr())
+        self.timestamps.write(json.dumps({"frame": path.name, "t": round(frame.timestamp - self.start, 4)}) + "\n")
 
     def run(self, duration=None):
         start = time.time()
@@ -45,6 +50,7 @@ class FrameRecorder:
                 if duration and (time.time() - start) > duration:
                     break
         finally:
+            self.timestamps.close()
             self.meta["frames"] = self.idx
             with open(self.run_dir / "meta.json", "w") as f:
                 json.dump(self.meta, f, indent=2)
@@ -4,6 +4,9 @@ import yaml
 import numpy as np
 from pathlib import Path
 
+from debug.event_log import EventLog, import_jsonl
+from utils.ui_classes import class_id as resolve_class, load_classes
+
 CLASS_MAP = {
     ord("1"): 0,  # button
     ord("2"): 1,  # icon
@@ -28,14 +31,17 @@ class ReplayViewer:
         self.playing = False
         self.selected_event_idx = 0
         self.labels_file = open(self.run_dir / "labels.jsonl", "a")
+        self.frame_size = None
 
     def _load_events(self):
-        events = {}
-        with open(self.run_dir / "events.jsonl", "r") as f:
-            for line in f:
-                e = json.loads(line)
-                events.setdefault(e["frame"], []).append(e)
-        return events
+        """
+        Memory-map the run's binary event log; events.jsonl is converted to
+        one the first time a run is opened.
+        """
+        if not EventLog.exists(self.run_dir):
+            n = import_jsonl(self.run_dir / "events.jsonl", self.run_dir)
+            print(f"Converted {n} events from events.jsonl")
+        return EventLog(self.run_dir)
     
     def _load_region_crop(self, region_name):
         path = (
@@ -117,25 +123,39 @@ class ReplayViewer:
 
     def _jump(self, direction=1):
         step = 1 if direction > 0 else -1
-        i = self.idx + step
-        while 0 <= i < len(self.frames):
-            if any(e["final_decision"] for e in self.events.get(i, [])):
-                self.idx = i
+        i = self.events.next_frame(self.idx, step, decision=True)
+        if i is not None and 0 <= i < len(self.frames):
+            self.idx = i
+
+    def export_training_sample(self, event, class_id=None):
+        """
+        Add one box for the event's region to this frame's training sample.
+        The image is written once; boxes accumulate in the label file.
+        Without class_id the region's configured `class` is used.
+        For bulk exports across runs use tools/export_yolo.py.
+        """
+        r = self.regions[event["region"]]
+        if class_id is None:
+            class_id = resolve_class(r.get("class"), load_classes())
+            if class_id is None:
+                print(f"Region {event['region']} has no class; press a class key (0-9) instead")
                 return
-            i += step
 
-    def export_training_sample(self, event, class_id):
         out = self.run_dir / "training_export"
         (out / "images").mkdir(parents=True, exist_ok=True)
         (out / "labels").mkdir(exist_ok=True)
 
-        img = cv2.imread(str(self.frames[self.idx]))
-        h, w, _ = img.shape
-
         img_name = f"frame_{self.idx:06d}.png"
-        cv2.imwrite(str(out / "images" / img_name), img)
+        img_path = out / "images" / img_name
+        if img_path.exists() and self.frame_size is not None:
+            h, w = self.frame_size  # every frame of a run has the same size
+        else:
+            img = cv2.imread(str(self.frames[self.idx]))
+            h, w, _ = img.shape
+            self.frame_size = (h, w)
+            if not img_path.exists():
+                cv2.imwrite(str(img_path), img)
 
-        r = self.regions[event["region"]]
         xc = (r["x"] + r["w"]/2) / w
         yc = (r["y"] + r["h"]/2) / h
         ww = r["w"] / w
@@ -143,8 +163,11 @@ class ReplayViewer:
 
         label = f"{class_id} {xc:.6f} {yc:.6f} {ww:.6f} {hh:.6f}\n"
 
-        with open(out / "labels" / img_name.replace(".png", ".txt"), "w") as f:
-            f.write(label)
+        label_path = out / "labels" / img_name.replace(".png", ".txt")
+        lines = label_path.read_text().splitlines(keepends=True) if label_path.exists() else []
+        if label not in lines:
+            with open(label_path, "a") as f:
+                f.write(label)
 
 
     def run(self):
@@ -1,36 +1,182 @@
 # main.py
+import re
+import threading
+import time
 import cv2
+import yaml
 from pathlib import Path
 import numpy as np
 import easyocr
 
+from capture.frame import Frame
+from utils.geometry import rect_to_list
+from utils.hybrid_eval import aggregate_confidence
+from utils.result_cache import apply_result
+from vision.matcher import find_peaks
+from vision.prefilter import PrefilterCascade, validate_options
+from vision.preprocess import OCRPreprocessor, validate_preprocess
+from vision.text_match import TextMatcher
+from vision.template_cache import TemplateCache
+
+# Confidence a region must reach to count as matched
+MATCH_THRESHOLD = 0.7
+# How hybrid regions combine template and OCR confidence (utils.hybrid_eval)
+HYBRID_AGGREGATE = "mean"
+
 # -------------------------------
 # Region class definition
 # -------------------------------
 class Region:
-    def __init__(self, name, rect, type="template", template_image=None, ocr_text="", click=None, annotation=""):
+    def __init__(self, name, rect, type="template", template_image=None, ocr_text="", click=None, annotation="",
+                 templates=None, find_all=False, max_matches=16, prefilter=False,
+                 threshold=MATCH_THRESHOLD, aggregate=HYBRID_AGGREGATE, ocr_preprocess=None,
+                 ocr_match="contains", ocr_max_edits=0):
         self.name = name
         self.rect = rect  # [x, y, w, h]
-        self.type = type  # template, ocr, hybrid
+        self.type = type  # template, ocr, hybrid, classify
         self.template_image = template_image
-        self.ocr_text = ocr_text
+        self.templates = templates or {}  # classify: {label: template path}
+        self.find_all = find_all  # template: report every occurrence, not just the best
+        self.max_matches = max_matches
+        self.prefilter = prefilter  # run the cheap rejection cascade before matching
+        # true -> {}, or the region's cascade overrides; ValueError if malformed
+        self.prefilter_options = validate_options(prefilter) if prefilter else None
+        self.ocr_text = ocr_text  # expected text: a phrase, a list of phrases, or regexes
+        self.ocr_match = ocr_match  # contains | exact | regex
+        self.ocr_max_edits = ocr_max_edits  # contains / exact: tolerated OCR misreads
+        # compiled once; None means any text counts
+        self.text_matcher = TextMatcher.from_config(ocr_text, ocr_match, ocr_max_edits)
+        self.ocr_preprocess = ocr_preprocess  # dict of vision.preprocess params, or "auto"
+        # normalized dict params, None for "auto" / unset; ValueError if malformed
+        self.ocr_params = validate_preprocess(ocr_preprocess)
         self.click = click  # {"mode": "center", "offset": [0,0]}
         self.annotation = annotation
+        self.threshold = threshold  # confidence needed for region.matched
+        self.aggregate = aggregate  # hybrid: min | mean | product
 
         # runtime confidence
         self.template_confidence = 0.0
         self.ocr_confidence = 0.0
         self.hybrid_confidence = 0.0
         self.matched = False
+        self.stale = False  # result carried over from an earlier frame (utils.frame_budget)
 
         # template match location (offset within ROI)
         self.template_match_loc = None  # (x_offset, y_offset) within the region rect
         self.template_size = None  # (width, height) of matched template
 
+        # find_all: every match above threshold, [(x_offset, y_offset, confidence)]
+        self.template_matches = []
+
+        # classify: best variant label and per-label confidence
+        self.label = None
+        self.label_scores = {}
+
+        # OCR: readtext results [(box, text, confidence)] of the last analysis
+        self.ocr_results = []
+
+# -------------------------------
+# Region loading
+# -------------------------------
+def region_from_dict(r):
+    """
+    Build a Region from one regions.yaml entry; None if its rect is invalid
+    or its expected OCR text does not compile.
+    """
+    rect = rect_to_list(r.get("rect"))
+    if rect is None:
+        return None
+    # nested schema (config/regions.yaml, utils.region_linter.nested_schema):
+    # template: {image, threshold}, ocr: {text, match, max_edits, confidence},
+    # logic: {aggregate}; flat keys win where both are given
+    tmpl, ocr, logic = (r.get(k) if isinstance(r.get(k), dict) else {} for k in ("template", "ocr", "logic"))
+    rtype = r.get("type", "template")
+    threshold = r.get("threshold")
+    if threshold is None:
+        # one threshold per region: the template's, or the OCR's for ocr regions
+        first, second = tmpl.get("threshold"), ocr.get("confidence")
+        if rtype == "ocr":
+            first, second = second, first
+        threshold = first if first is not None else second if second is not None else MATCH_THRESHOLD
+    try:
+        return Region(
+            name=r.get("name"),
+            rect=rect,
+            type=rtype,
+            template_image=r.get("template_image", tmpl.get("image")),
+            ocr_text=r.get("ocr_text", ocr.get("text", "")),
+            click=r.get("click"),
+            annotation=r.get("annotation",""),
+            templates=r.get("templates"),
+            find_all=r.get("find_all", False),
+            max_matches=r.get("max_matches", 16),
+            prefilter=r.get("prefilter", False),
+            threshold=threshold,
+            aggregate=r.get("aggregate", logic.get("aggregate", HYBRID_AGGREGATE)),
+            ocr_preprocess=r.get("ocr_preprocess"),
+            ocr_match=r.get("ocr_match", ocr.get("match", "contains")),
+            ocr_max_edits=r.get("ocr_max_edits", ocr.get("max_edits", 0)),
+        )
+    except (ValueError, re.error) as e:
+        print(f"⚠️ Skipping region {r.get('name')}: {e}")
+        return None
+
+def load_regions_yaml(run_dir):
+    yaml_file = Path(run_dir) / "regions.yaml"
+    regions = []
+    if yaml_file.exists():
+        with open(yaml_file, "r") as f:
+            data = yaml.safe_load(f) or []
+        for r in data:
+            region = region_from_dict(r)
+            if region is None:
+                if rect_to_list(r.get("rect")) is None:
+                    print(f"⚠️ Skipping region {r.get('name')}: invalid rect {r.get('rect')}")
+                continue
+            regions.append(region)
+    else:
+        print(f"⚠️ No regions.yaml found in {run_dir}")
+    return regions
+
+# -------------------------------
+# Shared OCR reader / template cache
+# -------------------------------
+# The EasyOCR model is loaded on first use and shared by every caller in
+# the process (live runner, multi-instance runner, tools).
+_reader = None
+_reader_lock = threading.Lock()
+
+def get_reader():
+    global _reader
+    with _reader_lock:
+        if _reader is None:
+            _reader = easyocr.Reader(["en"], gpu=True)
+    return _reader
+
+templates = TemplateCache()
+
+# Rejection cascade for regions with prefilter enabled; prefilter.stats
+# reports per-stage reject rates and the time saved.
+prefilter = PrefilterCascade()
+
+# Per-region OCR preprocessing (ocr_preprocess in regions.yaml);
+# ocr_preprocessor.stats reports OCR time per region.
+ocr_preprocessor = OCRPreprocessor()
+
 # -------------------------------
-# OCR Reader
+# ROI helper
 # -------------------------------
-reader = easyocr.Reader(["en"], gpu=True)
+def region_roi(frame, rect, gray=False):
+    """
+    Return the ROI for rect from either a Frame or a plain BGR image.
+    Frames convert (and cache) only the requested area.
+    """
+    if isinstance(frame, Frame):
+        return frame.gray(rect) if gray else frame.bgr(rect)
+
+    x, y, w, h = rect
+    roi = frame[y:y+h, x:x+w]
+    return cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if gray else roi
 
 # -------------------------------
 # Template matching helper
@@ -38,61 +184,113 @@ reader = easyocr.Reader(["en"], gpu=True)
 def match_template_region(frame, region, run_dir):
     """
     Return template confidence for a single region.
-    Also updates region.template_match_loc and region.template_size.
+    Also updates region.template_match_loc and region.template_size, and
+    region.template_matches when region.find_all is set.
     """
+    region.template_matches = []
     if not region.template_image:
         return 0.0
 
-    tmpl_path = (Path(run_dir) / region.template_image).resolve()
-    tmpl = cv2.imread(str(tmpl_path), cv2.IMREAD_UNCHANGED)
+    tmpl_path = Path(run_dir) / region.template_image
+    tmpl = templates.get(tmpl_path)
     if tmpl is None:
-        print(f"⚠️ Template not found for region {region.name}: {tmpl_path}")
+        print(f"⚠️ Template not found for region {region.name}: {tmpl_path.resolve()}")
         return 0.0
 
-    x, y, w, h = region.rect
-    roi = frame[y:y+h, x:x+w]
+    # Grayscale for robustness
+    roi_gray = region_roi(frame, region.rect, gray=True)
 
     # ROI must be large enough for template
-    if roi.shape[0] < tmpl.shape[0] or roi.shape[1] < tmpl.shape[1]:
+    if roi_gray.shape[0] < tmpl.gray.shape[0] or roi_gray.shape[1] < tmpl.gray.shape[1]:
         print(f"⚠️ ROI smaller than template for {region.name}")
         return 0.0
 
-    # Grayscale for robustness
-    roi_gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-    tmpl_gray = cv2.cvtColor(tmpl, cv2.COLOR_BGR2GRAY)
+    # Cheap checks first; most of the time the target is simply absent
+    if region.prefilter:
+        # UI Lab regions carry the raw setting only
+        options = getattr(region, "prefilter_options", None)
+        if options is None and isinstance(region.prefilter, dict):
+            options = validate_options(region.prefilter)
+        passed, _ = prefilter.check(tmpl, region_roi(frame, region.rect), roi_gray, options)
+        if not passed:
+            region.template_match_loc = None
+            region.template_size = tmpl.size
+            return 0.0
 
-    res = cv2.matchTemplate(roi_gray, tmpl_gray, cv2.TM_CCOEFF_NORMED)
+    t0 = time.perf_counter()
+    res = cv2.matchTemplate(roi_gray, tmpl.gray, cv2.TM_CCOEFF_NORMED)
     _, max_val, _, max_loc = cv2.minMaxLoc(res)
+    if region.prefilter:
+        prefilter.stats.record_full(time.perf_counter() - t0)
 
     # Store match location and template size
     region.template_match_loc = max_loc  # (x_offset, y_offset) within ROI
-    region.template_size = (tmpl.shape[1], tmpl.shape[0])  # (width, height)
+    region.template_size = tmpl.size  # (width, height)
+
+    # Every occurrence (e.g. each red icon in a list), strongest first
+    if region.find_all:
+        peaks = find_peaks(res, tmpl.size, region.threshold, region.max_matches)
+        region.template_matches = [
+            (p["location"][0], p["location"][1], p["confidence"]) for p in peaks
+        ]
 
     return float(max_val)
 
+# -------------------------------
+# Multi-template classification helper
+# -------------------------------
+def classify_template_region(frame, region, run_dir):
+    """
+    Pick the best of region.templates ({label: path}) in one pass.
+    Updates region.label, region.label_scores, region.template_match_loc
+    and region.template_size; returns the winning confidence.
+    """
+    region.label = None
+    region.label_scores = {}
+    if not region.templates:
+        return 0.0
+
+    bank = templates.bank({
+        label: Path(run_dir) / path for label, path in region.templates.items()
+    })
+    if bank is None:
+        print(f"⚠️ Template not found for region {region.name}")
+        return 0.0
+
+    roi_gray = region_roi(frame, region.rect, gray=True)
+    result = bank.classify(roi_gray)
+    if result is None:
+        print(f"⚠️ ROI smaller than template for {region.name}")
+        return 0.0
+
+    region.label = result["label"]
+    region.label_scores = result["scores"]
+    region.template_match_loc = result["location"]
+    region.template_size = result["size"]
+    return result["confidence"]
+
 # -------------------------------
 # Analyze a single region
 # -------------------------------
-def analyze_region(frame, region, run_dir, ocr_reader=reader):
+def analyze_region(frame, region, run_dir, ocr_reader=None, results=None):
     """
     Compute template, OCR, and hybrid confidence for a region.
+    `frame` may be a capture.frame.Frame or a BGR image.
     Updates region.matched according to thresholds.
+    `results` (utils.result_cache.FrameResults for this frame) is checked
+    first and stores what had to be computed.
     """
-    # Template confidence
-    template_conf = match_template_region(frame, region, run_dir)
-
-    # OCR confidence
-    ocr_conf = 0.0
-    if region.type in ["ocr", "hybrid"]:
-        x, y, w, h = region.rect
-        roi = frame[y:y+h, x:x+w]
-        result = ocr_reader.readtext(roi)
-        ocr_conf = max([conf for _, text, conf in result], default=0.0)
+    cached = results.get(region, run_dir) if results is not None else None
+    if cached is not None:
+        apply_result(region, cached)
+        template_conf, ocr_conf = region.template_confidence, region.ocr_confidence
+    else:
+        template_conf, ocr_conf = _analyze_confidences(frame, region, run_dir, ocr_reader)
 
     # Hybrid
     hybrid_conf = 0.0
     if region.type == "hybrid":
-        hybrid_conf = (template_conf + ocr_conf) / 2.0
+        hybrid_conf = aggregate_confidence([template_conf, ocr_conf], region.aggregate)
 
     # Update region object
     region.template_confidence = template_conf
@@ -100,16 +298,40 @@ def analyze_region(frame, region, run_dir, ocr_reader=reader):
     region.hybrid_confidence = hybrid_conf
 
     # Determine matched status
-    threshold = 0.7
+    threshold = region.threshold
     if region.type == "hybrid":
         region.matched = hybrid_conf >= threshold
     elif region.type == "ocr":
         region.matched = ocr_conf >= threshold
-    elif region.type == "template":
+    elif region.type in ["template", "classify"]:
         region.matched = template_conf >= threshold
 
+    if results is not None and cached is None:
+        results.put(region, run_dir)
     return region.matched
 
+def _analyze_confidences(frame, region, run_dir, ocr_reader=None):
+    """(template, OCR) confidence of a region on frame."""
+    # Template confidence
+    if region.type == "classify":
+        template_conf = classify_template_region(frame, region, run_dir)
+    else:
+        template_conf = match_template_region(frame, region, run_dir)
+
+    # OCR confidence
+    ocr_conf = 0.0
+    region.ocr_results = []
+    if region.type in ["ocr", "hybrid"]:
+        roi = region_roi(frame, region.rect)
+        result = ocr_preprocessor.readtext(ocr_reader or get_reader(), roi, region, run_dir)
+        region.ocr_results = result
+        if region.text_matcher is not None:
+            # only text that matches the expected text counts
+            ocr_conf = region.text_matcher.confidence(result)
+        else:
+            ocr_conf = max([conf for _, text, conf in result], default=0.0)
+    return template_conf, ocr_conf
+
 # -------------------------------
 # Run analysis on all regions
 # -------------------------------
@@ -118,27 +340,102 @@ def analyze_frame(frame, regions, run_dir):
         analyze_region(frame, r, run_dir)
     return regions
 
+# -------------------------------
+# Policy input / click helpers
+# -------------------------------
+def region_confidence(region):
+    """Confidence that decides region.matched for the region's type."""
+    if region.type == "hybrid":
+        return region.hybrid_confidence
+    if region.type == "ocr":
+        return region.ocr_confidence
+    return region.template_confidence
+
+def region_states(regions):
+    """
+    Build the analysis dict consumed by PolicyEngine.evaluate().
+    """
+    return {
+        r.name: {"matched": r.matched, "confidence": region_confidence(r), "stale": r.stale}
+        for r in regions
+    }
+
+def click_point(region):
+    """
+    Absolute (x, y) click position for a region, in frame coordinates.
+    For random_inset this is the center of click_box(region); the action
+    executor picks the actual point at click time.
+    """
+    x, y, w, h = region.rect
+    click = region.click or {}
+    mode = click.get("mode", "center")
+    offset = click.get("offset", [0,0])
+
+    if mode == "random_inset":
+        bx, by, bw, bh = click_box(region)
+        return bx + bw // 2 + offset[0], by + bh // 2 + offset[1]
+
+    # Use template match location for template/hybrid/classify types
+    if region.type in ["template", "hybrid", "classify"] and region.template_match_loc and region.template_size:
+        match_x, match_y = region.template_match_loc
+        tmpl_w, tmpl_h = region.template_size
+        # Calculate center of matched template
+        cx = x + match_x + tmpl_w // 2
+        cy = y + match_y + tmpl_h // 2
+    else:
+        # Fallback to region center for OCR-only or when no match
+        cx, cy = (x + w//2, y + h//2) if mode=="center" else (x, y)
+
+    return cx + offset[0], cy + offset[1]
+
+def click_box(region):
+    """
+    (x, y, w, h) a random_inset click lands in: the matched template (or
+    the rect) shrunk by click.inset [dx, dy] on each side. None for other
+    click modes.
+    """
+    click = region.click or {}
+    if click.get("mode") != "random_inset":
+        return None
+    x, y, w, h = region.rect
+    if region.type in ["template", "hybrid", "classify"] and region.template_match_loc and region.template_size:
+        x, y = x + region.template_match_loc[0], y + region.template_match_loc[1]
+        w, h = region.template_size
+    dx, dy = click.get("inset", [0, 0])
+    # an inset larger than the box collapses that axis to its center
+    dx, dy = min(dx, (w - 1) // 2), min(dy, (h - 1) // 2)
+    return x + dx, y + dy, w - 2 * dx, h - 2 * dy
+
 # -------------------------------
 # Debug overlay for visualization
 # -------------------------------
-def draw_debug_overlay(frame, regions):
+def draw_debug_overlay(frame, regions, origin=(0, 0)):
     """
     Draw rectangles, click points, and confidence labels.
+    origin is the region-coordinate position of frame's top-left pixel
+    (non-zero for planned partial captures).
     Returns a new frame with overlays.
     """
     frame_overlay = frame.copy()
     for r in regions:
         x, y, w, h = r.rect
+        x -= origin[0]; y -= origin[1]
         color = (0,255,0) if r.matched else (0,0,255)
         cv2.rectangle(frame_overlay, (x,y), (x+w, y+h), color, 2)
 
+        # Every match of a find_all region
+        if r.template_matches and r.template_size:
+            tmpl_w, tmpl_h = r.template_size
+            for mx, my, _ in r.template_matches:
+                cv2.rectangle(frame_overlay, (x+mx, y+my), (x+mx+tmpl_w, y+my+tmpl_h), (255,255,0), 1)
+
         # Click point - use template match location if available
         if r.click:
             mode = r.click.get("mode", "center")
             offset = r.click.get("offset", [0,0])
 
-            # Use template match location for template/hybrid types
-            if r.type in ["template", "hybrid"] and r.template_match_loc and r.template_size:
+            # Use template match location for template/hybrid/classify types
+            if r.type in ["template", "hybrid", "classify"] and r.template_match_loc and r.template_size:
                 match_x, match_y = r.template_match_loc
                 tmpl_w, tmpl_h = r.template_size
                 # Calculate center of matched template in absolute coordinates
@@ -155,6 +452,8 @@ def draw_debug_overlay(frame, regions):
         label = f"{r.name} | Tmpl:{r.template_confidence:.2f} OCR:{r.ocr_confidence:.2f}"
         if r.type=="hybrid":
             label += f" Hybrid:{r.hybrid_confidence:.2f}"
+        elif r.type=="classify":
+            label += f" Label:{r.label}"
         cv2.putText(frame_overlay, label, (x, y-10),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,255,255), 1)
     return frame_overlay
@@ -0,0 +1,289 @@
+# batch_analysis.py
+"""
+Analyze every frame of a recorded run and cache the confidences.
+
+Results go to <run_dir>/confidences.npz as a (frame, region key, 3) float32
+array of template / OCR / hybrid confidence. A region key is its config
+hash plus the hash of its template files (utils.hashing.region_key), so a
+rerun only recomputes regions whose settings or templates changed, and
+frames that were added since. Frames are analyzed in a process pool;
+each worker also goes through the shared result cache
+(utils.result_cache), so frames already analyzed by the UI Lab or another
+run with the same frames are not recomputed.
+
+    python -m tools.batch_analysis debug_runs/run_latest [workers] [--events]
+
+--events also writes the results as the run's binary event log
+(debug/event_log.py), replacing any existing one.
+"""
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+from utils.hashing import region_key
+from utils.hybrid_eval import aggregate_array
+
+CACHE_NAME = "confidences.npz"
+CHANNELS = ("template", "ocr", "hybrid")
+
+
+def default_workers():
+    return max(1, min(4, (os.cpu_count() or 2) - 1))
+
+
+# -------------------------------
+# On-disk cache
+# -------------------------------
+class ConfidenceCache:
+    """
+    Columnar confidence store: rows are frame file names, columns are region
+    keys. Entries that were never computed are NaN.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.frames = []
+        self.keys = []
+        self.conf = np.full((0, 0, len(CHANNELS)), np.nan, dtype=np.float32)
+        self.load()
+
+    def load(self):
+        if not self.path.exists():
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                self.frames = [str(f) for f in data["frames"]]
+                self.keys = [str(k) for k in data["keys"]]
+                self.conf = data["conf"].astype(np.float32)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable cache {self.path}: {e}")
+            self.frames, self.keys = [], []
+            self.conf = np.full((0, 0, len(CHANNELS)), np.nan, dtype=np.float32)
+
+    def reshape(self, frames, keys):
+        """
+        Re-index to exactly `frames` x `keys`, keeping every cached entry
+        that is still wanted. Dropping the rest keeps the file compact.
+        """
+        conf = np.full((len(frames), len(keys), len(CHANNELS)), np.nan, dtype=np.float32)
+        old_rows = {f: i for i, f in enumerate(self.frames)}
+        old_cols = {k: i for i, k in enumerate(self.keys)}
+
+        rows = [(i, old_rows[f]) for i, f in enumerate(frames) if f in old_rows]
+        cols = [(j, old_cols[k]) for j, k in enumerate(keys) if k in old_cols]
+        if rows and cols:
+            new_r, old_r = zip(*rows)
+            new_c, old_c = zip(*cols)
+            conf[np.ix_(new_r, new_c)] = self.conf[np.ix_(old_r, old_c)]
+
+        self.frames, self.keys, self.conf = list(frames), list(keys), conf
+
+    def missing(self):
+        """(frames, keys) bool mask of entries still to compute."""
+        return np.isnan(self.conf[:, :, 0])
+
+    def save(self):
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez_compressed(
+                f,
+                frames=np.array(self.frames, dtype=str),
+                keys=np.array(self.keys, dtype=str),
+                conf=self.conf,
+            )
+        os.replace(tmp, self.path)
+
+
+# -------------------------------
+# Pool worker
+# -------------------------------
+_result_cache = None  # one ResultCache per pool process
+
+
+def _analyze_frame_job(run_dir, frame_path, region_dicts):
+    """
+    Runs in a pool process: analyze one frame for the given regions and
+    return [(template, ocr, hybrid), ...]. An unreadable frame or a region
+    that does not load gives NaN ("not computed"), not a zero confidence,
+    so it is neither mistaken for "no match" nor cached as a result. main is imported here so the
+    OCR model is only loaded by processes that need it, once each.
+    """
+    global _result_cache
+    from capture.frame import Frame
+    from main import analyze_region, region_from_dict
+    from utils.result_cache import ResultCache
+
+    img = cv2.imread(frame_path)
+    if img is None:
+        return [(np.nan, np.nan, np.nan)] * len(region_dicts)
+
+    if _result_cache is None:
+        _result_cache = ResultCache()
+    cached = _result_cache.for_file(frame_path)
+
+    frame = Frame.from_bgr(img)
+    results = []
+    for d in region_dicts:
+        region = region_from_dict(d)
+        if region is None:
+            results.append((np.nan, np.nan, np.nan))
+            continue
+        analyze_region(frame, region, run_dir, results=cached)
+        results.append((region.template_confidence, region.ocr_confidence,
+                        region.hybrid_confidence))
+    _result_cache.flush()
+    return results
+
+
+# -------------------------------
+# Whole-run analysis
+# -------------------------------
+def decisive_channel(region_type):
+    """Index into CHANNELS of the confidence that decides region.matched."""
+    if region_type == "hybrid":
+        return 2
+    if region_type == "ocr":
+        return 1
+    return 0
+
+
+def analyze_run(run_dir, regions, workers=None, progress=None, should_stop=None, compute=True):
+    """
+    Fill the run's confidence cache for `regions` (regions.yaml dicts) and
+    return a timeline dict:
+
+        frames      frame file names, in run order
+        names       region names
+        thresholds  (R,) float32
+        confidence  (F, R) float32 decisive confidence, NaN where missing
+        channels    (F, R, 3) float32 template / OCR / hybrid confidence
+        computed    number of frames that were (re)analyzed
+
+    progress(done, total) is called as frames finish; when should_stop()
+    returns True the remaining frames are dropped. Finished frames are
+    saved either way. With compute=False only cached values are returned.
+    """
+    run_dir = Path(run_dir)
+    frames = sorted(run_dir.glob("frames/*.png"))
+    keys = [region_key(d, run_dir) for d in regions]
+    unique_keys = list(dict.fromkeys(keys))
+    representative = {k: regions[keys.index(k)] for k in unique_keys}
+
+    cache = ConfidenceCache(run_dir / CACHE_NAME)
+    cache.reshape([f.name for f in frames], unique_keys)
+    missing = cache.missing()
+
+    todo = np.flatnonzero(missing.any(axis=1)) if compute else np.empty(0, dtype=np.int64)
+    total = len(todo)
+    if progress:
+        progress(0, total)
+
+    if total:
+        ctx = multiprocessing.get_context("spawn")  # Qt / torch threads do not survive fork
+        pool = ProcessPoolExecutor(max_workers=workers or default_workers(), mp_context=ctx)
+        try:
+            jobs = {}
+            for fi in todo:
+                cols = np.flatnonzero(missing[fi])
+                job = pool.submit(_analyze_frame_job, str(run_dir), str(frames[fi]),
+                                  [representative[unique_keys[c]] for c in cols])
+                jobs[job] = (fi, cols)
+
+            for done, job in enumerate(as_completed(jobs), start=1):
+                fi, cols = jobs[job]
+                cache.conf[fi, cols] = job.result()
+                if progress:
+                    progress(done, total)
+                if should_stop and should_stop():
+                    break
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            cache.save()
+
+    cols = [unique_keys.index(k) for k in keys]
+    channels = cache.conf[:, cols]
+    # The aggregate mode is not part of the region key (it only combines the
+    # cached template / OCR values), so hybrid is always recombined here.
+    for i, d in enumerate(regions):
+        if d.get("type") == "hybrid":
+            channels[:, i, 2] = aggregate_array(channels[:, i, :2], d.get("aggregate", "mean"))
+    decisive = [decisive_channel(d.get("type", "template")) for d in regions]
+    return {
+        "frames": cache.frames,
+        "names": [d.get("name", "") for d in regions],
+        "thresholds": np.array([d.get("threshold", 0.7) for d in regions], dtype=np.float32),
+        "confidence": channels[:, np.arange(len(regions)), decisive] if regions
+                      else np.zeros((len(frames), 0), dtype=np.float32),
+        "channels": channels,
+        "computed": total,
+    }
+
+
+# -------------------------------
+# Entry
+# -------------------------------
+def write_events(run_dir, timeline):
+    """Store a timeline as the run's event log, one event per region per frame."""
+    from debug.event_log import INDEX_NAME, LOG_NAME, STRINGS_NAME, EventLogWriter
+
+    for name in (LOG_NAME, STRINGS_NAME, INDEX_NAME):
+        (Path(run_dir) / name).unlink(missing_ok=True)
+
+    conf, channels = timeline["confidence"], timeline["channels"]
+    decision = np.nan_to_num(conf) >= timeline["thresholds"]
+    with EventLogWriter(run_dir) as writer:
+        for fi in range(len(timeline["frames"])):
+            writer.write_frame(fi, [
+                {
+                    "region": name,
+                    "template_conf": channels[fi, i, 0],
+                    "ocr_conf": channels[fi, i, 1],
+                    "hybrid_conf": channels[fi, i, 2],
+                    "ocr_valid": channels[fi, i, 1] > 0,
+                    "decision": decision[fi, i],
+                }
+                for i, name in enumerate(timeline["names"])
+                if not np.isnan(conf[fi, i])
+            ])
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if not args:
+        print("Usage: batch_analysis.py <run_dir> [workers] [--events]")
+        sys.exit(1)
+
+    run_dir = Path(args[0])
+    workers = int(args[1]) if len(args) > 1 else None
+    yaml_file = run_dir / "regions.yaml"
+    if not yaml_file.exists():
+        print(f"No regions.yaml in {run_dir}")
+        sys.exit(1)
+    regions = yaml.safe_load(yaml_file.read_text()) or []
+
+    def report(done, total):
+        print(f"\r{done}/{total} frames", end="", flush=True)
+
+    timeline = analyze_run(run_dir, regions, workers=workers, progress=report)
+    print(f"\nAnalyzed {timeline['computed']} of {len(timeline['frames'])} frames "
+          f"(rest cached in {run_dir / CACHE_NAME})")
+
+    conf = timeline["confidence"]
+    for i, name in enumerate(timeline["names"]):
+        matched = np.nan_to_num(conf[:, i]) >= timeline["thresholds"][i]
+        print(f"{name}: matched in {int(matched.sum())}/{len(matched)} frames, "
+              f"mean conf {np.nanmean(conf[:, i]) if len(conf) else 0.0:.3f}")
+
+    if "--events" in sys.argv:
+        write_events(run_dir, timeline)
+        print(f"Event log written to {run_dir}")
+
+
+if __name__ == "__main__":
+    main()
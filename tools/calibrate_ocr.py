@@ -0,0 +1,96 @@
+# calibrate_ocr.py
+"""
+Find cheap OCR preprocessing settings for a run's OCR / hybrid regions.
+
+For every region, ROIs from evenly spaced recorded frames are read at
+native resolution first; the text band and text height are learned from
+the detected boxes, and candidate settings (text band crop, downscale to a
+target text height, binary / gray / color, padding) are tried
+cheapest-first. The fastest one that reads the same text as native on at
+least --agreement of the frames is stored in <run_dir>/ocr_params.yaml.
+Regions use it with `ocr_preprocess: auto` in regions.yaml.
+
+    python -m tools.calibrate_ocr <run_dir> [--frames=30] [--agreement=1.0]
+        [--heights=16,20,24,32] [--regions=name,name]
+"""
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+from main import get_reader, region_from_dict, region_roi
+from vision.preprocess import PARAMS_NAME, TEXT_HEIGHTS, calibrate, rect_hash
+
+# -------------------------------
+# Config
+# -------------------------------
+SAMPLE_FRAMES = 30
+MIN_AGREEMENT = 1.0  # fraction of sampled frames whose text must match native
+
+
+def sample_frames(run_dir, count):
+    frames = sorted(Path(run_dir).glob("frames/*.png"))
+    if len(frames) <= count:
+        return frames
+    return [frames[i] for i in np.linspace(0, len(frames) - 1, count).astype(int)]
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    opts = dict(a[2:].partition("=")[::2] for a in sys.argv[1:] if a.startswith("--"))
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+
+    run_dir = Path(args[0])
+    with open(run_dir / "regions.yaml", "r") as f:
+        regions = [r for r in map(region_from_dict, yaml.safe_load(f) or []) if r is not None]
+    names = set(opts["regions"].split(",")) if opts.get("regions") else None
+    regions = [r for r in regions if r.type in ("ocr", "hybrid") and (names is None or r.name in names)]
+    if not regions:
+        print("No OCR regions to calibrate.")
+        sys.exit(1)
+
+    heights = tuple(int(h) for h in opts["heights"].split(",")) if opts.get("heights") else TEXT_HEIGHTS
+    agreement = float(opts.get("agreement") or MIN_AGREEMENT)
+    images = [img for img in (cv2.imread(str(p)) for p in sample_frames(run_dir, int(opts.get("frames") or SAMPLE_FRAMES)))
+              if img is not None]
+    if not images:
+        print(f"No frames in {run_dir / 'frames'}")
+        sys.exit(1)
+
+    params_path = run_dir / PARAMS_NAME
+    stored = {}
+    if params_path.exists():
+        stored = yaml.safe_load(params_path.read_text()) or {}
+
+    reader = get_reader()
+    for region in regions:
+        rois = [region_roi(img, region.rect) for img in images]
+        rois = [roi for roi in rois if roi.size]
+        if not rois:
+            print(f"⚠️ {region.name}: rect outside the frames, skipped")
+            continue
+
+        result = calibrate(reader, rois, heights, agreement)
+        if result["params"] is None:
+            print(f"{region.name:<20} native {result['native_ms']:.1f} ms, no cheaper setting "
+                  f"keeps the text (or no text found); left unprocessed")
+            stored.pop(region.name, None)
+            continue
+
+        p = result["params"]
+        print(f"{region.name:<20} native {result['native_ms']:.1f} ms -> {result['ms']:.1f} ms "
+              f"(band {p['band']}, scale {p['scale']}, {p['mode']}), "
+              f"agreement {result['agreement'] * 100:.0f}%")
+        stored[region.name] = {"rect": rect_hash(region.rect), **result}
+
+    with open(params_path, "w") as f:
+        yaml.safe_dump(stored, f, sort_keys=False)
+    print(f"Saved {params_path}; use `ocr_preprocess: auto` on a region to apply it.")
+
+
+if __name__ == "__main__":
+    main()
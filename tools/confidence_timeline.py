@@ -0,0 +1,121 @@
+import numpy as np
+
+from PyQt6.QtCore import Qt, QPointF, pyqtSignal
+from PyQt6.QtGui import QColor, QPainter, QPainterPath, QPen
+from PyQt6.QtWidgets import QWidget
+
+# Line colors cycled over regions
+PALETTE = ("#4fc3f7", "#81c784", "#ffb74d", "#e57373", "#ba68c8", "#fff176", "#4db6ac")
+MARGIN = 8
+
+
+class ConfidenceTimeline(QWidget):
+    """
+    Per-region confidence over every frame of a run, drawn with QPainter.
+
+    Each region is one polyline with a dashed line at its threshold. When a
+    region is selected only that region is drawn. Clicking anywhere jumps to
+    the nearest frame (frame_clicked is emitted with its index).
+    """
+
+    frame_clicked = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumHeight(120)
+        self.timeline = None
+        self.selected = None
+        self.current = 0
+        self._paths = {}
+
+    # ---------------- Data ----------------
+
+    def set_timeline(self, timeline):
+        """timeline: dict returned by tools.batch_analysis.analyze_run."""
+        self.timeline = timeline
+        self._paths = {}
+        self.update()
+
+    def set_selected(self, name):
+        self.selected = name
+        self.update()
+
+    def set_current(self, index):
+        self.current = index
+        self.update()
+
+    # ---------------- Geometry ----------------
+
+    def _frame_count(self):
+        return len(self.timeline["frames"]) if self.timeline else 0
+
+    def _x(self, index):
+        n = self._frame_count()
+        span = self.width() - 2 * MARGIN
+        return MARGIN + (span * index / (n - 1) if n > 1 else span / 2)
+
+    def _y(self, conf):
+        return MARGIN + (self.height() - 2 * MARGIN) * (1.0 - conf)
+
+    def _path(self, i):
+        """Cached polyline for region column i; NaN (not computed) breaks it."""
+        key = (i, self.width(), self.height())
+        path = self._paths.get(key)
+        if path is None:
+            path = QPainterPath()
+            conf = np.clip(self.timeline["confidence"][:, i], 0.0, 1.0)
+            pen_down = False
+            for f, c in enumerate(conf):
+                if np.isnan(c):
+                    pen_down = False
+                    continue
+                point = QPointF(self._x(f), self._y(float(c)))
+                if pen_down:
+                    path.lineTo(point)
+                else:
+                    path.moveTo(point)
+                    pen_down = True
+            self._paths[key] = path
+        return path
+
+    # ---------------- Qt events ----------------
+
+    def resizeEvent(self, event):
+        self._paths = {}
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("#202020"))
+        if not self._frame_count():
+            painter.setPen(QColor("gray"))
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter,
+                             "Analyze All Frames to see confidences over the run")
+            return
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+
+        names = self.timeline["names"]
+        show = [i for i, n in enumerate(names) if self.selected in (None, n)] \
+            or range(len(names))
+
+        for i in show:
+            color = QColor(PALETTE[i % len(PALETTE)])
+            y = self._y(float(self.timeline["thresholds"][i]))
+            painter.setPen(QPen(color, 1, Qt.PenStyle.DashLine))
+            painter.drawLine(QPointF(MARGIN, y), QPointF(self.width() - MARGIN, y))
+            painter.setPen(QPen(color, 2))
+            painter.drawPath(self._path(i))
+            painter.drawText(QPointF(MARGIN + 2, y - 2), names[i])
+
+        # Current frame marker
+        x = self._x(self.current)
+        painter.setPen(QPen(QColor("white"), 1))
+        painter.drawLine(QPointF(x, 0), QPointF(x, self.height()))
+
+    def mousePressEvent(self, event):
+        n = self._frame_count()
+        if n and event.button() == Qt.MouseButton.LeftButton:
+            span = max(self.width() - 2 * MARGIN, 1)
+            index = round((event.position().x() - MARGIN) / span * (n - 1))
+            self.frame_clicked.emit(int(min(max(index, 0), n - 1)))
+        super().mousePressEvent(event)
@@ -0,0 +1,312 @@
+# export_yolo.py
+"""
+Turn recorded runs into a YOLO training set.
+
+For every frame, each region whose `class` (an id or name from
+config/ui_classes.yaml) is set becomes a box when the region is present:
+a tp / fp label in labels.jsonl decides first, otherwise the cached
+confidence from tools.batch_analysis against the region's threshold.
+Frames are streamed, near-duplicates (dHash within a few bits, same boxes)
+are dropped, images are encoded on a thread pool and written once with all
+their boxes, into images/{train,val}/NNN/ shards with matching labels/.
+
+Blocks of consecutive frames go to the same split so neighbouring,
+almost identical frames do not leak between train and val. A manifest
+makes reruns skip frames that were already exported.
+
+    python -m tools.export_yolo <out_dir> <run_dir | runs_root> [...] [--val=0.1]
+        [--workers=8] [--distance=4] [--keep-empty] [--png]
+"""
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+from tools.batch_analysis import analyze_run
+from utils.geometry import rect_to_list
+from utils.hashing import DHashIndex, dhash, stable_hash
+from utils.threshold_tuner import load_labels
+from utils.ui_classes import class_id, load_classes
+
+# -------------------------------
+# Config
+# -------------------------------
+VAL_FRACTION = 0.1
+SPLIT_BLOCK = 50        # consecutive frames that share a split
+SHARD_SIZE = 1000       # images per shard directory
+DEDUP_DISTANCE = 4      # max differing dHash bits for a near-duplicate
+JPEG_QUALITY = 95
+IN_FLIGHT = 32          # frames decoded / encoded ahead of the writer
+
+
+# -------------------------------
+# Samples
+# -------------------------------
+def region_presence(run_dir, regions):
+    """
+    (frames, regions) int8 array: 1 present, 0 absent, -1 unknown.
+    Labels override cached confidences. Returns (frame paths, presence).
+    """
+    run_dir = Path(run_dir)
+    frames = sorted(run_dir.glob("frames/*.png"))
+    timeline = analyze_run(run_dir, regions, compute=False)
+    conf = timeline["confidence"]
+
+    presence = np.full(conf.shape, -1, dtype=np.int8)
+    known = ~np.isnan(conf)
+    presence[known] = conf[known] >= np.broadcast_to(timeline["thresholds"], conf.shape)[known]
+
+    labels_file = run_dir / "labels.jsonl"
+    if labels_file.exists():
+        f, r, positive = load_labels(labels_file, timeline["names"])
+        ok = f < len(frames)
+        presence[f[ok], r[ok]] = positive[ok]
+    return frames, presence
+
+
+def run_samples(run_dir, classes, keep_empty=False):
+    """
+    Yield (run_dir, frame_path, [(class_id, rect), ...]) for every frame
+    whose regions' presence is known.
+    """
+    run_dir = Path(run_dir)
+    yaml_file = run_dir / "regions.yaml"
+    if not yaml_file.exists():
+        print(f"⚠️ Skipping {run_dir}: no regions.yaml")
+        return
+    regions = yaml.safe_load(yaml_file.read_text()) or []
+
+    ids = [class_id(r.get("class"), classes) for r in regions]
+    # [x, y, w, h] or {x, y, w, h} (region editor) -> list; None if malformed
+    rects = [rect_to_list(r.get("rect")) for r in regions]
+    for i, r in enumerate(regions):
+        if ids[i] is None:
+            print(f"⚠️ {run_dir.name}/{r.get('name')}: no known class, not exported")
+        elif rects[i] is None:
+            print(f"⚠️ {run_dir.name}/{r.get('name')}: invalid rect, not exported")
+            ids[i] = None
+
+    frames, presence = region_presence(run_dir, regions)
+    labeled = [i for i, cid in enumerate(ids) if cid is not None]
+    for fi, path in enumerate(frames):
+        state = presence[fi, labeled]
+        if (state < 0).all():
+            continue
+        boxes = [(ids[i], rects[i]) for i, s in zip(labeled, state) if s == 1]
+        if boxes or keep_empty:
+            yield run_dir, path, boxes
+
+
+def yolo_line(cid, rect, img_w, img_h):
+    """YOLO label line for rect clipped to the image, or None if nothing is left."""
+    rect = rect_to_list(rect)
+    if rect is None:
+        return None
+    x, y, w, h = rect
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + w, img_w), min(y + h, img_h)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return (f"{cid} {(x0 + x1) / 2 / img_w:.6f} {(y0 + y1) / 2 / img_h:.6f} "
+            f"{(x1 - x0) / img_w:.6f} {(y1 - y0) / img_h:.6f}")
+
+
+# -------------------------------
+# Exporter
+# -------------------------------
+class YoloExporter:
+    def __init__(self, out_dir, classes, val_fraction=VAL_FRACTION, workers=None,
+                 dedup_distance=DEDUP_DISTANCE, ext=".jpg", keep_empty=False):
+        self.out_dir = Path(out_dir)
+        self.classes = classes
+        self.val_fraction = val_fraction
+        self.workers = workers or min(8, os.cpu_count() or 2)
+        self.dedup_distance = dedup_distance
+        self.ext = ext
+        self.keep_empty = keep_empty
+
+        self.indexes = {}             # label signature -> DHashIndex
+        self.done = set()             # (run name, frame name) already exported
+        self.counts = {"train": 0, "val": 0}
+        self.stats = {"seen": 0, "duplicates": 0, "written": 0, "skipped": 0}
+        self._load_manifest()
+
+    # ---------------- Manifest ----------------
+
+    @property
+    def manifest_path(self):
+        return self.out_dir / "manifest.jsonl"
+
+    def _index(self, signature):
+        index = self.indexes.get(signature)
+        if index is None:
+            index = self.indexes[signature] = DHashIndex(self.dedup_distance)
+        return index
+
+    def _load_manifest(self):
+        if not self.manifest_path.exists():
+            return
+        with open(self.manifest_path, "r") as f:
+            for line in f:
+                rec = json.loads(line)
+                self.done.add((rec["run"], rec["frame"]))
+                self._index(rec["signature"]).add(int(rec["dhash"], 16))
+                self.counts[rec["split"]] += 1
+
+    # ---------------- Pool jobs ----------------
+
+    @staticmethod
+    def _decode(sample):
+        img = cv2.imread(str(sample[1]))
+        return sample, img, (dhash(img) if img is not None else None)
+
+    def _encode(self, img, image_path, label_path, lines):
+        params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY] if self.ext == ".jpg" else []
+        ok, buf = cv2.imencode(self.ext, img, params)
+        if not ok:
+            raise RuntimeError(f"Could not encode {image_path}")
+        image_path.parent.mkdir(parents=True, exist_ok=True)
+        label_path.parent.mkdir(parents=True, exist_ok=True)
+        buf.tofile(str(image_path))
+        label_path.write_text("".join(line + "\n" for line in lines))
+
+    # ---------------- Export ----------------
+
+    def split_for(self, run_name, frame_index):
+        block = stable_hash([run_name, frame_index // SPLIT_BLOCK])
+        return "val" if int(block, 16) / 16 ** len(block) < self.val_fraction else "train"
+
+    def _accept(self, sample, img, h, frame_index):
+        """Decide on one decoded frame; returns the write job or None."""
+        run_dir, path, boxes = sample
+        self.stats["seen"] += 1
+        if img is None:
+            self.stats["skipped"] += 1
+            return None
+
+        img_h, img_w = img.shape[:2]
+        lines = [l for l in (yolo_line(c, r, img_w, img_h) for c, r in boxes) if l]
+        if not lines and not self.keep_empty:
+            self.stats["skipped"] += 1
+            return None
+
+        signature = stable_hash(sorted(lines))
+        index = self._index(signature)
+        if index.near(h):
+            self.stats["duplicates"] += 1
+            return None
+        index.add(h)
+
+        split = self.split_for(run_dir.name, frame_index)
+        shard = f"{self.counts[split] // SHARD_SIZE:03d}"
+        self.counts[split] += 1
+        name = f"{run_dir.name}_{path.stem}"
+        image_path = self.out_dir / "images" / split / shard / (name + self.ext)
+        label_path = self.out_dir / "labels" / split / shard / (name + ".txt")
+        record = {
+            "run": run_dir.name, "frame": path.name, "dhash": f"{h:016x}",
+            "signature": signature, "split": split,
+            "image": str(image_path.relative_to(self.out_dir)),
+        }
+        return (img, image_path, label_path, lines), record
+
+    def export(self, run_dirs):
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="yolo")
+        decoding, writing = deque(), deque()
+
+        def samples():
+            for run_dir in run_dirs:
+                for i, sample in enumerate(run_samples(run_dir, self.classes, self.keep_empty)):
+                    if (Path(run_dir).name, sample[1].name) not in self.done:
+                        yield int(sample[1].stem) if sample[1].stem.isdigit() else i, sample
+
+        with pool, open(self.manifest_path, "a") as manifest:
+            def drain(queue, limit):
+                while len(queue) > limit:
+                    job, record = queue.popleft()
+                    job.result()
+                    manifest.write(json.dumps(record) + "\n")
+                    self.stats["written"] += 1
+
+            def decide(limit):
+                # keep decisions in frame order so dedup is deterministic
+                while len(decoding) > limit:
+                    frame_index, job = decoding.popleft()
+                    accepted = self._accept(*job.result(), frame_index)
+                    if accepted is not None:
+                        args, record = accepted
+                        writing.append((pool.submit(self._encode, *args), record))
+                        drain(writing, IN_FLIGHT)
+
+            for frame_index, sample in samples():
+                decoding.append((frame_index, pool.submit(self._decode, sample)))
+                decide(IN_FLIGHT)
+            decide(0)
+            drain(writing, 0)
+
+        self.write_data_yaml()
+        return self.stats
+
+    def write_data_yaml(self):
+        data = {
+            "path": str(self.out_dir.resolve()),
+            "train": "images/train",
+            "val": "images/val",
+            "names": self.classes,
+        }
+        with open(self.out_dir / "data.yaml", "w") as f:
+            yaml.safe_dump(data, f, sort_keys=False)
+
+
+def find_runs(paths):
+    """Run dirs among `paths`, descending one level into folders of runs."""
+    runs = []
+    for p in map(Path, paths):
+        if (p / "frames").is_dir():
+            runs.append(p)
+        else:
+            runs.extend(sorted(d for d in p.iterdir() if (d / "frames").is_dir()))
+    return runs
+
+
+# -------------------------------
+# Entry
+# -------------------------------
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    opts = dict(a[2:].partition("=")[::2] for a in sys.argv[1:] if a.startswith("--"))
+    if len(args) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    runs = find_runs(args[1:])
+    if not runs:
+        print("No runs found.")
+        sys.exit(1)
+
+    exporter = YoloExporter(
+        args[0],
+        load_classes(),
+        val_fraction=float(opts.get("val") or VAL_FRACTION),
+        workers=int(opts["workers"]) if opts.get("workers") else None,
+        dedup_distance=int(opts.get("distance") or DEDUP_DISTANCE),
+        ext=".png" if "png" in opts else ".jpg",
+        keep_empty="keep-empty" in opts,
+    )
+    stats = exporter.export(runs)
+    print(
+        f"{len(runs)} runs: {stats['seen']} frames, {stats['written']} written, "
+        f"{stats['duplicates']} near-duplicates dropped, {stats['skipped']} without boxes; "
+        f"train {exporter.counts['train']} / val {exporter.counts['val']} in {exporter.out_dir}"
+    )
+
+
+if __name__ == "__main__":
+    main()
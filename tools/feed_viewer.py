@@ -0,0 +1,102 @@
+# feed_viewer.py
+"""
+Watch (and optionally record) what a live runner sees, from another process.
+
+Attaches to the runner's shared-memory feed (tools/live_runner.py with
+PUBLISH_FEED = True), draws region boxes and confidences from the
+published results, and shows them downscaled. With --record the raw
+frames are also saved as a run folder the UI Lab / replay tools can open.
+
+    python -m tools.feed_viewer [--scale=0.5] [--record=debug_runs/run_feed]
+"""
+import sys
+import time
+from pathlib import Path
+
+import cv2
+
+from debug.frame_feed import FEED_NAME, FrameFeed
+
+POLL_INTERVAL = 0.01  # seconds between checks for a new frame
+
+
+def draw_results(img, results, origin, scale):
+    """Draw published region results onto a (downscaled) frame copy."""
+    ox, oy = origin
+    for r in results:
+        x, y, w, h = r["rect"]
+        x, y = x - ox, y - oy
+        color = (0, 255, 0) if r["matched"] else (0, 0, 255)
+        p0 = (int(x * scale), int(y * scale))
+        p1 = (int((x + w) * scale), int((y + h) * scale))
+        cv2.rectangle(img, p0, p1, color, 1)
+        cv2.putText(img, f"{r['name']} {r['confidence']:.2f}", (p0[0], p0[1] - 4),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
+
+        match = r.get("match")
+        if match:
+            mx, my, mw, mh = match
+            cv2.rectangle(img, (int((x + mx) * scale), int((y + my) * scale)),
+                          (int((x + mx + mw) * scale), int((y + my + mh) * scale)),
+                          (255, 255, 0), 1)
+    return img
+
+
+def main():
+    opts = dict(a[2:].partition("=")[::2] for a in sys.argv[1:] if a.startswith("--"))
+    scale = float(opts.get("scale") or 0.5)
+    record_dir = Path(opts["record"]) if opts.get("record") else None
+    if record_dir:
+        (record_dir / "frames").mkdir(parents=True, exist_ok=True)
+
+    try:
+        feed = FrameFeed(opts.get("name") or FEED_NAME)
+    except FileNotFoundError:
+        print("No live feed found. Start the live runner with PUBLISH_FEED = True.")
+        sys.exit(1)
+
+    frame = None
+    last_id, shown, dropped = -1, 0, 0
+    t_start = time.monotonic()
+    try:
+        while True:
+            frame = feed.latest(after=last_id)
+            if frame is None:
+                if cv2.waitKey(max(int(POLL_INTERVAL * 1000), 1)) & 0xFF == ord("q"):
+                    break
+                continue
+
+            dropped += max(frame.frame_id - last_id - 1, 0) if last_id >= 0 else 0
+            last_id = frame.frame_id
+
+            # read the shared view, then make sure the runner did not
+            # overwrite it meanwhile
+            small = cv2.resize(frame.image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            raw = frame.bgr() if record_dir else None
+            if not frame.still_valid():
+                dropped += 1
+                continue
+            if record_dir:
+                cv2.imwrite(str(record_dir / "frames" / f"{frame.frame_id:06d}.png"), raw)
+            if small.shape[2] == 4:
+                small = cv2.cvtColor(small, cv2.COLOR_BGRA2BGR)
+
+            draw_results(small, frame.results, frame.origin, scale)
+            shown += 1
+            elapsed = time.monotonic() - t_start
+            cv2.putText(small, f"#{frame.frame_id}  {shown / elapsed:.1f} fps  dropped {dropped}",
+                        (8, 16), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 255), 1)
+            cv2.imshow("Live Feed", small)
+            if cv2.waitKey(1) & 0xFF == ord("q"):
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cv2.destroyAllWindows()
+        frame = None  # release the shared-memory view before detaching
+        feed.close()
+        print(f"Shown {shown} frames, dropped {dropped}")
+
+
+if __name__ == "__main__":
+    main()
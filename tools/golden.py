@@ -0,0 +1,297 @@
+# golden.py
+"""
+Golden-run regression check for the analysis + policy pipeline.
+
+Replays recorded runs (capture.backends.ReplayCapture, every frame in
+order) through main.analyze_region and the PolicyEngine, with the policy
+clock driven by the recorded frame times so cooldowns are deterministic,
+and compares the outcome with <run_dir>/golden.json:
+  * flips   - a region's matched state changed
+  * drift   - same matched state, confidence moved more than --tolerance
+  * actions - the fired policy action differs
+Per-stage timings (capture, analysis per region type, policy) are shown
+against the golden run's. Runs are replayed in parallel processes; use
+--workers=1 when the timings matter more than the wall time.
+
+    python -m tools.golden <run_dir | runs_root> [...] [--update] [--tolerance=0.02]
+        [--policy=policy.yaml] [--workers=N] [--max-slowdown=1.5] [--show=10] [--json=report.json]
+
+Exits with 1 when any run differs, has no golden file, fails, or (with
+--max-slowdown) got slower than allowed, so it can gate a merge.
+"""
+import json
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from tools.batch_analysis import default_workers
+from tools.export_yolo import find_runs
+
+# -------------------------------
+# Config
+# -------------------------------
+GOLDEN_NAME = "golden.json"
+GOLDEN_VERSION = 1
+TOLERANCE = 0.02        # confidence change tolerated without a flip
+SHOW_DIFFS = 10         # differences printed per run
+TIMING_STAGE = "analyze"  # stage --max-slowdown is checked against
+
+
+# -------------------------------
+# Replay (pool worker)
+# -------------------------------
+def _action(decision):
+    if decision is None:
+        return None
+    return {
+        "policy": decision["policy"],
+        "region": decision["region"],
+        "type": decision["action"].get("type"),
+    }
+
+
+def _timing(samples):
+    """stage -> {"mean_ms", "p95_ms"} from per-frame seconds."""
+    return {
+        stage: {
+            "mean_ms": round(float(np.mean(values)) * 1000, 3),
+            "p95_ms": round(float(np.percentile(values, 95)) * 1000, 3),
+        }
+        for stage, values in samples.items() if values
+    }
+
+
+def replay_run(run_dir, policy_path=None):
+    """
+    Replay one run; returns the result in golden.json form. main is imported
+    here so each pool process loads the OCR model at most once.
+    """
+    from capture.backends import ReplayCapture
+    from main import analyze_region, region_confidence, region_from_dict, region_states
+    from utils.policy_engine import PolicyEngine
+
+    run_dir = Path(run_dir)
+    with open(run_dir / "regions.yaml", "r") as f:
+        regions = [r for r in map(region_from_dict, yaml.safe_load(f) or []) if r is not None]
+
+    policies = []
+    if policy_path and Path(policy_path).exists():
+        with open(policy_path, "r") as f:
+            policies = (yaml.safe_load(f) or {}).get("policies", [])
+    engine = PolicyEngine(policies)
+
+    capture = ReplayCapture(run_dir, realtime=False)
+    frames, samples = [], {"capture": [], "analyze": [], "policy": []}
+    try:
+        while True:
+            t0 = time.perf_counter()
+            frame = capture.grab_frame()
+            if frame is None:
+                break
+            t1 = time.perf_counter()
+
+            per_type = {}
+            for r in regions:
+                t = time.perf_counter()
+                analyze_region(frame, r, run_dir)
+                per_type[r.type] = per_type.get(r.type, 0.0) + time.perf_counter() - t
+            t2 = time.perf_counter()
+
+            decision = engine.evaluate(region_states(regions), now=capture.times[capture.position])
+            t3 = time.perf_counter()
+
+            samples["capture"].append(t1 - t0)
+            samples["analyze"].append(t2 - t1)
+            samples["policy"].append(t3 - t2)
+            for kind, seconds in per_type.items():
+                samples.setdefault(f"analyze.{kind}", []).append(seconds)
+
+            frames.append({
+                "frame": capture.frames[capture.position].name,
+                "matched": [bool(r.matched) for r in regions],
+                "confidence": [round(float(region_confidence(r)), 4) for r in regions],
+                "action": _action(decision),
+            })
+    finally:
+        capture.close()
+
+    return {
+        "version": GOLDEN_VERSION,
+        "policy": str(policy_path) if policies else None,
+        "regions": [r.name for r in regions],
+        "frames": frames,
+        "timing": _timing(samples),
+    }
+
+
+# -------------------------------
+# Diff
+# -------------------------------
+def _describe(action):
+    return f"{action['policy']}:{action['type']} {action['region']}" if action else "-"
+
+
+def diff_results(golden, current, tolerance=TOLERANCE):
+    """
+    Compare two results; returns {"flips", "drift", "actions", "notes"},
+    each a list of readable lines. Regions are matched by name and frames by
+    file name, so added / removed ones are noted rather than misaligned.
+    """
+    diff = {"flips": [], "drift": [], "actions": [], "notes": []}
+
+    g_names, c_names = golden["regions"], current["regions"]
+    common = [n for n in g_names if n in c_names]
+    for n in g_names:
+        if n not in c_names:
+            diff["notes"].append(f"region {n} removed")
+    for n in c_names:
+        if n not in g_names:
+            diff["notes"].append(f"region {n} added (no golden data)")
+    gi = [g_names.index(n) for n in common]
+    ci = [c_names.index(n) for n in common]
+
+    g_frames = {f["frame"]: f for f in golden["frames"]}
+    c_frames = {f["frame"]: f for f in current["frames"]}
+    missing = [n for n in g_frames if n not in c_frames]
+    extra = [n for n in c_frames if n not in g_frames]
+    if missing:
+        diff["notes"].append(f"{len(missing)} golden frames not replayed")
+    if extra:
+        diff["notes"].append(f"{len(extra)} frames without golden data")
+
+    for name, c in c_frames.items():
+        g = g_frames.get(name)
+        if g is None:
+            continue
+        for region, a, b in zip(common, gi, ci):
+            g_conf, c_conf = g["confidence"][a], c["confidence"][b]
+            if g["matched"][a] != c["matched"][b]:
+                diff["flips"].append(
+                    f"{name} {region}: matched {int(g['matched'][a])} -> {int(c['matched'][b])} "
+                    f"({g_conf:.3f} -> {c_conf:.3f})"
+                )
+            elif abs(c_conf - g_conf) > tolerance:
+                diff["drift"].append(f"{name} {region}: {g_conf:.3f} -> {c_conf:.3f}")
+        if g["action"] != c["action"]:
+            diff["actions"].append(f"{name}: {_describe(g['action'])} -> {_describe(c['action'])}")
+    return diff
+
+
+def timing_line(golden, current):
+    """'stage 1.2 ms (+5%)' for every stage timed in the current run."""
+    parts = []
+    for stage, t in current["timing"].items():
+        g = (golden or {}).get("timing", {}).get(stage)
+        text = f"{stage} {t['mean_ms']:.1f} ms"
+        if g and g["mean_ms"] > 0:
+            text += f" ({(t['mean_ms'] / g['mean_ms'] - 1) * 100:+.0f}%)"
+        parts.append(text)
+    return ", ".join(parts)
+
+
+def slowdown(golden, current, stage=TIMING_STAGE):
+    g = golden.get("timing", {}).get(stage)
+    c = current["timing"].get(stage)
+    if not g or not c or g["mean_ms"] <= 0:
+        return None
+    return c["mean_ms"] / g["mean_ms"]
+
+
+# -------------------------------
+# Entry
+# -------------------------------
+def check_runs(runs, policy=None, workers=None, update=False, tolerance=TOLERANCE,
+               max_slowdown=None, show=SHOW_DIFFS):
+    """Replay, diff and print a line (plus details) per run; returns (ok, report)."""
+    def policy_for(run_dir):
+        local = run_dir / "policy.yaml"
+        return local if local.exists() else policy
+
+    ctx = multiprocessing.get_context("spawn")  # torch threads do not survive fork
+    workers = min(workers or default_workers(), len(runs))
+    width = max(len(r.name) for r in runs)
+    ok, report = True, {}
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = [(r, pool.submit(replay_run, str(r), policy_for(r))) for r in runs]
+        for run_dir, future in futures:
+            golden_path = run_dir / GOLDEN_NAME
+            try:
+                current = future.result()
+            except Exception as e:
+                ok = False
+                report[run_dir.name] = {"status": "error", "error": repr(e)}
+                print(f"{run_dir.name:<{width}}  ERROR    {e!r}")
+                continue
+
+            n = len(current["frames"])
+            if update:
+                golden_path.write_text(json.dumps(current, separators=(",", ":")))
+                report[run_dir.name] = {"status": "updated", "frames": n}
+                print(f"{run_dir.name:<{width}}  UPDATED  {n} frames | {timing_line(None, current)}")
+                continue
+
+            if not golden_path.exists():
+                ok = False
+                report[run_dir.name] = {"status": "missing", "frames": n}
+                print(f"{run_dir.name:<{width}}  MISSING  no {GOLDEN_NAME}, run with --update")
+                continue
+
+            golden = json.loads(golden_path.read_text())
+            diff = diff_results(golden, current, tolerance)
+            ratio = slowdown(golden, current)
+            slow = max_slowdown is not None and ratio is not None and ratio > max_slowdown
+            differs = bool(diff["flips"] or diff["drift"] or diff["actions"])
+            status = "DIFF" if differs else "SLOW" if slow else "OK"
+            ok = ok and status == "OK"
+
+            summary = f"{n} frames"
+            if differs:
+                summary += (f": {len(diff['flips'])} flips, {len(diff['drift'])} drift > {tolerance}, "
+                            f"{len(diff['actions'])} action diffs")
+            print(f"{run_dir.name:<{width}}  {status:<7}  {summary} | {timing_line(golden, current)}")
+            for line in diff["notes"]:
+                print(f"    note: {line}")
+            for line in (diff["actions"] + diff["flips"] + diff["drift"])[:show]:
+                print(f"    {line}")
+
+            report[run_dir.name] = {
+                "status": status.lower(), "frames": n, "slowdown": ratio,
+                **diff, "timing": current["timing"], "golden_timing": golden.get("timing"),
+            }
+    return ok, report
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    opts = dict(a[2:].partition("=")[::2] for a in sys.argv[1:] if a.startswith("--"))
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+
+    runs = find_runs(args)
+    if not runs:
+        print("No runs found.")
+        sys.exit(1)
+
+    ok, report = check_runs(
+        runs,
+        policy=Path(opts["policy"]) if opts.get("policy") else None,
+        workers=int(opts["workers"]) if opts.get("workers") else None,
+        update="update" in opts,
+        tolerance=float(opts.get("tolerance") or TOLERANCE),
+        max_slowdown=float(opts["max-slowdown"]) if opts.get("max-slowdown") else None,
+        show=int(opts.get("show") or SHOW_DIFFS),
+    )
+    if opts.get("json"):
+        Path(opts["json"]).write_text(json.dumps(report, indent=2))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
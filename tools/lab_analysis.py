@@ -0,0 +1,207 @@
+import time
+
+from PyQt6.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+
+from capture.frame import Frame
+from main import analyze_region, get_reader, region_from_dict
+from tools.batch_analysis import analyze_run
+from utils.result_cache import ResultCache, apply_result, region_result
+
+
+# ----------------------------
+# Worker (runs on its own QThread)
+# ----------------------------
+
+class AnalysisWorker(QObject):
+    """
+    Runs region analysis off the GUI thread.
+
+    Every job carries a generation number; bumping the generation (new frame,
+    new request) makes the running job stop after the region it is on and
+    makes queued stale jobs return immediately. Results are emitted per
+    region as soon as they are ready. Regions already analyzed on the same
+    frame (here, by batch analysis or in an earlier session) come from the
+    persistent result cache.
+    """
+
+    region_done = pyqtSignal(int, int, object, float)  # generation, index, result, seconds
+    finished = pyqtSignal(int, float, bool)            # generation, seconds, cancelled
+    status = pyqtSignal(str)
+
+    def __init__(self, run_dir):
+        super().__init__()
+        self.run_dir = run_dir
+        self.generation = 0
+        self.reader = None
+        self.results = None  # ResultCache; opened on the worker thread
+
+    def cancel(self):
+        """Called from the GUI thread; int assignment is atomic."""
+        self.generation += 1
+        return self.generation
+
+    @pyqtSlot()
+    def warm_up(self):
+        if self.results is None:
+            self.results = ResultCache()
+        # Load the OCR model before the first "Analyze Frame" click needs it
+        if self.reader is None:
+            self.status.emit("Loading OCR model…")
+            t0 = time.perf_counter()
+            self.reader = get_reader()
+            self.status.emit(f"OCR model ready ({time.perf_counter() - t0:.1f}s)")
+
+    @pyqtSlot(int, object, object, object)
+    def analyze(self, generation, img, regions, frame_path):
+        if generation != self.generation:
+            return
+
+        self.warm_up()
+        frame = Frame.from_bgr(img)
+        results = self.results.for_file(frame_path) if frame_path else self.results.for_image(img)
+        t_start = time.perf_counter()
+
+        for i, region_dict in enumerate(regions):
+            if generation != self.generation:
+                self.finished.emit(generation, time.perf_counter() - t_start, True)
+                return
+
+            # built like the runners build it, so cache keys match batch analysis
+            work = region_from_dict(region_dict)
+            if work is None:
+                continue
+            t0 = time.perf_counter()
+            analyze_region(frame, work, self.run_dir, ocr_reader=self.reader, results=results)
+            self.region_done.emit(generation, i, region_result(work), time.perf_counter() - t0)
+
+        self.results.flush()
+        self.finished.emit(generation, time.perf_counter() - t_start, False)
+
+
+class AnalysisThread(QObject):
+    """
+    Owns the worker thread; submit() and cancel() are called from the GUI.
+    """
+
+    _request = pyqtSignal(int, object, object, object)
+
+    def __init__(self, run_dir):
+        super().__init__()
+        self.thread = QThread()
+        self.worker = AnalysisWorker(run_dir)
+        self.worker.moveToThread(self.thread)
+        self._request.connect(self.worker.analyze)
+        self.thread.started.connect(self.worker.warm_up)
+        self.thread.start()
+
+    @property
+    def region_done(self):
+        return self.worker.region_done
+
+    @property
+    def finished(self):
+        return self.worker.finished
+
+    @property
+    def status(self):
+        return self.worker.status
+
+    def submit(self, img, regions, frame_path=None):
+        """
+        Cancel whatever is running and queue analysis of `regions` on img
+        (read from frame_path, if given; it keys the result cache).
+        Returns the job's generation.
+        """
+        generation = self.worker.cancel()
+        # Snapshots as dicts: edits made while the job runs do not race it
+        snapshot = [r.to_dict() for r in regions]
+        self._request.emit(generation, img, snapshot, str(frame_path) if frame_path else None)
+        return generation
+
+    def cancel(self):
+        return self.worker.cancel()
+
+    def stop(self):
+        self.worker.cancel()
+        self.thread.quit()
+        self.thread.wait()
+
+
+# ----------------------------
+# Whole-run analysis (process pool, driven from its own QThread)
+# ----------------------------
+
+class BatchWorker(QObject):
+    """
+    Runs tools.batch_analysis.analyze_run for every frame of the run.
+    Only one job runs at a time; cancel() stops it after the frames in flight.
+    """
+
+    progress = pyqtSignal(int, int)   # frames done, frames to compute
+    finished = pyqtSignal(object)     # timeline dict, or None if it failed
+    status = pyqtSignal(str)
+
+    def __init__(self, run_dir):
+        super().__init__()
+        self.run_dir = run_dir
+        self.cancelled = False
+
+    @pyqtSlot(object)
+    def run(self, region_dicts):
+        self.cancelled = False
+        t0 = time.perf_counter()
+        try:
+            timeline = analyze_run(
+                self.run_dir, region_dicts,
+                progress=self.progress.emit,
+                should_stop=lambda: self.cancelled,
+            )
+        except Exception as e:
+            self.status.emit(f"Whole-run analysis failed: {e}")
+            self.finished.emit(None)
+            return
+
+        self.status.emit(
+            f"Whole run: {timeline['computed']} of {len(timeline['frames'])} frames "
+            f"analyzed in {time.perf_counter() - t0:.1f}s, rest from cache"
+            + (" (cancelled)" if self.cancelled else "")
+        )
+        self.finished.emit(timeline)
+
+
+class BatchThread(QObject):
+    """Owns the whole-run worker thread, like AnalysisThread."""
+
+    _request = pyqtSignal(object)
+
+    def __init__(self, run_dir):
+        super().__init__()
+        self.thread = QThread()
+        self.worker = BatchWorker(run_dir)
+        self.worker.moveToThread(self.thread)
+        self._request.connect(self.worker.run)
+        self.thread.start()
+
+    @property
+    def progress(self):
+        return self.worker.progress
+
+    @property
+    def finished(self):
+        return self.worker.finished
+
+    @property
+    def status(self):
+        return self.worker.status
+
+    def submit(self, regions):
+        """Queue analysis of every frame for `regions` (UI Lab Region objects)."""
+        self._request.emit([r.to_dict() for r in regions])
+
+    def cancel(self):
+        self.worker.cancelled = True
+
+    def stop(self):
+        self.cancel()
+        self.thread.quit()
+        self.thread.wait()
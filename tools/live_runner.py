@@ -1,108 +1,252 @@
 # live_runner.py
+"""
+Live loop: capture, analyze, act.
+
+    python -m tools.live_runner [run_dir]
+    python -m tools.live_runner [run_dir] --replay=debug_runs/run_x [--fast] [--headless]
+
+Clicks are queued to an ActionExecutor and performed on its own thread,
+with per-target coalescing and cooldowns.
+With --replay the recorded run is played back as the screen (in recorded
+time, or as fast as possible with --fast) and clicks only go to a recording
+click sink; the run ends with frames per second and capture-to-decision /
+capture-to-click latencies, so the whole loop can be benchmarked offline.
+--trace=trace.json also writes the per-frame stage timings as a Chrome
+trace-event file.
+"""
+import sys
 import time
 from pathlib import Path
 import cv2
-import numpy as np
-import mss
-import pyautogui
 import yaml
 
-from main import Region, analyze_region, draw_debug_overlay, reader
+from automation.actions import ActionExecutor, ClickAction, NullClickSink, PyAutoGuiClickSink
+from capture.backends import open_capture
+from debug.event_log import EventLogWriter
+from debug.frame_feed import FramePublisher
+from debug.overlay import PreviewOverlay
+from utils.config_watcher import HotReloader
+from utils.frame_budget import FrameBudget
+from utils.latency import LatencyTracer
+from utils.geometry import RegionTable
+from utils.policy_engine import PolicyEngine
+from main import analyze_region, click_box, click_point, get_reader, ocr_preprocessor, prefilter, region_confidence, region_from_dict, region_states
 
 # -------------------------------
 # Config
 # -------------------------------
 RUN_DIR = Path("debug_runs/run_latest")  # set to your run folder
-DEBUG_OVERLAY = True
+MONITOR = 2                 # change monitor index if needed
+DEBUG_OVERLAY = True        # draws in this process; prefer PUBLISH_FEED + tools/feed_viewer.py
+OVERLAY_WIDTH = 1280        # px width of the debug preview (frames are scaled down to it)
+OVERLAY_MAX_FPS = 5.0       # preview refresh cap, independent of MATCH_INTERVAL
+PUBLISH_FEED = False        # publish frames + results to shared memory for observers
 EMERGENCY_STOP_KEY = "esc"  # press to stop the runner
 CLICK_ENABLED = False       # set True to execute clicks
+CLICK_COOLDOWN = 1.0        # seconds between clicks on one region without policies (click.cooldown overrides)
 MATCH_INTERVAL = 0.5        # seconds between frame analyses
+FRAME_BUDGET = 0.4          # seconds of analysis per frame; slow low-priority regions go stale
+CAPTURE_MARGIN = 16         # px around the regions' bounding box to capture
+EVENT_LOG = False           # append per-tick region events to <run_dir>/live/events.bin
+POLICY_FILE = Path("policy.yaml")  # clicks follow these policies when the file exists
+RELOAD_INTERVAL = 1.0       # seconds between checks of regions.yaml / policy.yaml
+TRACE_FILE = None           # Chrome trace-event JSON of the stage timings, written on exit
 
 # -------------------------------
-# Load regions from YAML
+# Live runner loop
 # -------------------------------
-def load_regions_yaml(run_dir: Path):
-    yaml_file = run_dir / "regions.yaml"
-    regions = []
-    if yaml_file.exists():
-        with open(yaml_file, "r") as f:
-            data = yaml.safe_load(f)
-        for r in data:
-            regions.append(
-                Region(
-                    name=r.get("name"),
-                    rect=r.get("rect"),
-                    type=r.get("type","template"),
-                    template_image=r.get("template_image"),
-                    click=r.get("click"),
-                    annotation=r.get("annotation","")
-                )
-            )
-    else:
-        print(f"⚠️ No regions.yaml found in {run_dir}")
-    return regions
-
-regions = load_regions_yaml(RUN_DIR)
-if not regions:
-    print("No regions loaded. Exiting.")
-    exit(1)
+def feed_results(regions):
+    """Per-region results published with each frame (JSON-serializable)."""
+    results = []
+    for r in regions:
+        match = None
+        if r.template_match_loc is not None and r.template_size is not None:
+            match = [*map(int, r.template_match_loc), *map(int, r.template_size)]
+        results.append({
+            "name": r.name,
+            "rect": [int(v) for v in r.rect],
+            "type": r.type,
+            "matched": bool(r.matched),
+            "confidence": float(region_confidence(r)),
+            "match": match,
+        })
+    return results
 
-# -------------------------------
-# Screen capture setup
-# -------------------------------
-sct = mss.mss()
-monitor = sct.monitors[2]  # change monitor index if needed
 
-# -------------------------------
-# Live runner loop
-# -------------------------------
-try:
-    while True:
-        # Emergency stop
-        if pyautogui.keyDown(EMERGENCY_STOP_KEY):
-            print("Emergency stop pressed!")
-            break
-
-        # Capture screen
-        frame = np.array(sct.grab(monitor))
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
-
-        # Analyze each region
-        for r in regions:
-            analyze_region(frame, r, RUN_DIR, ocr_reader=reader)
-
-            # Optional click execution
-            if CLICK_ENABLED and r.matched and r.click:
-                x, y, w, h = r.rect
-                offset = r.click.get("offset", [0,0])
-
-                # Use template match location for template/hybrid types
-                if r.type in ["template", "hybrid"] and r.template_match_loc and r.template_size:
-                    match_x, match_y = r.template_match_loc
-                    tmpl_w, tmpl_h = r.template_size
-                    # Calculate center of matched template
-                    cx = x + match_x + tmpl_w // 2
-                    cy = y + match_y + tmpl_h // 2
-                else:
-                    # Fallback to region center for OCR-only or when no match
-                    mode = r.click.get("mode", "center")
-                    cx, cy = (x + w//2, y + h//2) if mode=="center" else (x, y)
-
-                cx += offset[0]; cy += offset[1]
-                pyautogui.click(cx, cy)
-                print(f"Clicked {r.name} at {cx},{cy}")
-
-        # Draw debug overlay
-        if DEBUG_OVERLAY:
-            overlay_frame = draw_debug_overlay(frame, regions)
-            cv2.imshow("Live Debug Overlay", overlay_frame)
-
-        # Exit on 'q' key
-        if cv2.waitKey(1) & 0xFF == ord("q"):
-            break
-
-        # Sleep to reduce CPU load
-        time.sleep(MATCH_INTERVAL)
-
-finally:
-    cv2.destroyAllWindows()
+def capture_plan(regions, capture):
+    """Only grab the area the regions cover."""
+    table = RegionTable.from_regions(regions)
+    return table.bounding_rect(CAPTURE_MARGIN, capture.monitor["width"], capture.monitor["height"])
+
+
+def queue_click(actions, region, frame, reason, cooldown, trace, tracer, origin=(0, 0)):
+    """
+    Hand a click on region to the executor; the trace gets its click mark
+    when it happens. origin is the monitor's top-left on the virtual screen,
+    which pyautogui coordinates are relative to.
+    """
+    cx, cy = click_point(region)
+    cx += origin[0]; cy += origin[1]
+    box = click_box(region)
+    if box is not None:
+        box = (box[0] + origin[0], box[1] + origin[1], box[2], box[3])
+    queued = actions.submit(ClickAction(
+        region.name, cx, cy, frame, reason, cooldown, box=box,
+        on_done=lambda t: tracer.click(trace, t),
+    ))
+    if queued:
+        print(f"{reason}: click {region.name} at {cx},{cy}")
+
+
+def load_policy_engine(policy_file=POLICY_FILE):
+    if not policy_file.exists():
+        return None
+    with open(policy_file, "r") as f:
+        return PolicyEngine((yaml.safe_load(f) or {}).get("policies", []))
+
+
+def run(run_dir=RUN_DIR, monitor=MONITOR, replay=None, realtime=True, headless=False,
+        trace_file=TRACE_FILE):
+    capture = open_capture(monitor, replay=replay, realtime=realtime)
+    origin = (capture.monitor["left"], capture.monitor["top"])  # of click coordinates
+    clicks = NullClickSink() if replay else PyAutoGuiClickSink(CLICK_ENABLED, EMERGENCY_STOP_KEY)
+    actions = ActionExecutor(clicks)
+    policy_engine = load_policy_engine()
+
+    # regions.yaml / policy.yaml edits are applied between frames
+    config = HotReloader(
+        run_dir, region_from_dict,
+        policy_engine=policy_engine,
+        policy_path=POLICY_FILE if policy_engine else None,
+        frame_size=(capture.monitor["width"], capture.monitor["height"]),
+        interval=RELOAD_INTERVAL,
+    )
+    regions = config.regions
+    if not regions:
+        print("No regions loaded. Exiting.")
+        sys.exit(1)
+
+    plan = capture_plan(regions, capture)
+    if plan is None:
+        print("Regions lie outside the monitor. Exiting.")
+        sys.exit(1)
+    print(f"Capturing {plan} of {capture.monitor['width']}x{capture.monitor['height']}")
+    reader = get_reader()
+    feed = FramePublisher((capture.monitor["width"], capture.monitor["height"])) if PUBLISH_FEED else None
+    events = EventLogWriter(Path(run_dir) / "live") if EVENT_LOG else None
+    tick = events.last_frame + 1 if events else 0
+    budget = FrameBudget(FRAME_BUDGET, policy_engine=policy_engine)
+    overlay = PreviewOverlay(OVERLAY_WIDTH, OVERLAY_MAX_FPS, click_point) if DEBUG_OVERLAY and not headless else None
+    tracer = LatencyTracer()
+    started = time.perf_counter()
+
+    try:
+        while True:
+            # Emergency stop
+            if actions.stopped or clicks.stop_requested():
+                actions.stop()
+                print("Emergency stop pressed!")
+                break
+
+            # Pick up config edits; unchanged regions keep their state
+            if config.poll():
+                regions = config.regions
+                plan = capture_plan(regions, capture) or plan
+                print(f"Capturing {plan}")
+
+            # Capture screen (BGR / gray are converted lazily per region)
+            frame = capture.grab_frame(plan)
+            if frame is None:
+                print("Replay finished")
+                break
+            trace = tracer.begin(frame)
+            trace.mark("capture", time.perf_counter())
+
+            # Analyze regions by priority within the frame budget
+            report = budget.run(regions, lambda r: analyze_region(frame, r, run_dir, ocr_reader=reader))
+            trace.mark("analyze", time.perf_counter())
+            if report.degraded:
+                print(f"⚠️ {report}")
+
+            decision = policy_engine.evaluate(region_states(regions)) if policy_engine else None
+            trace.mark("policy", time.perf_counter())
+
+            # Without policies every freshly matched region with a click is clicked
+            if policy_engine is None:
+                for r in regions:
+                    if r.matched and r.click and not r.stale:
+                        queue_click(actions, r, frame, r.name,
+                                    r.click.get("cooldown", CLICK_COOLDOWN), trace, tracer, origin)
+
+            elif decision is not None:
+                action = decision["action"]
+                if action.get("type") == "stop":
+                    actions.stop()  # nothing queued may still click
+                    print(f"Stop policy '{decision['policy']}' fired")
+                    break
+                if action.get("type") == "click":
+                    region = next(r for r in regions if r.name == decision["region"])
+                    queue_click(actions, region, frame, decision["policy"],
+                                action.get("cooldown", 0.0), trace, tracer, origin)
+
+            tracer.end(trace)
+
+            if events:
+                fired = {decision["region"]} if decision is not None else None
+                events.write_regions(tick, [r for r in regions if not r.stale], fired)
+            if feed:
+                feed.publish(frame.source, feed_results(regions), frame.origin, time.time())
+            tick += 1
+
+            # Draw debug overlay
+            if overlay:
+                if overlay.due():
+                    preview = overlay.render(frame.source, regions, frame.origin)
+                    cv2.imshow("Live Debug Overlay", preview)
+
+                # Exit on 'q' key
+                if cv2.waitKey(1) & 0xFF == ord("q"):
+                    break
+
+            # Sleep to reduce CPU load (a fast replay runs flat out)
+            if realtime:
+                time.sleep(MATCH_INTERVAL)
+
+    finally:
+        actions.close(wait=not actions.stopped)
+        clicks.close()
+        elapsed = time.perf_counter() - started
+        if overlay:
+            cv2.destroyAllWindows()
+        capture.close()
+        if events:
+            events.close()
+        if feed:
+            feed.close()
+        frames = capture.captured
+        print(f"{frames} frames in {elapsed:.1f}s "
+              f"({frames / elapsed if elapsed else 0.0:.1f} fps), {len(clicks.clicks)} clicks")
+        print(tracer.summary())
+        print(actions.summary())
+        if trace_file:
+            tracer.write_chrome_trace(trace_file)
+            print(f"Trace written to {trace_file}")
+        print(budget.summary())
+        if overlay:
+            print(overlay.report())
+        if any(r.prefilter for r in regions):
+            print(prefilter.stats.report())
+        if ocr_preprocessor.stats.regions:
+            print(ocr_preprocessor.stats.report())
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    opts = dict(a[2:].partition("=")[::2] for a in sys.argv[1:] if a.startswith("--"))
+    run(
+        Path(args[0]) if args else RUN_DIR,
+        replay=Path(opts["replay"]) if opts.get("replay") else None,
+        realtime="fast" not in opts,
+        headless="headless" in opts,
+        trace_file=opts.get("trace") or TRACE_FILE,
+    )
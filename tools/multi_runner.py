@@ -0,0 +1,303 @@
+# multi_runner.py
+"""
+Host several independent bot instances in one process.
+
+Each instance has its own monitor or window rect, regions.yaml, policy file
+and cooldown state. All instances share the OCR model, the template cache
+and one worker pool. An earliest-deadline-first scheduler hands the pool to
+whichever instance is most overdue, so every instance keeps close to its
+target rate even when the pool is saturated. Clicks of every instance go
+through one ActionExecutor, so they never block a pool worker and never
+interleave on the mouse.
+
+    python -m tools.multi_runner config/instances.yaml
+"""
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import yaml
+
+from automation.actions import ActionExecutor, ClickAction, PyAutoGuiClickSink
+from capture.screen_capture import ScreenCapture
+from main import analyze_region, click_box, click_point, get_reader, region_from_dict, region_states
+from utils.config_watcher import HotReloader
+from utils.frame_budget import FRAME_BUDGET, FrameBudget
+from utils.geometry import RegionTable
+from utils.policy_engine import PolicyEngine
+
+# -------------------------------
+# Config
+# -------------------------------
+CLICK_ENABLED = False       # set True to execute clicks
+EMERGENCY_STOP_KEY = "esc"  # press to stop every instance
+DEFAULT_INTERVAL = 0.5      # seconds between analyses per instance
+DEFAULT_WORKERS = 4
+STATS_INTERVAL = 10.0       # seconds between rate reports
+RELOAD_INTERVAL = 1.0       # seconds between checks of each instance's config files
+CAPTURE_MARGIN = 16         # px around the regions' bounding box to capture
+
+
+# -------------------------------
+# Shared OCR reader
+# -------------------------------
+class LockedReader:
+    """
+    Serializes readtext() calls so one EasyOCR model can be shared by all
+    worker threads.
+    """
+
+    def __init__(self, reader):
+        self.reader = reader
+        self._lock = threading.Lock()
+
+    def readtext(self, img, **kwargs):
+        with self._lock:
+            return self.reader.readtext(img, **kwargs)
+
+
+# -------------------------------
+# Bot instance
+# -------------------------------
+class BotInstance:
+    def __init__(self, name, run_dir, policies, monitor=1, interval=DEFAULT_INTERVAL,
+                 policy_path=None, frame_budget=FRAME_BUDGET):
+        self.name = name
+        self.run_dir = Path(run_dir)
+        self.policy_engine = PolicyEngine(policies)
+        self.interval = float(interval)
+        self.budget = FrameBudget(frame_budget, policy_engine=self.policy_engine)
+
+        self.capture = ScreenCapture(monitor=monitor)
+        # Region rects are relative to the captured area; clicks are not.
+        self.origin = (self.capture.monitor["left"], self.capture.monitor["top"])
+
+        # regions.yaml / policy edits are picked up between ticks
+        self.config = HotReloader(
+            self.run_dir, region_from_dict,
+            policy_engine=self.policy_engine, policy_path=policy_path,
+            frame_size=(self.capture.monitor["width"], self.capture.monitor["height"]),
+            interval=RELOAD_INTERVAL,
+        )
+        self.regions = self.config.regions
+        self._update_plan()
+
+        # scheduling state
+        self.next_due = time.monotonic()
+        self.busy = False
+        self.stopped = False
+
+        # stats
+        self.ticks = 0
+        self.busy_time = 0.0
+        self.max_lag = 0.0
+
+    def _update_plan(self):
+        # Only grab the part of the monitor / window the regions cover
+        self.plan = RegionTable.from_regions(self.regions).bounding_rect(
+            CAPTURE_MARGIN, self.capture.monitor["width"], self.capture.monitor["height"]
+        )
+
+    def reload(self):
+        """Apply config edits; only called while no tick is in flight."""
+        if self.config.poll():
+            self.regions = self.config.regions
+            self._update_plan()
+
+    @classmethod
+    def from_config(cls, cfg, base_dir=Path(".")):
+        policy_path = base_dir / cfg.get("policy", "policy.yaml")
+        with open(policy_path, "r") as f:
+            policies = (yaml.safe_load(f) or {}).get("policies", [])
+
+        monitor = cfg.get("monitor", 1)
+        if "rect" in cfg:
+            left, top, width, height = cfg["rect"]
+            monitor = {"left": left, "top": top, "width": width, "height": height}
+
+        return cls(
+            name=cfg.get("name", "<unnamed>"),
+            run_dir=base_dir / cfg["run_dir"],
+            policies=policies,
+            monitor=monitor,
+            interval=cfg.get("interval", DEFAULT_INTERVAL),
+            policy_path=policy_path,
+            frame_budget=cfg.get("frame_budget", FRAME_BUDGET),
+        )
+
+    def tick(self, frame, ocr_reader, actions):
+        """
+        Analyze one frame and act on the policy decision; clicks are queued
+        to `actions` (an ActionExecutor) under "<instance>/<region>".
+        Runs on a pool worker; returns the fired action (or None).
+        """
+        report = self.budget.run(
+            self.regions, lambda r: analyze_region(frame, r, self.run_dir, ocr_reader=ocr_reader)
+        )
+        if report.degraded:
+            print(f"[{self.name}] ⚠️ {report}")
+
+        decision = self.policy_engine.evaluate(region_states(self.regions))
+        if decision is None:
+            return None
+
+        action = decision["action"]
+        if action.get("type") == "stop":
+            print(f"[{self.name}] Stop policy '{decision['policy']}' fired")
+            self.stopped = True
+            actions.cancel(f"{self.name}/")
+
+        elif action.get("type") == "click" and not self.stopped:
+            region = next(r for r in self.regions if r.name == decision["region"])
+            cx, cy = click_point(region)
+            cx += self.origin[0]; cy += self.origin[1]
+            box = click_box(region)
+            if box is not None:
+                box = (box[0] + self.origin[0], box[1] + self.origin[1], box[2], box[3])
+            if actions.submit(ClickAction(f"{self.name}/{region.name}", cx, cy, frame,
+                                          decision["policy"], action.get("cooldown", 0.0), box)):
+                print(f"[{self.name}] {decision['policy']}: click {region.name} at {cx},{cy}")
+
+        return decision
+
+
+# -------------------------------
+# Scheduler
+# -------------------------------
+class MultiRunner:
+    """
+    Earliest-deadline-first scheduler over BotInstances.
+
+    Capture happens on the scheduler thread (mss handles are not thread
+    safe); analysis runs on the shared pool. An instance never has more
+    than one tick in flight, and a late instance is not allowed to burst to
+    catch up: its next deadline is pushed to now + interval.
+    """
+
+    def __init__(self, instances, workers=DEFAULT_WORKERS):
+        self.instances = instances
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bot")
+        self.reader = LockedReader(get_reader())
+        self.actions = ActionExecutor(PyAutoGuiClickSink(CLICK_ENABLED, EMERGENCY_STOP_KEY))
+        self._wake = threading.Event()
+        self._inflight = 0
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+
+    def _dispatch(self, inst, now):
+        inst.reload()
+        frame = inst.capture.grab_frame(inst.plan)
+        inst.busy = True
+        inst.max_lag = max(inst.max_lag, now - inst.next_due)
+        inst.next_due = max(inst.next_due + inst.interval, now)
+
+        with self._lock:
+            self._inflight += 1
+
+        t0 = time.monotonic()
+        future = self.pool.submit(inst.tick, frame, self.reader, self.actions)
+        future.add_done_callback(lambda f: self._finished(inst, f, t0))
+
+    def _finished(self, inst, future, t0):
+        inst.busy_time += time.monotonic() - t0
+        inst.ticks += 1
+        inst.busy = False
+        if future.exception() is not None:
+            print(f"[{inst.name}] tick failed: {future.exception()!r}")
+
+        with self._lock:
+            self._inflight -= 1
+        self._wake.set()
+
+    def step(self):
+        """
+        Dispatch every due instance the pool can take, most overdue first.
+        Returns the number of seconds until the next deadline.
+        """
+        now = time.monotonic()
+        ready = sorted(
+            (i for i in self.instances if not i.busy and not i.stopped),
+            key=lambda i: i.next_due,
+        )
+        for inst in ready:
+            if inst.next_due > now or self._inflight >= self.workers:
+                break
+            self._dispatch(inst, now)
+
+        idle = [i.next_due for i in self.instances if not i.busy and not i.stopped]
+        return max(min(idle, default=now + 0.05) - time.monotonic(), 0.0)
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        for inst in self.instances:
+            rate = inst.ticks / elapsed if elapsed else 0.0
+            avg = inst.busy_time / inst.ticks if inst.ticks else 0.0
+            print(
+                f"[{inst.name}] {rate:.2f} Hz (target {1.0 / inst.interval:.2f}) "
+                f"avg tick {avg * 1000:.0f} ms, max lag {inst.max_lag * 1000:.0f} ms, "
+                f"{inst.budget.skipped} stale results"
+                + (" [stopped]" if inst.stopped else "")
+            )
+
+    def run(self):
+        last_report = time.monotonic()
+        try:
+            while not all(i.stopped for i in self.instances):
+                # Emergency stop
+                if self.actions.stopped or self.actions.sink.stop_requested():
+                    self.actions.stop()
+                    print("Emergency stop pressed!")
+                    break
+
+                wait = self.step()
+                self._wake.wait(timeout=wait)
+                self._wake.clear()
+
+                if time.monotonic() - last_report >= STATS_INTERVAL:
+                    self.report()
+                    last_report = time.monotonic()
+        except KeyboardInterrupt:
+            print("Interrupted")
+        finally:
+            self.pool.shutdown(wait=True)
+            self.actions.close(wait=not self.actions.stopped)
+            self.actions.sink.close()
+            self.report()
+            print(self.actions.summary())
+
+
+# -------------------------------
+# Entry
+# -------------------------------
+def load_instances(config_path):
+    config_path = Path(config_path)
+    with open(config_path, "r") as f:
+        data = yaml.safe_load(f) or {}
+
+    base_dir = Path(data.get("base_dir", "."))
+    instances = [BotInstance.from_config(c, base_dir) for c in data.get("instances", [])]
+    return instances, data.get("workers", DEFAULT_WORKERS)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: multi_runner.py <instances.yaml>")
+        sys.exit(1)
+
+    instances, workers = load_instances(sys.argv[1])
+    if not instances:
+        print("No instances configured. Exiting.")
+        sys.exit(1)
+
+    for inst in instances:
+        print(f"[{inst.name}] {len(inst.regions)} regions from {inst.run_dir}, "
+              f"every {inst.interval:.2f}s")
+
+    MultiRunner(instances, workers=workers).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
 import yaml
 import numpy as np
@@ -11,32 +14,129 @@ REGION_MODES = {
     ord("4"): "yolo",
 }
 
+PREVIEW_WIDTH = 1600   # px; the editor shows the screen scaled down to this width
+REFRESH_KEY = ord("r")  # grab a new screen in the background
+BAND_COLOR = (0, 255, 0)
+REGION_COLOR = (255, 200, 0)
+
 class RegionEditor:
-    def __init__(self):
-        self.cap = ScreenCapture()
-        self.frame = self.cap.grab()
-        self.clone = self.frame.copy()
+    """
+    Draw regions on a screenshot. The window shows a downscaled preview;
+    mouse coordinates are mapped back to full resolution for the saved
+    rects and template crops. Saved regions are drawn once onto `base`,
+    and the rubber band is drawn onto `view` by restoring only the strips
+    of `base` under the previous band, so dragging never copies the frame.
+    """
+
+    def __init__(self, preview_width=PREVIEW_WIDTH):
+        self.preview_width = preview_width
+        # mss handles stay in the thread that made them, so every grab
+        # (including the first) runs on this one worker
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="grab")
+        self._local = threading.local()
+        self.refresh = None  # pending background grab
 
         self.start = None
         self.end = None
         self.drawing = False
+        self.band = None    # rubber band currently drawn on view, preview coords
+        self.dirty = True
 
         self.regions = {}
         self.current_mode = "template"
+        self.set_frame(self.pool.submit(self._grab).result())
+
+    # ---------------- Capture ----------------
+
+    def _grab(self):
+        if not hasattr(self._local, "cap"):
+            self._local.cap = ScreenCapture()
+        return self._local.cap.grab()
+
+    def set_frame(self, frame):
+        """Use a new full-resolution capture; rebuilds the preview layers."""
+        self.full = frame
+        h, w = frame.shape[:2]
+        self.scale = min(1.0, self.preview_width / w)
+        self.base = cv2.resize(frame, (round(w * self.scale), round(h * self.scale)),
+                               interpolation=cv2.INTER_AREA)
+        for name, region in self.regions.items():
+            self._draw_region(name, region)
+        self.view = self.base.copy()
+        self.band = None
+        self.dirty = True
+
+    def poll_refresh(self):
+        if self.refresh is not None and self.refresh.done():
+            frame, self.refresh = self.refresh.result(), None
+            self.set_frame(frame)
+            print("Capture refreshed")
+
+    # ---------------- Coordinates ----------------
+
+    def to_full(self, x, y):
+        h, w = self.full.shape[:2]
+        return (min(max(round(x / self.scale), 0), w), min(max(round(y / self.scale), 0), h))
+
+    def to_preview(self, x, y):
+        return (round(x * self.scale), round(y * self.scale))
+
+    # ---------------- Drawing ----------------
+
+    def _draw_region(self, name, region):
+        rect = region.get("rect")
+        if not rect:
+            return
+        p0 = self.to_preview(rect["x"], rect["y"])
+        p1 = self.to_preview(rect["x"] + rect["w"], rect["y"] + rect["h"])
+        cv2.rectangle(self.base, p0, p1, REGION_COLOR, 1)
+        cv2.putText(self.base, name, (p0[0], max(p0[1] - 4, 10)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, REGION_COLOR, 1)
+
+    def _restore_band(self):
+        """Copy base back over the edges of the drawn rubber band."""
+        if self.band is None:
+            return
+        (x0, y0), (x1, y1) = self.band
+        x0, x1 = sorted((x0, x1))
+        y0, y1 = sorted((y0, y1))
+        h, w = self.view.shape[:2]
+        t = 2  # line thickness
+        xa, xb = max(x0 - t, 0), min(x1 + t + 1, w)
+        ya, yb = max(y0 - t, 0), min(y1 + t + 1, h)
+        for sy, sx in (
+            (slice(ya, min(y0 + t + 1, h)), slice(xa, xb)),   # top
+            (slice(max(y1 - t, 0), yb), slice(xa, xb)),       # bottom
+            (slice(ya, yb), slice(xa, min(x0 + t + 1, w))),   # left
+            (slice(ya, yb), slice(max(x1 - t, 0), xb)),       # right
+        ):
+            self.view[sy, sx] = self.base[sy, sx]
+        self.band = None
+
+    def redraw(self):
+        self._restore_band()
+        if self.start and self.end:
+            cv2.rectangle(self.view, self.start, self.end, BAND_COLOR, 2)
+            self.band = (self.start, self.end)
+        self.dirty = False
 
     def mouse_cb(self, event, x, y, flags, param):
+        # only record the position; the main loop redraws once per frame
         if event == cv2.EVENT_LBUTTONDOWN:
             self.start = (x, y)
+            self.end = None
             self.drawing = True
 
         elif event == cv2.EVENT_MOUSEMOVE and self.drawing:
-            self.frame = self.clone.copy()
-            cv2.rectangle(self.frame, self.start, (x, y), (0, 255, 0), 2)
+            self.end = (x, y)
 
         elif event == cv2.EVENT_LBUTTONUP:
             self.end = (x, y)
             self.drawing = False
-            cv2.rectangle(self.frame, self.start, self.end, (0, 255, 0), 2)
+
+        else:
+            return
+        self.dirty = True
 
     def add_region(self):
         name = input("Region name: ").strip()
@@ -44,8 +144,8 @@ class RegionEditor:
             print("Invalid name")
             return
 
-        x1, y1 = self.start
-        x2, y2 = self.end
+        x1, y1 = self.to_full(*self.start)
+        x2, y2 = self.to_full(*self.end)
 
         rect = {
             "x": min(x1, x2),
@@ -61,7 +161,7 @@ class RegionEditor:
 
         if self.current_mode in ("template", "hybrid"):
             fname = f"{name}.png"
-            crop = self.clone[
+            crop = self.full[
                 rect["y"]:rect["y"] + rect["h"],
                 rect["x"]:rect["x"] + rect["w"]
             ]
@@ -82,31 +182,47 @@ class RegionEditor:
             region["class"] = input("YOLO class (e.g. button): ").strip()
 
         self.regions[name] = region
+        self._draw_region(name, region)
+        np.copyto(self.view, self.base)  # once per region, not per mouse move
+        self.band = None
+        self.start = self.end = None
+        self.dirty = True
         print(f"Added region '{name}' ({self.current_mode})")
 
     def run(self):
         cv2.namedWindow("Region Editor")
         cv2.setMouseCallback("Region Editor", self.mouse_cb)
-
-        while True:
-            cv2.imshow("Region Editor", self.frame)
-            key = cv2.waitKey(1) & 0xFF
-
-            if key in REGION_MODES:
-                self.current_mode = REGION_MODES[key]
-                print(f"Mode set to {self.current_mode}")
-
-            elif key == 13:  # Enter
-                if self.start and self.end:
-                    self.add_region()
-                    self.clone = self.frame.copy()
-
-            elif key == ord("s"):
-                with open("config/regions.yaml", "w") as f:
-                    yaml.dump({"regions": self.regions}, f)
-                print("Saved regions.yaml")
-
-            elif key == ord("q"):
-                break
-
-        cv2.destroyAllWindows()
+        shown = False
+
+        try:
+            while True:
+                self.poll_refresh()
+                if self.dirty or not shown:
+                    self.redraw()
+                    cv2.imshow("Region Editor", self.view)
+                    shown = True
+                key = cv2.waitKey(15) & 0xFF
+
+                if key in REGION_MODES:
+                    self.current_mode = REGION_MODES[key]
+                    print(f"Mode set to {self.current_mode}")
+
+                elif key == 13:  # Enter
+                    if self.start and self.end:
+                        self.add_region()
+
+                elif key == REFRESH_KEY:
+                    if self.refresh is None:
+                        self.refresh = self.pool.submit(self._grab)
+                        print("Refreshing capture...")
+
+                elif key == ord("s"):
+                    with open("config/regions.yaml", "w") as f:
+                        yaml.dump({"regions": self.regions}, f)
+                    print("Saved regions.yaml")
+
+                elif key == ord("q"):
+                    break
+        finally:
+            cv2.destroyAllWindows()
+            self.pool.shutdown(wait=False)
@@ -0,0 +1,99 @@
+# tune_thresholds.py
+"""
+Pick per-region thresholds from the tp / fp labels made in the replay viewer.
+
+Labels (<run_dir>/labels.jsonl) are joined with the run's cached per-frame
+confidences (tools.batch_analysis, computing whatever is missing), every
+distinct confidence is tried as a threshold, and hybrid regions are also
+tried under each aggregate mode. Prints precision / recall at the current
+and the best setting; --write stores the best ones in regions.yaml.
+
+    python -m tools.tune_thresholds <run_dir> [--write] [--min-precision=0.95] [--curves=pr.csv]
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from tools.batch_analysis import analyze_run
+from utils.threshold_tuner import ThresholdTuner, load_labels, write_thresholds
+
+
+def fmt(metrics):
+    if metrics is None:
+        return "      -"
+    return f"P {metrics['precision']:.3f} R {metrics['recall']:.3f} F1 {metrics['f1']:.3f}"
+
+
+def write_curves(path, curves, tuner):
+    with open(path, "w") as f:
+        f.write("region,aggregate,threshold,tp,fp,precision,recall,f1\n")
+        for k in range(len(curves["group"])):
+            region, mode = tuner.candidates[int(curves["group"][k])]
+            f.write(
+                f"{tuner.regions[region].get('name')},{mode or ''},"
+                f"{curves['threshold'][k]:.6f},{int(curves['tp'][k])},{int(curves['fp'][k])},"
+                f"{curves['precision'][k]:.6f},{curves['recall'][k]:.6f},{curves['f1'][k]:.6f}\n"
+            )
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    opts = dict(a[2:].partition("=")[::2] for a in sys.argv[1:] if a.startswith("--"))
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+
+    run_dir = Path(args[0])
+    yaml_file = run_dir / "regions.yaml"
+    labels_file = run_dir / "labels.jsonl"
+    for path in (yaml_file, labels_file):
+        if not path.exists():
+            print(f"Missing {path}")
+            sys.exit(1)
+
+    regions = yaml.safe_load(yaml_file.read_text()) or []
+    names = [r.get("name") for r in regions]
+    min_precision = float(opts["min-precision"]) if opts.get("min-precision") else None
+
+    t0 = time.perf_counter()
+    frames, region_idx, positive = load_labels(labels_file, names)
+    t_labels = time.perf_counter() - t0
+    print(f"{len(frames)} tp/fp labels loaded in {t_labels:.2f}s")
+
+    timeline = analyze_run(run_dir, regions)
+    if timeline["computed"]:
+        print(f"Analyzed {timeline['computed']} uncached frames")
+
+    t0 = time.perf_counter()
+    tuner = ThresholdTuner(regions, timeline["channels"])
+    results, curves = tuner.tune(frames, region_idx, positive, min_precision)
+    print(f"Swept {len(curves['group'])} thresholds in {time.perf_counter() - t0:.2f}s\n")
+
+    for i, r in enumerate(regions):
+        res = results.get(i)
+        if res is None:
+            n = int(np.count_nonzero(region_idx == i))
+            reason = "no labels" if not n else "no threshold reaches the precision target"
+            print(f"{r.get('name')}: {reason}")
+            continue
+        mode = f" aggregate={res['aggregate']}" if res["aggregate"] else ""
+        print(
+            f"{r.get('name')} ({res['labels']} labels)\n"
+            f"    current  threshold={r.get('threshold', 0.7):.3f}  {fmt(res['current'])}\n"
+            f"    best     threshold={res['threshold']:.3f}{mode}  {fmt(res)}"
+        )
+
+    if opts.get("curves"):
+        write_curves(opts["curves"], curves, tuner)
+        print(f"\nPR curves written to {opts['curves']}")
+
+    if "write" in opts:
+        write_thresholds(yaml_file, results, regions)
+        print(f"\nUpdated {len(results)} thresholds in {yaml_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import sys
+import time
 import yaml
 import cv2
 import numpy as np
@@ -11,10 +12,18 @@ from PyQt6.QtWidgets import (
     QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
     QListWidget, QListWidgetItem, QLineEdit, QTextEdit,
     QComboBox, QSpinBox, QGraphicsView, QGraphicsScene,
-    QGraphicsRectItem, QCheckBox, QMessageBox
+    QGraphicsRectItem, QCheckBox, QMessageBox, QGraphicsItemGroup,
+    QGraphicsEllipseItem, QGraphicsSimpleTextItem
 )
 
-import easyocr
+# Allow `python tools/ui_lab.py` as well as `python -m tools.ui_lab`
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from main import click_point, match_template_region
+from tools.confidence_timeline import ConfidenceTimeline
+from tools.lab_analysis import AnalysisThread, BatchThread, apply_result
+from utils.geometry import RegionTable
+from utils.region_linter import RegionLinter
 
 
 # ----------------------------
@@ -38,7 +47,16 @@ class Region:
         self.type = data.get("type", "ocr")
         self.rect = data.get("rect", [0, 0, 100, 100])
         self.template_image = data.get("template_image")
+        self.templates = data.get("templates") or {}  # classify: {label: path}
+        self.find_all = data.get("find_all", False)
+        self.max_matches = data.get("max_matches", 16)
+        self.prefilter = data.get("prefilter", False)
+        self.threshold = data.get("threshold", 0.7)
+        self.aggregate = data.get("aggregate", "mean")  # hybrid only
         self.ocr_text = data.get("ocr_text", "")
+        self.ocr_preprocess = data.get("ocr_preprocess")  # kept as written
+        self.ocr_match = data.get("ocr_match", "contains")
+        self.ocr_max_edits = data.get("ocr_max_edits", 0)
         self.click = data.get("click", {"mode": "center", "offset": [0, 0]})
         self.template_confidence = 0.0
         self.ocr_confidence = 0.0
@@ -49,8 +67,15 @@ class Region:
         self.template_match_loc = None  # (x_offset, y_offset) within the region rect
         self.template_size = None  # (width, height) of matched template
 
+        # find_all: every match above threshold, [(x_offset, y_offset, confidence)]
+        self.template_matches = []
+
+        # classify: best variant label and per-label confidence
+        self.label = None
+        self.label_scores = {}
+
     def to_dict(self):
-        return {
+        d = {
             "name": self.name,
             "annotation": self.annotation,
             "type": self.type,
@@ -59,6 +84,24 @@ class Region:
             "ocr_text": self.ocr_text,
             "click": self.click,
         }
+        if self.templates:
+            d["templates"] = self.templates
+        if self.find_all:
+            d["find_all"] = True
+            d["max_matches"] = self.max_matches
+        if self.prefilter:
+            d["prefilter"] = self.prefilter  # true or a mapping of cascade overrides
+        if self.threshold != 0.7:
+            d["threshold"] = self.threshold
+        if self.aggregate != "mean":
+            d["aggregate"] = self.aggregate
+        if self.ocr_match != "contains":
+            d["ocr_match"] = self.ocr_match
+        if self.ocr_max_edits:
+            d["ocr_max_edits"] = self.ocr_max_edits
+        if self.ocr_preprocess is not None:
+            d["ocr_preprocess"] = self.ocr_preprocess
+        return d
 
 
 # ----------------------------
@@ -80,6 +123,8 @@ class ImageView(QGraphicsView):
     def mousePressEvent(self, event):
         if self.parent.draw_mode:
             self.parent.start_rect(self.mapToScene(event.position().toPoint()))
+        else:
+            self.parent.select_region_at(self.mapToScene(event.position().toPoint()))
         super().mousePressEvent(event)
 
     def mouseMoveEvent(self, event):
@@ -93,6 +138,69 @@ class ImageView(QGraphicsView):
         super().mouseReleaseEvent(event)
 
 
+# ----------------------------
+# Retained region items
+# ----------------------------
+
+class RegionItem(QGraphicsItemGroup):
+    """
+    Persistent scene items for one region: outline, template match box,
+    click point and confidence label. sync() only moves and re-labels the
+    existing items, and does nothing if the region did not change.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.outline = QGraphicsRectItem()
+        self.match_box = QGraphicsRectItem()
+        self.match_box.setPen(QPen(QColor("red"), 2))
+        self.click_dot = QGraphicsEllipseItem(0, 0, 6, 6)
+        self.click_dot.setPen(QPen(QColor("red")))
+        self.click_dot.setBrush(QColor(255, 0, 0, 100))
+        self.label = QGraphicsSimpleTextItem()
+        self.label.setBrush(QColor("yellow"))
+        for item in (self.outline, self.match_box, self.click_dot, self.label):
+            self.addToGroup(item)
+        self.setZValue(1)
+        self._state = None
+
+    def sync(self, r, preview_clicks):
+        state = (
+            tuple(r.rect), r.type, r.matched, r.template_match_loc, r.template_size,
+            r.template_confidence, r.ocr_confidence, r.hybrid_confidence,
+            repr(r.click), preview_clicks,
+        )
+        if state == self._state:
+            return
+        self._state = state
+
+        x, y, w, h = r.rect
+        self.outline.setRect(x, y, w, h)
+        self.outline.setPen(QPen(QColor("green") if r.matched else QColor("cyan"), 2))
+
+        # Template match box
+        has_match = r.template_match_loc is not None and r.template_size is not None
+        if has_match:
+            mx, my = r.template_match_loc
+            tw, th = r.template_size
+            self.match_box.setRect(x + mx, y + my, tw, th)
+        self.match_box.setVisible(has_match)
+
+        # Click point
+        show_click = bool(preview_clicks and r.click)
+        if show_click:
+            cx, cy = click_point(r)
+            self.click_dot.setPos(cx - 3, cy - 3)
+        self.click_dot.setVisible(show_click)
+
+        # Confidence label
+        conf_text = f"OCR: {r.ocr_confidence:.2f} | Tmpl: {r.template_confidence:.2f}"
+        if r.type == "hybrid":
+            conf_text += f" | Final: {r.hybrid_confidence:.2f}"
+        self.label.setText(conf_text)
+        self.label.setPos(x, y - 20)
+
+
 # ----------------------------
 # Main UI Lab Window
 # ----------------------------
@@ -110,12 +218,31 @@ class UILabMainWindow(QMainWindow):
 
         self.idx = 0
         self.regions = []
+        self.table = RegionTable.from_regions([])  # spatial index over self.regions
+        self.linter = RegionLinter(base_dir=self.run_dir)  # re-lints only edited regions
         self.draw_mode = False
         self.temp_rect_item = None
         self.preview_clicks = True
 
-        # OCR reader (GPU auto-detect)
-        self.reader = easyocr.Reader(["en"], gpu=True)
+        # Retained scene: one pixmap item, one RegionItem per region
+        self.pixmap_item = None
+        self.region_items = []
+
+        # Region analysis runs on a worker thread (OCR model loads there too)
+        self.analysis = AnalysisThread(self.run_dir)
+        self.analysis.region_done.connect(self._on_region_analyzed)
+        self.analysis.finished.connect(self._on_analysis_finished)
+        self.analysis.status.connect(lambda msg: self.analysis_label.setText(msg))
+        self._analysis_gen = None
+        self._analysis_names = []
+        self._analysis_started = 0.0
+
+        # Whole-run analysis runs in a process pool, cached next to regions.yaml
+        self.batch = BatchThread(self.run_dir)
+        self.batch.progress.connect(self._on_batch_progress)
+        self.batch.finished.connect(self._on_batch_finished)
+        self.batch.status.connect(lambda msg: self.batch_label.setText(msg))
+        self._batch_running = False
 
         self._build_ui()
         self._load_regions()
@@ -143,9 +270,14 @@ class UILabMainWindow(QMainWindow):
             item.setData(Qt.ItemDataRole.UserRole, i)
             self.frame_list.addItem(item)
 
-        # Center: image
+        # Center: image, confidence timeline underneath
+        center = QVBoxLayout()
+        layout.addLayout(center, 3)
         self.view = ImageView(self)
-        layout.addWidget(self.view, 3)
+        center.addWidget(self.view, 4)
+        self.timeline = ConfidenceTimeline()
+        self.timeline.frame_clicked.connect(self.frame_list.setCurrentRow)
+        center.addWidget(self.timeline, 1)
 
         # Right: controls
         right = QVBoxLayout()
@@ -158,7 +290,7 @@ class UILabMainWindow(QMainWindow):
         self.name_edit = QLineEdit()
         self.annotation_edit = QTextEdit()
         self.type_combo = QComboBox()
-        self.type_combo.addItems(["ocr", "template", "hybrid"])
+        self.type_combo.addItems(["ocr", "template", "hybrid", "classify"])
 
         self.ocr_text_edit = QLineEdit()
         self.template_path_edit = QLineEdit()
@@ -199,6 +331,14 @@ class UILabMainWindow(QMainWindow):
         btn_ocr = QPushButton("Analyze Frame")
         btn_ocr.clicked.connect(self.update_region_analysis)
         right.addWidget(btn_ocr)
+        self.analysis_label = QLabel("Analysis: idle")
+        right.addWidget(self.analysis_label)
+        self.batch_btn = QPushButton("Analyze All Frames")
+        self.batch_btn.clicked.connect(self.analyze_all_frames)
+        right.addWidget(self.batch_btn)
+        self.batch_label = QLabel("Whole run: not analyzed")
+        self.batch_label.setWordWrap(True)
+        right.addWidget(self.batch_label)
         btn_template_overlay = QPushButton("Run Template Overlay")
         btn_template_overlay.clicked.connect(self.run_template_overlay)
         right.addWidget(btn_template_overlay)
@@ -208,11 +348,13 @@ class UILabMainWindow(QMainWindow):
         btns.addWidget(save_btn)
         right.addLayout(btns)
 
+        self.lint_label = QLabel("Lint: ok")
+        self.lint_label.setWordWrap(True)
+        right.addWidget(self.lint_label)
+
         self.preview_checkbox = QCheckBox("Preview Clicks")
         self.preview_checkbox.setChecked(True)
-        self.preview_checkbox.stateChanged.connect(
-            lambda s: setattr(self, "preview_clicks", bool(s))
-        )
+        self.preview_checkbox.stateChanged.connect(self._set_preview_clicks)
         right.addWidget(self.preview_checkbox)
 
         # Set first frame as selected (after all UI elements are created)
@@ -229,12 +371,25 @@ class UILabMainWindow(QMainWindow):
         self._load_frame()
 
     def _load_frame(self):
+        # Results for the previous frame are stale now
+        if self._analysis_gen is not None:
+            self.analysis.cancel()
+            self._analysis_gen = None
+            self.analysis_label.setText("Analysis: cancelled (frame changed)")
+
         img = cv2.imread(str(self.frames[self.idx]))
         self.current_img = img
-        self.view.scene().clear()
+        self.linter.set_image_size(img.shape[1], img.shape[0])
+        self._lint()
+
+        # The frame pixmap is only uploaded here, on frame change
         pix = QPixmap.fromImage(cv_to_qimage(img))
-        self.view.scene().addPixmap(pix)
+        if self.pixmap_item is None:
+            self.pixmap_item = self.view.scene().addPixmap(pix)
+        else:
+            self.pixmap_item.setPixmap(pix)
         self._draw_regions()
+        self.timeline.set_current(self.idx)
 
     # ---------------- Regions ----------------
 
@@ -256,11 +411,33 @@ class UILabMainWindow(QMainWindow):
         for r in self.regions:
             item = QListWidgetItem(r.name)
             self.region_list.addItem(item)
+        self.table = RegionTable.from_regions(self.regions)
+        self._lint()
+
+    def _lint(self):
+        """Lint the regions as they would be saved; cheap enough for every edit."""
+        if not hasattr(self, "lint_label"):
+            return
+        messages = self.linter.lint([r.to_dict() for r in self.regions])
+        errors = sum(m.level == "error" for m in messages)
+        if not messages:
+            self.lint_label.setText("Lint: ok")
+            return
+        shown = "\n".join(str(m) for m in messages[:8])
+        more = f"\n… {len(messages) - 8} more" if len(messages) > 8 else ""
+        self.lint_label.setText(f"Lint: {errors} errors, {len(messages) - errors} warnings\n{shown}{more}")
+
+    def select_region_at(self, pos):
+        """Select the smallest region under a scene position."""
+        hits = self.table.hit_test(pos.x(), pos.y())
+        if len(hits):
+            self.region_list.setCurrentRow(int(hits[0]))
 
     def _select_region(self, item):
         if not item:
             return
         r = self.regions[self.region_list.row(item)]
+        self.timeline.set_selected(r.name)
         self.name_edit.setText(r.name)
         self.annotation_edit.setText(r.annotation)
         self.type_combo.setCurrentText(r.type)
@@ -307,93 +484,24 @@ class UILabMainWindow(QMainWindow):
             self.rect_w.value(),
             self.rect_h.value()
         ]
-        self._draw_regions()
-
-    def _draw_confidence_overlay(self, frame):
-        for r in self.regions:
-            x, y, w, h = r.rect
-            conf_text = ""
-            if r.type in ["ocr", "hybrid"]:
-                conf_text += f"OCR: {r.ocr_confidence:.2f} "
-            if r.type in ["template", "hybrid"]:
-                conf_text += f"Tmpl: {r.template_confidence:.2f} "
-            if r.type=="hybrid":
-                conf_text += f"Final: {r.hybrid_confidence:.2f}"
-
-            label = self.view.scene().addText(conf_text)
-            label.setDefaultTextColor(QColor("yellow"))
-            label.setPos(x, y-20)
+        self.table.set_rect(self.region_list.row(item), r.rect)
+        self._update_region_item(self.region_list.row(item))
+        self._lint()
 
     def run_template_overlay(self):
         """
         For each region with a template, perform template matching and
-        draw the match result as a rectangle over the frame.
+        show the match result as a rectangle over the frame.
         """
         if not hasattr(self, "current_img"):
             return
 
-        frame = self.current_img.copy()
-        self.view.scene().clear()
-        pix = QPixmap.fromImage(cv_to_qimage(frame))
-        self.view.scene().addPixmap(pix)
-
         for r in self.regions:
             if not r.template_image:
                 continue
+            r.template_confidence = match_template_region(self.current_img, r, self.run_dir)
 
-            # Load template
-            tmpl_path = (self.run_dir / r.template_image).resolve()
-            tmpl = cv2.imread(str(tmpl_path), cv2.IMREAD_UNCHANGED)
-            if tmpl is None:
-                print(f"⚠️ Template not found for region {r.name}")
-                continue
-
-            # ROI from region rect
-            x, y, w, h = r.rect
-            roi = frame[y:y+h, x:x+w]
-
-            # Convert to grayscale for robustness
-            roi_gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-            tmpl_gray = cv2.cvtColor(tmpl, cv2.COLOR_BGR2GRAY)
-
-            # Run template match
-            res = cv2.matchTemplate(roi_gray, tmpl_gray, cv2.TM_CCOEFF_NORMED)
-            _, max_val, _, max_loc = cv2.minMaxLoc(res)
-            r.template_confidence = float(max_val)
-
-            # Store match location and template size
-            r.template_match_loc = max_loc
-            r.template_size = (tmpl.shape[1], tmpl.shape[0])
-
-            # Draw template match rectangle
-            top_left = (x + max_loc[0], y + max_loc[1])
-            bottom_right = (top_left[0] + tmpl.shape[1], top_left[1] + tmpl.shape[0])
-            rect_item = self.view.scene().addRect(
-                top_left[0], top_left[1],
-                tmpl.shape[1], tmpl.shape[0],
-                QPen(QColor("red"), 2)
-            )
-
-            # Draw click point if enabled
-            if self.preview_clicks and r.click:
-                offset = r.click.get("offset", [0, 0])
-                # Use template match location
-                match_x, match_y = r.template_match_loc
-                tmpl_w, tmpl_h = r.template_size
-                # Calculate center of matched template
-                cx = x + match_x + tmpl_w // 2
-                cy = y + match_y + tmpl_h // 2
-                cx += offset[0]
-                cy += offset[1]
-                self.view.scene().addEllipse(cx-3, cy-3, 6, 6,
-                                            QPen(QColor("blue")),
-                                            QColor(0,0,255,100))
-
-            # Add confidence label
-            label_text = f"{r.name} conf: {r.template_confidence:.2f}"
-            label_item = self.view.scene().addText(label_text)
-            label_item.setDefaultTextColor(QColor("yellow"))
-            label_item.setPos(x, y-20)
+        self._draw_regions()
 
     def finish_rect(self):
         rect = self.temp_rect_item.rect()
@@ -407,98 +515,101 @@ class UILabMainWindow(QMainWindow):
         })
         self.regions.append(r)
         self._refresh_region_list()
+
+        # Keep the drawn rect inside the frame
+        img_h, img_w = self.current_img.shape[:2]
+        r.rect = [int(v) for v in self.table.clamp(img_w, img_h)[-1]]
+        self.table.set_rect(len(self.regions) - 1, r.rect)
         self._draw_regions()
+        self._lint()
+
+    def _sync_region_items(self):
+        """Create / remove RegionItems so there is one per region."""
+        scene = self.view.scene()
+        while len(self.region_items) < len(self.regions):
+            item = RegionItem()
+            scene.addItem(item)
+            self.region_items.append(item)
+        while len(self.region_items) > len(self.regions):
+            scene.removeItem(self.region_items.pop())
+
+    def _update_region_item(self, index):
+        self._sync_region_items()
+        self.region_items[index].sync(self.regions[index], self.preview_clicks)
 
     def _draw_regions(self):
-        self.view.scene().clear()
-        pix = QPixmap.fromImage(cv_to_qimage(self.current_img))
-        self.view.scene().addPixmap(pix)
+        self._sync_region_items()
+        for r, item in zip(self.regions, self.region_items):
+            item.sync(r, self.preview_clicks)
 
-        for r in self.regions:
-            x, y, w, h = r.rect
-            color = QColor("green") if r.matched else QColor("cyan")
-            rect_item = QGraphicsRectItem(x, y, w, h)
-            rect_item.setPen(QPen(color, 2))
-            self.view.scene().addItem(rect_item)
-
-            # Click point
-            if self.preview_clicks and r.click:
-                offset = r.click.get("offset", [0,0])
-
-                # Use template match location for template/hybrid types
-                if r.type in ["template", "hybrid"] and r.template_match_loc and r.template_size:
-                    match_x, match_y = r.template_match_loc
-                    tmpl_w, tmpl_h = r.template_size
-                    # Calculate center of matched template
-                    cx = x + match_x + tmpl_w // 2
-                    cy = y + match_y + tmpl_h // 2
-                else:
-                    # Fallback to region center for OCR-only or when no match
-                    mode = r.click.get("mode", "center")
-                    cx, cy = (x + w//2, y + h//2) if mode=="center" else (x, y)
-
-                cx += offset[0]; cy += offset[1]
-                self.view.scene().addEllipse(cx-3, cy-3, 6, 6,
-                                            QPen(QColor("red")),
-                                            QColor(255,0,0,100))
-
-            # Confidence overlay
-            conf_text = f"OCR: {r.ocr_confidence:.2f} | Tmpl: {r.template_confidence:.2f}"
-            if r.type == "hybrid":
-                conf_text += f" | Final: {r.hybrid_confidence:.2f}"
-            label = self.view.scene().addText(conf_text)
-            label.setDefaultTextColor(QColor("yellow"))
-            label.setPos(x, y-20)
+    def _set_preview_clicks(self, state):
+        self.preview_clicks = bool(state)
+        self._draw_regions()
 
     def update_region_analysis(self):
-        frame = self.current_img.copy()
+        """
+        Queue analysis of every region on the current frame. Results stream
+        back through _on_region_analyzed as each region finishes.
+        """
+        self._analysis_names = [r.name for r in self.regions]
+        self._analysis_started = time.perf_counter()
+        self._analysis_gen = self.analysis.submit(self.current_img, self.regions, self.frames[self.idx])
+        self.analysis_label.setText(f"Analysis: 0/{len(self.regions)} regions")
 
-        for r in self.regions:
-            # ---- OCR confidence ----
-            if r.type in ["ocr", "hybrid"]:
-                result = self.reader.readtext(frame[r.rect[1]:r.rect[1]+r.rect[3],
-                                                r.rect[0]:r.rect[0]+r.rect[2]])
-                r.ocr_confidence = max([conf for _, text, conf in result], default=0.0)
-
-            # ---- Template confidence ----
-            if r.type in ["template", "hybrid"] and r.template_image:
-                tmpl_path = (self.run_dir / r.template_image).resolve()
-                tmpl = cv2.imread(str(tmpl_path), cv2.IMREAD_UNCHANGED)
-                if tmpl is None:
-                    r.template_confidence = 0.0
-                else:
-                    # Make sure ROI is large enough
-                    x, y, w, h = r.rect
-                    roi = self.current_img[y:y+h, x:x+w]
-                    if roi.shape[0] < tmpl.shape[0] or roi.shape[1] < tmpl.shape[1]:
-                        print(f"ROI smaller than template for {r.name}")
-                        r.template_confidence = 0.0
-                    else:
-                        # Convert both to grayscale for consistent matching
-                        roi_gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-                        tmpl_gray = cv2.cvtColor(tmpl, cv2.COLOR_BGR2GRAY)
-                        res = cv2.matchTemplate(roi_gray, tmpl_gray, cv2.TM_CCOEFF_NORMED)
-                        _, max_val, _, max_loc = cv2.minMaxLoc(res)
-                        r.template_confidence = float(max_val)
-                        # Store match location and template size
-                        r.template_match_loc = max_loc
-                        r.template_size = (tmpl.shape[1], tmpl.shape[0])
-                        print(f"{r.name} ROI size: {roi.shape}, Template size: {tmpl.shape}, Confidence: {r.template_confidence}")
-
-            # ---- Hybrid aggregation ----
-            if r.type == "hybrid":
-                r.hybrid_confidence = (r.ocr_confidence + r.template_confidence) / 2.0
-
-            # Matched threshold (example: 0.7)
-            threshold = 0.7
-            if r.type == "hybrid":
-                r.matched = r.hybrid_confidence >= threshold
-            elif r.type == "ocr":
-                r.matched = r.ocr_confidence >= threshold
-            elif r.type == "template":
-                r.matched = r.template_confidence >= threshold
+    def _on_region_analyzed(self, generation, index, result, seconds):
+        if generation != self._analysis_gen:
+            return
+        # Regions may have been added/removed while the job was running
+        if index >= len(self.regions) or self.regions[index].name != self._analysis_names[index]:
+            return
 
-        self._draw_regions()
+        apply_result(self.regions[index], result)
+        self.analysis_label.setText(
+            f"Analysis: {index + 1}/{len(self._analysis_names)} regions, "
+            f"{self._analysis_names[index]} took {seconds * 1000:.0f} ms"
+        )
+        self._update_region_item(index)
+
+    def _on_analysis_finished(self, generation, seconds, cancelled):
+        if generation != self._analysis_gen:
+            return
+        self._analysis_gen = None
+        latency = time.perf_counter() - self._analysis_started
+        self.analysis_label.setText(
+            f"Analysis: {len(self._analysis_names)} regions in {seconds * 1000:.0f} ms "
+            f"(latency {latency * 1000:.0f} ms)"
+            + (" [cancelled]" if cancelled else "")
+        )
+
+    def analyze_all_frames(self):
+        """
+        Compute every region's confidences over the whole run. Cached
+        results are reused; only changed regions / new frames are analyzed.
+        Pressing the button again while running cancels.
+        """
+        if self._batch_running:
+            self.batch.cancel()
+            self.batch_label.setText("Whole run: cancelling…")
+            return
+        self._batch_running = True
+        self.batch_btn.setText("Cancel Whole-Run Analysis")
+        self.batch_label.setText("Whole run: checking cache…")
+        self.batch.submit(self.regions)
+
+    def _on_batch_progress(self, done, total):
+        self.batch_label.setText(f"Whole run: {done}/{total} frames to analyze")
+
+    def _on_batch_finished(self, timeline):
+        self._batch_running = False
+        self.batch_btn.setText("Analyze All Frames")
+        if timeline is not None:
+            self.timeline.set_timeline(timeline)
+            self.timeline.set_current(self.idx)
+
+    def closeEvent(self, event):
+        self.analysis.stop()
+        self.batch.stop()
+        super().closeEvent(event)
 
     # ---------------- Entry ----------------
 
@@ -0,0 +1,182 @@
+import os
+import time
+from pathlib import Path
+
+import yaml
+
+from utils.hashing import region_key
+from utils.region_linter import RegionLinter
+
+# Region settings that can change without resetting the region's state
+LIVE_KEYS = ("threshold", "click", "annotation", "aggregate")
+
+
+# -----------------------------
+# File polling
+# -----------------------------
+
+class FileWatcher:
+    """
+    Polls files for changes by (mtime, size). Cheap enough to call every
+    tick; `interval` limits how often the files are actually stat()ed.
+    """
+
+    def __init__(self, paths, interval=1.0):
+        self.paths = [Path(p) for p in paths if p is not None]
+        self.interval = interval
+        self._last_poll = 0.0
+        self._stamps = {p: self._stamp(p) for p in self.paths}
+
+    @staticmethod
+    def _stamp(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def changed(self):
+        """Paths that changed since the last call (empty between intervals)."""
+        now = time.monotonic()
+        if now - self._last_poll < self.interval:
+            return []
+        self._last_poll = now
+
+        changed = []
+        for p in self.paths:
+            stamp = self._stamp(p)
+            if stamp != self._stamps[p]:
+                self._stamps[p] = stamp
+                changed.append(p)
+        return changed
+
+
+# -----------------------------
+# Hot reload
+# -----------------------------
+
+class HotReloader:
+    """
+    Keeps a runner's regions and policies in sync with regions.yaml and
+    policy.yaml.
+
+    Call poll() between frames. Edits are linted first and rejected as a
+    whole if the RegionLinter reports an error (or the YAML does not parse), so
+    a half-saved file never reaches the runner. Regions whose analysis
+    settings and templates are unchanged keep their Region object, and with
+    it their runtime / tracking state; threshold, click and the like are
+    updated in place. The PolicyEngine is kept too, so cooldowns of
+    policies that keep their name survive.
+    """
+
+    def __init__(self, run_dir, region_factory, policy_engine=None, policy_path=None,
+                 frame_size=None, interval=1.0):
+        self.run_dir = Path(run_dir)
+        self.regions_path = self.run_dir / "regions.yaml"
+        self.policy_path = Path(policy_path) if policy_path else None
+        self.region_factory = region_factory  # dict -> Region or None (main.region_from_dict)
+        self.policy_engine = policy_engine
+        self.frame_size = frame_size  # (w, h) used for the bounds lint
+        self.watcher = FileWatcher([self.regions_path, self.policy_path], interval)
+        # only regions edited since the last reload are re-linted
+        w, h = self.frame_size or (1 << 30, 1 << 30)
+        self.linter = RegionLinter(w, h, base_dir=self.run_dir)
+
+        self.regions = []
+        self._keys = {}  # region name -> region_key of the loaded definition
+        self.reload_regions(initial=True)
+
+    # ---------------- Regions ----------------
+
+    def _read_yaml(self, path):
+        try:
+            with open(path, "r") as f:
+                return yaml.safe_load(f), None
+        except (OSError, yaml.YAMLError) as e:
+            return None, str(e)
+
+    def reload_regions(self, initial=False):
+        """Apply regions.yaml; returns True if the regions changed."""
+        data, error = self._read_yaml(self.regions_path)
+        if error or not isinstance(data, list):
+            self._reject(self.regions_path, [error or "expected a list of regions"])
+            return False
+
+        errors = [str(m) for m in self.linter.lint(data) if m.level == "error"]
+        if errors and not initial:
+            self._reject(self.regions_path, errors)
+            return False
+        for e in errors:
+            # the runner has nothing to fall back to on start; load what is usable
+            print(f"⚠️ {e}")
+
+        old = {r.name: r for r in self.regions}
+        regions, keys = [], {}
+        added, modified = [], []
+        for d in data:
+            name = d.get("name")
+            key = region_key(d, self.run_dir)
+            keys[name] = key
+
+            region = old.get(name)
+            if region is not None and self._keys.get(name) == key:
+                # take live settings as the factory reads them: defaults for
+                # deleted keys, nested-schema fields
+                fresh = self.region_factory(d)
+                if fresh is not None:
+                    for k in LIVE_KEYS:
+                        setattr(region, k, getattr(fresh, k))
+            else:
+                region = self.region_factory(d)
+                if region is None:
+                    continue
+                (modified if name in old else added).append(name)
+            regions.append(region)
+
+        removed = [n for n in old if n not in keys]
+        self.regions, self._keys = regions, keys
+        if not initial and (added or removed or modified):
+            print(f"🔄 Regions reloaded: {len(added)} added, {len(removed)} removed, "
+                  f"{len(modified)} modified")
+        return True
+
+    # ---------------- Policies ----------------
+
+    def reload_policies(self):
+        if self.policy_engine is None or self.policy_path is None:
+            return False
+        data, error = self._read_yaml(self.policy_path)
+        policies = (data or {}).get("policies") if isinstance(data, dict) else None
+        if error or not isinstance(policies, list) or not all(isinstance(p, dict) for p in policies):
+            self._reject(self.policy_path, [error or "expected 'policies: [...]'"])
+            return False
+
+        self.policy_engine.replace_policies(policies)
+        names = {r.name for r in self.regions}
+        for p in policies:
+            region = (p.get("when") or {}).get("region")
+            if region not in names:
+                print(f"⚠️ Policy {p.get('name')}: unknown region '{region}'")
+        print(f"🔄 Policies reloaded: {len(policies)} policies")
+        return True
+
+    # ---------------- Polling ----------------
+
+    def poll(self):
+        """
+        Reload whatever changed on disk. Returns True when the region list
+        changed (callers may need to rebuild derived state such as a
+        capture plan).
+        """
+        changed = self.watcher.changed()
+        regions_changed = False
+        if self.regions_path in changed:
+            regions_changed = self.reload_regions()
+        if self.policy_path in changed:
+            self.reload_policies()
+        return regions_changed
+
+    def _reject(self, path, problems):
+        print(f"⚠️ Ignoring edit to {path}:")
+        for p in problems:
+            print(f"    {p}")
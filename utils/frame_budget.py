@@ -0,0 +1,181 @@
+"""
+Per-frame time budget for the analysis loop.
+
+Regions are analyzed in priority order, taken from the policies that read
+them: regions behind a stop policy first (they are always analyzed, even
+past the budget), then regions behind other policies in policy order, then
+everything else in regions.yaml order. Each region's cost is tracked as a
+moving average; a region whose estimate no longer fits in what is left of
+the frame budget is skipped and keeps its previous result with
+`region.stale = True`. A region skipped MAX_STALE frames in a row is
+analyzed regardless (one such region per frame, after the policy regions),
+so slow OCR regions are late but never starved.
+"""
+import time
+
+# -------------------------------
+# Config
+# -------------------------------
+FRAME_BUDGET = 0.4      # seconds of analysis per frame
+REGION_BUDGETS = {      # expected worst cost per region type (or name), seconds
+    "template": 0.02,
+    "classify": 0.05,
+    "button": 0.02,
+    "ocr": 0.25,
+    "hybrid": 0.25,
+}
+MAX_STALE = 10          # frames a region may carry over its result in a row
+COST_ALPHA = 0.3        # weight of the newest sample in the cost average
+
+# priority tiers
+CRITICAL, ACTION, PASSIVE = 2, 1, 0
+
+
+def region_priorities(policies):
+    """
+    region name -> (tier, rank) from a policy list; higher sorts first.
+    Stop policies make their region CRITICAL, any other policy ACTION;
+    earlier policies rank higher, as PolicyEngine evaluates them first.
+    """
+    priorities = {}
+    for i, p in enumerate(policies):
+        region = (p.get("when") or {}).get("region")
+        if region is None:
+            continue
+        tier = CRITICAL if (p.get("action") or {}).get("type") == "stop" else ACTION
+        priority = (tier, len(policies) - i)
+        if priority > priorities.get(region, (PASSIVE, 0)):
+            priorities[region] = priority
+    return priorities
+
+
+# -------------------------------
+# Per-frame report
+# -------------------------------
+class FrameReport:
+    def __init__(self, frame, budget):
+        self.frame = frame
+        self.budget = budget
+        self.elapsed = 0.0
+        self.analyzed = []   # region names, in the order they ran
+        self.skipped = []    # region names carried over as stale
+        self.overruns = []   # (name, seconds) of regions slower than their own budget
+
+    @property
+    def over_budget(self):
+        return self.elapsed > self.budget
+
+    @property
+    def degraded(self):
+        return bool(self.skipped) or self.over_budget
+
+    def __str__(self):
+        text = (f"Frame {self.frame}: {len(self.analyzed)} analyzed in "
+                f"{self.elapsed * 1000:.0f}/{self.budget * 1000:.0f} ms")
+        if self.skipped:
+            text += f", stale: {', '.join(self.skipped)}"
+        if self.overruns:
+            text += ", slow: " + ", ".join(f"{n} {t * 1000:.0f} ms" for n, t in self.overruns)
+        return text
+
+
+# -------------------------------
+# Scheduler
+# -------------------------------
+class FrameBudget:
+    """
+    Runs one frame's region analyses within frame_budget seconds.
+
+        budget = FrameBudget(policy_engine=engine)
+        report = budget.run(regions, lambda r: analyze_region(frame, r, run_dir))
+
+    Priorities follow policy_engine.policies, including hot reloads.
+    region_budgets overrides REGION_BUDGETS by region type or name; a
+    region's budget is its cost estimate until it has been measured, and a
+    run slower than it is reported as an overrun.
+    """
+
+    def __init__(self, frame_budget=FRAME_BUDGET, region_budgets=None, policy_engine=None,
+                 max_stale=MAX_STALE):
+        self.frame_budget = frame_budget
+        self.region_budgets = dict(REGION_BUDGETS, **(region_budgets or {}))
+        self.policy_engine = policy_engine
+        self.max_stale = max_stale
+
+        self.costs = {}        # region name -> average seconds
+        self.stale_count = {}  # region name -> frames skipped in a row
+        self._policies = None
+        self._priorities = {}
+
+        # totals
+        self.frames = 0
+        self.skipped = 0
+        self.over_budget = 0
+
+    def region_budget(self, region):
+        return self.region_budgets.get(region.name) or self.region_budgets.get(region.type, self.frame_budget)
+
+    def estimate(self, region):
+        return self.costs.get(region.name, self.region_budget(region))
+
+    def priorities(self):
+        policies = self.policy_engine.policies if self.policy_engine else []
+        if policies is not self._policies:
+            # replace_policies() swaps the list, so identity tracks reloads
+            self._policies = policies
+            self._priorities = region_priorities(policies)
+        return self._priorities
+
+    def order(self, regions):
+        """Regions in analysis order (stable within equal priority)."""
+        priorities = self.priorities()
+
+        def key(r):
+            tier, rank = priorities.get(r.name, (PASSIVE, 0))
+            return tier, self._starving(r), rank
+
+        return sorted(regions, key=key, reverse=True)
+
+    def _starving(self, region):
+        return self.stale_count.get(region.name, 0) >= self.max_stale
+
+    def run(self, regions, analyze):
+        """Call analyze(region) for every region that fits; returns a FrameReport."""
+        report = FrameReport(self.frames, self.frame_budget)
+        priorities = self.priorities()
+        start = time.perf_counter()
+        forced = False  # a starving region already ran past the budget
+
+        for r in self.order(regions):
+            name = r.name
+            critical = priorities.get(name, (PASSIVE, 0))[0] == CRITICAL
+            fits = time.perf_counter() - start + self.estimate(r) <= self.frame_budget
+            if not (critical or fits) and not forced and self._starving(r):
+                fits = forced = True
+            if not (critical or fits):
+                r.stale = True
+                self.stale_count[name] = self.stale_count.get(name, 0) + 1
+                report.skipped.append(name)
+                continue
+
+            t0 = time.perf_counter()
+            analyze(r)
+            cost = time.perf_counter() - t0
+
+            r.stale = False
+            self.stale_count[name] = 0
+            prev = self.costs.get(name)
+            self.costs[name] = cost if prev is None else prev + COST_ALPHA * (cost - prev)
+            if cost > self.region_budget(r):
+                report.overruns.append((name, cost))
+            report.analyzed.append(name)
+
+        report.elapsed = time.perf_counter() - start
+        self.frames += 1
+        self.skipped += len(report.skipped)
+        self.over_budget += report.over_budget
+        return report
+
+    def summary(self):
+        return (f"Frame budget {self.frame_budget * 1000:.0f} ms: {self.frames} frames, "
+                f"{self.over_budget} over budget, {self.skipped} region results carried over")
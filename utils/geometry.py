@@ -0,0 +1,325 @@
+from typing import Any, Dict, Iterable, List, Sequence
+
+import numpy as np
+
+# Region types known to the loader / linter, in type-code order
+REGION_TYPES = ("template", "ocr", "hybrid", "classify", "button")
+TYPE_CODES = {t: i for i, t in enumerate(REGION_TYPES)}
+UNKNOWN_TYPE = -1
+
+REGION_DTYPE = np.dtype([
+    ("x", np.int32),
+    ("y", np.int32),
+    ("w", np.int32),
+    ("h", np.int32),
+    ("type", np.int8),
+    ("threshold", np.float32),
+    # runtime confidences
+    ("template_conf", np.float32),
+    ("ocr_conf", np.float32),
+    ("hybrid_conf", np.float32),
+    ("matched", np.bool_),
+])
+
+
+# -----------------------------
+# Rect helpers
+# -----------------------------
+
+def rect_to_list(rect) -> List[int] | None:
+    """
+    Normalize a rect given as [x, y, w, h] or {"x", "y", "w", "h"}.
+    Returns None if it is not a well formed rect.
+    """
+    if isinstance(rect, dict):
+        rect = [rect.get("x"), rect.get("y"), rect.get("w"), rect.get("h")]
+    if (
+        isinstance(rect, (list, tuple))
+        and len(rect) == 4
+        and all(isinstance(v, (int, float)) for v in rect)
+        and rect[2] > 0
+        and rect[3] > 0
+    ):
+        return [int(v) for v in rect]
+    return None
+
+
+# -----------------------------
+# Region table
+# -----------------------------
+
+class RegionTable:
+    """
+    Columnar store of region rects, types, thresholds and runtime
+    confidences, with a uniform-grid spatial index.
+
+    Rows follow the order of `names`. Bounds checks and clamping are
+    vectorized over all rows; overlap, containment and hit-test queries go
+    through the grid so they stay cheap with thousands of regions.
+    """
+
+    def __init__(self, names: Sequence[str], rects, types=None, thresholds=None,
+                 default_threshold=0.7, cell_size=None):
+        n = len(names)
+        self.names = list(names)
+        self.data = np.zeros(n, dtype=REGION_DTYPE)
+
+        rects = np.asarray(rects, dtype=np.int64).reshape(n, 4)
+        self.data["x"], self.data["y"] = rects[:, 0], rects[:, 1]
+        self.data["w"], self.data["h"] = rects[:, 2], rects[:, 3]
+        self.data["type"] = [
+            TYPE_CODES.get(t, UNKNOWN_TYPE) for t in (types or ["template"] * n)
+        ]
+        self.data["threshold"] = (
+            default_threshold if thresholds is None
+            else [default_threshold if t is None else t for t in thresholds]
+        )
+
+        self._cell_size = cell_size
+        self._index = None
+        self._rows = {name: i for i, name in enumerate(self.names)}
+
+    # ---------------- Construction ----------------
+
+    @classmethod
+    def from_regions(cls, regions: Iterable[Any], **kwargs) -> "RegionTable":
+        """Build from Region objects (main.Region, ui_lab.Region)."""
+        regions = list(regions)
+        return cls(
+            [r.name for r in regions],
+            [r.rect for r in regions],
+            types=[r.type for r in regions],
+            thresholds=[getattr(r, "threshold", None) for r in regions],
+            **kwargs,
+        )
+
+    @classmethod
+    def from_dicts(cls, regions: Iterable[Dict[str, Any]], **kwargs) -> "RegionTable":
+        """
+        Build from region dicts as found in regions.yaml. Regions without a
+        valid rect are skipped; check `names` for the rows that made it.
+        """
+        names, rects, types, thresholds = [], [], [], []
+        for r in regions:
+            rect = rect_to_list(r.get("rect"))
+            if rect is None:
+                continue
+            names.append(r.get("name", "<unnamed>"))
+            rects.append(rect)
+            types.append(r.get("type") or r.get("mode"))
+            thresholds.append(r.get("threshold"))
+        return cls(names, np.asarray(rects, dtype=np.int64).reshape(-1, 4),
+                   types=types, thresholds=thresholds, **kwargs)
+
+    # ---------------- Access ----------------
+
+    def __len__(self):
+        return len(self.names)
+
+    def row(self, name: str) -> int:
+        return self._rows[name]
+
+    @property
+    def rects(self) -> np.ndarray:
+        """(N, 4) array of [x, y, w, h]."""
+        return np.stack(
+            [self.data["x"], self.data["y"], self.data["w"], self.data["h"]], axis=1
+        )
+
+    def rect(self, i: int) -> List[int]:
+        d = self.data[i]
+        return [int(d["x"]), int(d["y"]), int(d["w"]), int(d["h"])]
+
+    def set_rect(self, i: int, rect) -> None:
+        x, y, w, h = rect
+        d = self.data
+        d["x"][i], d["y"][i], d["w"][i], d["h"][i] = x, y, w, h
+        self._index = None
+
+    def update_runtime(self, regions: Iterable[Any]) -> None:
+        """Copy runtime confidences from Region objects into the table."""
+        for r in regions:
+            i = self._rows.get(r.name)
+            if i is None:
+                continue
+            d = self.data[i]
+            d["template_conf"] = r.template_confidence
+            d["ocr_conf"] = r.ocr_confidence
+            d["hybrid_conf"] = r.hybrid_confidence
+            d["matched"] = r.matched
+
+    # ---------------- Bounds ----------------
+
+    def _edges(self):
+        d = self.data
+        x0 = d["x"].astype(np.int64)
+        y0 = d["y"].astype(np.int64)
+        return x0, y0, x0 + d["w"], y0 + d["h"]
+
+    def negative_origin(self) -> np.ndarray:
+        return (self.data["x"] < 0) | (self.data["y"] < 0)
+
+    def out_of_bounds(self, img_w: int, img_h: int) -> np.ndarray:
+        """Rows whose rect extends past the right or bottom image edge."""
+        _, _, x1, y1 = self._edges()
+        return (x1 > img_w) | (y1 > img_h)
+
+    def clamp(self, img_w: int, img_h: int) -> np.ndarray:
+        """
+        Rects clipped to the image, as an (N, 4) array. Rects that fall
+        completely outside come back with zero width or height.
+        """
+        x0, y0, x1, y1 = self._edges()
+        cx0, cy0 = np.clip(x0, 0, img_w), np.clip(y0, 0, img_h)
+        cx1, cy1 = np.clip(x1, 0, img_w), np.clip(y1, 0, img_h)
+        return np.stack([cx0, cy0, cx1 - cx0, cy1 - cy0], axis=1)
+
+    def bounding_rect(self, margin=0, img_w=None, img_h=None) -> List[int] | None:
+        """
+        Smallest rect covering every region (plus margin), optionally clipped
+        to the image. This is the area a capture actually needs.
+        """
+        if not len(self):
+            return None
+        x0, y0, x1, y1 = self._edges()
+        bx0, by0 = int(x0.min()) - margin, int(y0.min()) - margin
+        bx1, by1 = int(x1.max()) + margin, int(y1.max()) + margin
+        bx0, by0 = max(bx0, 0), max(by0, 0)
+        if img_w is not None:
+            bx1 = min(bx1, img_w)
+        if img_h is not None:
+            by1 = min(by1, img_h)
+        if bx1 <= bx0 or by1 <= by0:
+            return None
+        return [bx0, by0, bx1 - bx0, by1 - by0]
+
+    # ---------------- Spatial index ----------------
+
+    def _build_index(self):
+        """
+        Uniform grid stored CSR-style: sorted cell keys plus the row of
+        every (cell, region) pair.
+        """
+        x0, y0, x1, y1 = self._edges()
+        cell = self._cell_size
+        if cell is None:
+            sizes = np.maximum(self.data["w"], self.data["h"])
+            cell = int(max(32, np.median(sizes))) if len(self) else 32
+
+        cx0, cy0 = x0 // cell, y0 // cell
+        cx1, cy1 = (x1 - 1) // cell, (y1 - 1) // cell
+        ncx, ncy = cx1 - cx0 + 1, cy1 - cy0 + 1
+        counts = ncx * ncy
+
+        rows = np.repeat(np.arange(len(self)), counts)
+        # position of each pair inside its region's cell block
+        start = np.repeat(np.cumsum(counts) - counts, counts)
+        k = np.arange(counts.sum()) - start
+        cols = np.repeat(ncx, counts)
+        cx = np.repeat(cx0, counts) + k % cols
+        cy = np.repeat(cy0, counts) + k // cols
+
+        order = np.lexsort((rows, cx, cy))
+        self._index = {
+            "cell": cell,
+            "cx": cx[order],
+            "cy": cy[order],
+            "rows": rows[order],
+            "keys": np.stack([cy[order], cx[order]], axis=1),
+        }
+
+    def _candidates(self, x0, y0, x1, y1) -> np.ndarray:
+        """Rows registered in any grid cell touched by the box."""
+        if self._index is None:
+            self._build_index()
+        idx = self._index
+        cell = idx["cell"]
+        gx0, gy0 = x0 // cell, y0 // cell
+        gx1, gy1 = (x1 - 1) // cell, (y1 - 1) // cell
+
+        # cells are sorted by (cy, cx): one contiguous slice per grid row
+        found = []
+        cy = idx["cy"]
+        lo = np.searchsorted(cy, gy0, side="left")
+        hi = np.searchsorted(cy, gy1, side="right")
+        if hi > lo:
+            cx = idx["cx"][lo:hi]
+            mask = (cx >= gx0) & (cx <= gx1)
+            found = idx["rows"][lo:hi][mask]
+        return np.unique(found).astype(np.int64)
+
+    def query_overlaps(self, rect) -> np.ndarray:
+        """Rows whose rect overlaps rect (positive intersection area)."""
+        x, y, w, h = rect
+        cand = self._candidates(x, y, x + w, y + h)
+        if cand.size == 0:
+            return cand
+        x0, y0, x1, y1 = (a[cand] for a in self._edges())
+        hit = (x0 < x + w) & (x1 > x) & (y0 < y + h) & (y1 > y)
+        return cand[hit]
+
+    def query_contained(self, rect) -> np.ndarray:
+        """Rows whose rect lies completely inside rect."""
+        x, y, w, h = rect
+        cand = self._candidates(x, y, x + w, y + h)
+        if cand.size == 0:
+            return cand
+        x0, y0, x1, y1 = (a[cand] for a in self._edges())
+        inside = (x0 >= x) & (y0 >= y) & (x1 <= x + w) & (y1 <= y + h)
+        return cand[inside]
+
+    def query_containing(self, rect) -> np.ndarray:
+        """Rows whose rect completely contains rect."""
+        x, y, w, h = rect
+        cand = self._candidates(x, y, x + w, y + h)
+        if cand.size == 0:
+            return cand
+        x0, y0, x1, y1 = (a[cand] for a in self._edges())
+        outer = (x0 <= x) & (y0 <= y) & (x1 >= x + w) & (y1 >= y + h)
+        return cand[outer]
+
+    def hit_test(self, px, py) -> np.ndarray:
+        """
+        Rows containing the point, smallest area first (the most specific
+        region is usually the one the user meant).
+        """
+        px, py = int(px), int(py)
+        cand = self._candidates(px, py, px + 1, py + 1)
+        if cand.size == 0:
+            return cand
+        x0, y0, x1, y1 = (a[cand] for a in self._edges())
+        hit = cand[(x0 <= px) & (px < x1) & (y0 <= py) & (py < y1)]
+        area = self.data["w"][hit].astype(np.int64) * self.data["h"][hit]
+        return hit[np.argsort(area, kind="stable")]
+
+    def overlapping_pairs(self) -> np.ndarray:
+        """
+        All (i, j) row pairs with i < j whose rects overlap, as an (M, 2) array.
+        """
+        if self._index is None:
+            self._build_index()
+        idx = self._index
+        keys, rows = idx["keys"], idx["rows"]
+        if rows.size == 0:
+            return np.empty((0, 2), dtype=np.int64)
+
+        # group pair entries by cell; compare rows sharing a cell
+        boundaries = np.flatnonzero(np.any(keys[1:] != keys[:-1], axis=1)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [rows.size]))
+
+        x0, y0, x1, y1 = self._edges()
+        pairs = []
+        for s, e in zip(starts, ends):
+            if e - s < 2:
+                continue
+            members = rows[s:e]
+            i, j = np.triu_indices(members.size, k=1)
+            a, b = members[i], members[j]
+            hit = (x0[a] < x1[b]) & (x1[a] > x0[b]) & (y0[a] < y1[b]) & (y1[a] > y0[b])
+            if hit.any():
+                pairs.append(np.stack([np.minimum(a, b), np.maximum(a, b)], axis=1)[hit])
+
+        if not pairs:
+            return np.empty((0, 2), dtype=np.int64)
+        return np.unique(np.concatenate(pairs), axis=0)
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from utils.geometry import rect_to_list
+
+OCR_PARAMS_NAME = "ocr_params.yaml"  # vision.preprocess calibration file
+
+# Region keys that change what analyze_region computes. `threshold` only
+# changes region.matched, so retuning it keeps cached confidences valid.
+ANALYSIS_KEYS = (
+    "type",
+    "rect",
+    "template_image",
+    "templates",
+    "ocr_text",
+    "ocr_match",
+    "ocr_max_edits",
+    "ocr",
+    "find_all",
+    "max_matches",
+    "prefilter",
+    "ocr_preprocess",
+)
+
+# (path, mtime_ns, size) -> digest, so unchanged templates are read once
+_file_hashes = {}
+
+
+def stable_hash(obj) -> str:
+    """Short hex digest of a JSON-serializable value (key order ignored)."""
+    blob = json.dumps(obj, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(blob, digest_size=8).hexdigest()
+
+
+def file_hash(path) -> str:
+    """Digest of a file's bytes; "missing" if it does not exist."""
+    path = str(path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "missing"
+
+    key = (path, st.st_mtime_ns, st.st_size)
+    digest = _file_hashes.get(key)
+    if digest is None:
+        with open(path, "rb") as f:
+            digest = hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+        _file_hashes[key] = digest
+    return digest
+
+
+# -----------------------------
+# Region hashes
+# -----------------------------
+
+def _field(region, key):
+    if isinstance(region, dict):
+        return region.get(key)
+    return getattr(region, key, None)
+
+
+def region_config_hash(region) -> str:
+    """
+    Hash of the region settings that affect its confidences. Accepts a
+    regions.yaml dict or a Region object.
+    """
+    config = {k: _field(region, k) for k in ANALYSIS_KEYS}
+    config["rect"] = rect_to_list(config["rect"])
+    return stable_hash(config)
+
+
+def template_paths(region):
+    """
+    Template files a region reads, relative to the run dir, plus the OCR
+    calibration file when the region uses it.
+    """
+    paths = []
+    if _field(region, "ocr_preprocess") == "auto":
+        paths.append(OCR_PARAMS_NAME)
+    if _field(region, "template_image"):
+        paths.append(str(_field(region, "template_image")))
+    paths.extend(str(p) for p in (_field(region, "templates") or {}).values())
+    return sorted(paths)
+
+
+def template_hash(region, run_dir) -> str:
+    """Hash of the contents of every template the region uses."""
+    run_dir = Path(run_dir)
+    return stable_hash([(p, file_hash(run_dir / p)) for p in template_paths(region)])
+
+
+def region_key(region, run_dir) -> str:
+    """Cache key for a region's results: config hash + template hash."""
+    return f"{region_config_hash(region)}-{template_hash(region, run_dir)}"
+
+
+# -----------------------------
+# Perceptual hashes
+# -----------------------------
+
+def dhash(img, size=8) -> int:
+    """
+    64-bit difference hash of a BGR or gray image: compares neighbouring
+    pixels of a (size+1) x size thumbnail. Near-identical frames differ in
+    only a few bits.
+    """
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    thumb = cv2.resize(img, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (thumb[:, 1:] > thumb[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class DHashIndex:
+    """
+    Finds stored hashes within `max_distance` bits of a query without
+    comparing against all of them (multi-index hashing): the 64 bits are
+    split into max_distance + 1 chunks, and any hash that close must match
+    the query exactly on at least one chunk.
+    """
+
+    def __init__(self, max_distance=4, bits=64):
+        self.max_distance = max_distance
+        chunks = max_distance + 1
+        edges = [round(i * bits / chunks) for i in range(chunks + 1)]
+        self._chunks = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(edges, edges[1:])]
+        self._tables = [{} for _ in self._chunks]
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _keys(self, h):
+        return [(h >> lo) & mask for lo, mask in self._chunks]
+
+    def add(self, h):
+        for table, key in zip(self._tables, self._keys(h)):
+            table.setdefault(key, []).append(h)
+        self.count += 1
+
+    def near(self, h):
+        """True if a stored hash is within max_distance bits of h."""
+        for table, key in zip(self._tables, self._keys(h)):
+            for other in table.get(key, ()):
+                if (h ^ other).bit_count() <= self.max_distance:
+                    return True
+        return False
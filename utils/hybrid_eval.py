@@ -15,3 +15,23 @@ def aggregate_confidence(values, mode="min"):
         return result
 
     raise ValueError(f"Unknown aggregate mode '{mode}'")
+
+
+AGGREGATE_MODES = ("min", "mean", "product")
+
+
+def aggregate_array(values, mode="min"):
+    """
+    Vectorized aggregate_confidence over the last axis of `values`
+    (e.g. (..., 2) template / OCR confidences).
+    """
+    if mode == "min":
+        return values.min(axis=-1)
+
+    if mode == "mean":
+        return values.mean(axis=-1)
+
+    if mode == "product":
+        return values.prod(axis=-1)
+
+    raise ValueError(f"Unknown aggregate mode '{mode}'")
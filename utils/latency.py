@@ -0,0 +1,123 @@
+"""
+Capture-to-click latency tracing.
+
+Every captured Frame has a frame_id and a perf_counter timestamp taken just
+before the grab. A FrameTrace follows one frame through the loop; the
+runner marks the end of each stage (capture, analyze, policy, click, ...),
+so a stage's time is the gap since the previous mark. Traces of frames that
+led to a click are kept separately: their total is the glass-to-click
+latency. The click mark may arrive after end(), from the thread that
+executed the click (automation.actions.ActionExecutor). Both can be exported in Chrome's trace-event format
+(chrome://tracing, ui.perfetto.dev).
+"""
+import json
+from collections import deque
+
+import numpy as np
+
+KEEP_FRAMES = 10000  # frame traces kept for the summary / export
+PERCENTILES = (50, 95, 99)
+DECISION_STAGE = "policy"  # stage after which a frame's decision is known
+
+
+class FrameTrace:
+    def __init__(self, frame_id, start):
+        self.frame_id = frame_id
+        self.start = start
+        self.marks = []  # (stage, perf_counter at the end of the stage)
+        self.clicked = False
+
+    def mark(self, stage, t):
+        self.marks.append((stage, t))
+
+    @property
+    def total(self):
+        return self.marks[-1][1] - self.start if self.marks else 0.0
+
+    def until(self, stage):
+        """Seconds from capture to the end of `stage`, or None."""
+        for name, t in self.marks:
+            if name == stage:
+                return t - self.start
+        return None
+
+    def stages(self):
+        """[(stage, start, end)], each stage starting where the last ended."""
+        spans, prev = [], self.start
+        for stage, t in self.marks:
+            spans.append((stage, prev, t))
+            prev = t
+        return spans
+
+
+def percentile_line(name, seconds):
+    if not len(seconds):
+        return f"{name}: -"
+    values = np.percentile(np.asarray(seconds) * 1000, PERCENTILES)
+    text = ", ".join(f"p{p} {v:.1f} ms" for p, v in zip(PERCENTILES, values))
+    return f"{name}: {text} (n={len(seconds)})"
+
+
+class LatencyTracer:
+    """
+        trace = tracer.begin(frame)
+        ...; trace.mark("analyze", time.perf_counter())
+        ...; tracer.click(trace, time.perf_counter())  # before or after end()
+        tracer.end(trace)
+    """
+
+    def __init__(self, keep=KEEP_FRAMES):
+        self.frames = deque(maxlen=keep)
+        self.clicks = deque(maxlen=keep)
+
+    def begin(self, frame):
+        return FrameTrace(frame.frame_id, frame.timestamp)
+
+    def click(self, trace, t):
+        trace.mark("click", t)
+        if not trace.clicked:
+            trace.clicked = True
+            self.clicks.append(trace)
+
+    def end(self, trace):
+        self.frames.append(trace)
+
+    # ---------------- Reporting ----------------
+
+    def stage_times(self, traces):
+        """stage -> [seconds] over traces."""
+        times = {}
+        for trace in traces:
+            for stage, start, end in trace.stages():
+                times.setdefault(stage, []).append(end - start)
+        return times
+
+    def summary(self):
+        lines = [percentile_line("Glass to click", [t.total for t in self.clicks])]
+        for stage, seconds in self.stage_times(self.clicks).items():
+            lines.append("  " + percentile_line(stage, seconds))
+
+        decided = [d for d in (t.until(DECISION_STAGE) for t in self.frames) if d is not None]
+        lines.append(percentile_line("Capture to decision", decided))
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        """Trace-event dict: one complete ("X") event per stage per frame."""
+        events = []
+        origin = self.frames[0].start if self.frames else 0.0
+        for trace in self.frames:
+            tid = 2 if trace.clicked else 1
+            for stage, start, end in trace.stages():
+                events.append({
+                    "name": stage, "cat": "click" if trace.clicked else "frame", "ph": "X",
+                    "ts": round((start - origin) * 1e6, 1), "dur": round((end - start) * 1e6, 1),
+                    "pid": 1, "tid": tid, "args": {"frame": trace.frame_id},
+                })
+        names = [(1, "frames"), (2, "frames with a click")]
+        events += [{"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": n}}
+                   for tid, n in names]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
@@ -7,12 +7,27 @@ class PolicyEngine:
         self.policies = policies
         self._cooldowns = {}
 
-    def evaluate(self, analysis: Dict[str, dict]):
+    def replace_policies(self, policies: list[dict]):
         """
+        Swap in a new policy list. Cooldowns of policies that keep their
+        name carry over; those of removed policies are dropped.
+        """
+        names = {p.get("name", "<unnamed>") for p in policies}
+        self._cooldowns = {n: t for n, t in self._cooldowns.items() if n in names}
+        self.policies = policies
+
+    def evaluate(self, analysis: Dict[str, dict], now: float | None = None):
+        """
+        `now` defaults to time.time(); replays pass the recorded frame time
+        so cooldowns behave the same on every run. Click policies skip
+        regions whose result is `stale` (carried over by utils.frame_budget),
+        so nothing is clicked where the UI was frames ago.
+
         Returns:
             action dict or None
         """
-        now = time.time()
+        if now is None:
+            now = time.time()
 
         for policy in self.policies:
             name = policy.get("name", "<unnamed>")
@@ -24,6 +39,8 @@ class PolicyEngine:
                 continue
 
             region_state = analysis[region_name]
+            if action.get("type") == "click" and region_state.get("stale"):
+                continue
 
             # ---- match condition ----
             if when.get("matched") is not None:
@@ -38,8 +55,8 @@ class PolicyEngine:
 
             # ---- cooldown ----
             cooldown = action.get("cooldown", 0.0)
-            last_fire = self._cooldowns.get(name, 0.0)
-            if now - last_fire < cooldown:
+            last_fire = self._cooldowns.get(name)
+            if last_fire is not None and now - last_fire < cooldown:
                 continue
 
             # ---- fire ----
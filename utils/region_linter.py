@@ -1,7 +1,22 @@
+import os
+import re
+import struct
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, List, Tuple, Any
 
+import cv2
+
+from utils.geometry import RegionTable
+from utils.hashing import stable_hash
+from vision.prefilter import validate_options
+from vision.preprocess import validate_preprocess
+from vision.text_match import MATCH_MODES, TextMatcher
+
+# Regions whose rects overlap at least this much (intersection over union)
+# are reported; smaller overlaps (a button inside a panel) are normal.
+OVERLAP_IOU = 0.5
+
 
 # -----------------------------
 # Lint result structure
@@ -29,46 +44,191 @@ def lint_regions(
 ) -> List[LintMessage]:
     """
     Lint region definitions against schema and image bounds.
+    Accepts both the nested config schema and the flat run schema
+    (template_image / ocr_text / threshold / aggregate).
     """
+    return RegionLinter(img_w, img_h, base_dir).lint(regions)
+
+
+def lint_region(
+    r: Dict[str, Any],
+    img_w: int,
+    img_h: int,
+    base_dir: Path | None = None,
+) -> List[LintMessage]:
+    """Checks that depend on this region alone (nested schema)."""
+    name = r.get("name", "<unnamed>")
+    rtype = r.get("type")
     messages: List[LintMessage] = []
-    seen_names = set()
-
-    for r in regions:
-        name = r.get("name", "<unnamed>")
-        rtype = r.get("type")
-
-        # ---- name ----
-        if not r.get("name"):
-            messages.append(err(name, "Region missing 'name'"))
-        elif name in seen_names:
-            messages.append(err(name, "Duplicate region name"))
-        seen_names.add(name)
-
-        # ---- type ----
-        if rtype not in {"button", "template", "ocr", "hybrid"}:
-            messages.append(err(name, f"Unknown region type '{rtype}'"))
-            continue
 
-        # ---- rect ----
-        rect = r.get("rect")
-        if not valid_rect(rect):
-            messages.append(err(name, "Invalid rect; expected [x, y, w, h]"))
-        else:
-            messages.extend(lint_rect_bounds(name, rect, img_w, img_h))
+    # ---- type ----
+    if rtype not in {"button", "template", "ocr", "hybrid", "classify"}:
+        return [err(name, f"Unknown region type '{rtype}'")]
+
+    # ---- rect ----
+    area = None
+    if not valid_rect(r.get("rect")):
+        messages.append(err(name, "Invalid rect; expected [x, y, w, h]"))
+    else:
+        messages.extend(lint_rect_bounds(name, r["rect"], img_w, img_h))
+        area = visible_size(r["rect"], img_w, img_h)
+
+    # ---- prefilter ----
+    if r.get("prefilter"):
+        try:
+            validate_options(r["prefilter"])
+        except ValueError as e:
+            messages.append(err(name, f"Invalid prefilter: {e}"))
+
+    # ---- ocr_preprocess ----
+    if r.get("ocr_preprocess") is not None:
+        try:
+            validate_preprocess(r["ocr_preprocess"])
+        except ValueError as e:
+            messages.append(err(name, f"Invalid ocr_preprocess: {e}"))
+
+    # ---- per-type checks ----
+    if rtype == "template":
+        messages.extend(lint_template(name, r, base_dir, area))
 
-        # ---- per-type checks ----
-        if rtype == "template":
-            messages.extend(lint_template(name, r, base_dir))
+    elif rtype == "ocr":
+        messages.extend(lint_ocr(name, r))
 
-        elif rtype == "ocr":
-            messages.extend(lint_ocr(name, r))
+    elif rtype == "hybrid":
+        messages.extend(lint_hybrid(name, r, base_dir, area))
 
-        elif rtype == "hybrid":
-            messages.extend(lint_hybrid(name, r, base_dir))
+    elif rtype == "classify":
+        messages.extend(lint_classify(name, r, base_dir, area))
 
     return messages
 
 
+# -----------------------------
+# Incremental linting
+# -----------------------------
+
+class RegionLinter:
+    """
+    lint_regions for callers that lint the same list over and over (the UI
+    Lab on every edit, hot reload on every save). Per-region results are
+    cached by the region's definition and the (mtime, size) of the
+    templates it uses, so only edited regions are re-checked. Name and
+    overlap checks span regions; overlaps are only queried for rects that
+    changed.
+    """
+
+    def __init__(self, img_w: int = 1 << 30, img_h: int = 1 << 30, base_dir: Path | None = None):
+        self.base_dir = Path(base_dir) if base_dir is not None else None
+        self.img_w, self.img_h = img_w, img_h
+        self._regions = {}   # region key -> [LintMessage]
+        self._rects = {}     # region name -> rect, as of the last overlap check
+        self._overlaps = {}  # frozenset of two names -> IoU
+        self.relinted = 0    # regions checked by the last lint()
+
+    def set_image_size(self, img_w: int, img_h: int) -> None:
+        if (img_w, img_h) != (self.img_w, self.img_h):
+            self.img_w, self.img_h = img_w, img_h
+            self._regions.clear()  # bounds and template fit depend on it
+
+    def _key(self, r: Dict[str, Any], stamps: Dict[str, Any]) -> str:
+        """Definition + template file stamps; stamps is shared within one lint()."""
+        files = []
+        if self.base_dir is not None:
+            for img in template_images(r):
+                if img not in stamps:
+                    try:
+                        st = os.stat(self.base_dir / img)
+                        stamps[img] = (st.st_mtime_ns, st.st_size)
+                    except (OSError, TypeError, ValueError):
+                        stamps[img] = None
+                files.append(stamps[img])
+        return stable_hash([r, files])
+
+    def lint(self, regions: List[Dict[str, Any]]) -> List[LintMessage]:
+        regions = [nested_schema(r) for r in regions]
+        messages: List[LintMessage] = []
+        seen_names = set()
+        cache, stamps = {}, {}
+        self.relinted = 0
+
+        for r in regions:
+            name = r.get("name", "<unnamed>")
+
+            # ---- name ----
+            if not r.get("name"):
+                messages.append(err(name, "Region missing 'name'"))
+            elif name in seen_names:
+                messages.append(err(name, "Duplicate region name"))
+            seen_names.add(name)
+
+            key = self._key(r, stamps)
+            found = self._regions.get(key)
+            if found is None:
+                found = lint_region(r, self.img_w, self.img_h, self.base_dir)
+                self.relinted += 1
+            cache[key] = found
+            messages.extend(found)
+
+        self._regions = cache  # drops regions that are gone
+        messages.extend(self._lint_overlaps(regions))
+        return messages
+
+    def _lint_overlaps(self, regions: List[Dict[str, Any]]) -> List[LintMessage]:
+        placed = [r for r in regions if valid_rect(r.get("rect"))]
+        rects = {r.get("name", "<unnamed>"): tuple(r["rect"]) for r in placed}
+        changed = [n for n, rect in rects.items() if self._rects.get(n) != rect]
+        removed = [n for n in self._rects if n not in rects]
+
+        if len(rects) < len(placed) or len(changed) > len(rects) // 4:
+            # duplicate names or a mostly new list: one pass over the grid
+            table = RegionTable.from_dicts(placed)
+            self._overlaps = {frozenset((table.names[i], table.names[j])): iou
+                              for i, j, iou in overlaps(table, table.overlapping_pairs())}
+        elif changed or removed:
+            gone = set(changed) | set(removed)
+            self._overlaps = {k: iou for k, iou in self._overlaps.items() if not k & gone}
+            table = RegionTable.from_dicts(placed)
+            pairs = set()
+            for name in changed:
+                i = table.row(name)
+                pairs.update((min(i, j), max(i, j)) for j in table.query_overlaps(table.rect(i)) if j != i)
+            for i, j, iou in overlaps(table, sorted(pairs)):
+                self._overlaps[frozenset((table.names[i], table.names[j]))] = iou
+        self._rects = rects
+
+        # pairs are cached by name; report them in the current region order
+        order = {n: k for k, n in enumerate(rects)}
+        found = [(*sorted(pair, key=order.get), iou) for pair, iou in self._overlaps.items()]
+        found.sort(key=lambda f: (order[f[1]], order[f[0]]))
+        return [overlap_message(first, second, iou) for first, second, iou in found]
+
+
+# -----------------------------
+# Flat (run regions.yaml) schema
+# -----------------------------
+
+def nested_schema(r: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    View a flat run region (as written by the UI Lab and read by
+    main.load_regions_yaml) in the nested schema the checks below expect.
+    Regions already in the nested schema are returned unchanged.
+    """
+    if "template_image" not in r and "ocr_text" not in r:
+        return r
+
+    r = dict(r)
+    threshold = r.get("threshold", 0.7)
+    if r.get("template_image") and "template" not in r:
+        r["template"] = {"image": r["template_image"], "threshold": threshold}
+    # empty ocr_text means "any text" (main.analyze_region), still an ocr block
+    if "ocr_text" in r and r.get("type") in ("ocr", "hybrid") and "ocr" not in r:
+        r["ocr"] = {"text": r["ocr_text"], "confidence": threshold,
+                    "match": r.get("ocr_match", "contains"), "max_edits": r.get("ocr_max_edits", 0)}
+    if r.get("type") == "hybrid" and "logic" not in r:
+        r["logic"] = {"require": ["template", "ocr"], "aggregate": r.get("aggregate", "mean")}
+    return r
+
+
 # -----------------------------
 # Rect validation
 # -----------------------------
@@ -83,6 +243,13 @@ def valid_rect(rect) -> bool:
     )
 
 
+def visible_size(rect, img_w: int, img_h: int) -> Tuple[int, int]:
+    """Size of the part of rect inside the image (what region_roi returns)."""
+    x, y, w, h = rect
+    return (max(min(x + w, img_w) - max(x, 0), 0),
+            max(min(y + h, img_h) - max(y, 0), 0))
+
+
 def lint_rect_bounds(name: str, rect, img_w: int, img_h: int) -> List[LintMessage]:
     x, y, w, h = rect
     msgs = []
@@ -96,11 +263,129 @@ def lint_rect_bounds(name: str, rect, img_w: int, img_h: int) -> List[LintMessag
     return msgs
 
 
+def overlaps(table: RegionTable, pairs, min_iou: float = OVERLAP_IOU):
+    """(i, j, IoU) for the row pairs (i < j) that mostly cover each other."""
+    found = []
+    for i, j in pairs:
+        (ax, ay, aw, ah), (bx, by, bw, bh) = table.rect(i), table.rect(j)
+        iw = min(ax + aw, bx + bw) - max(ax, bx)
+        ih = min(ay + ah, by + bh) - max(ay, by)
+        if iw <= 0 or ih <= 0:
+            continue
+        iou = iw * ih / (aw * ah + bw * bh - iw * ih)
+        if iou >= min_iou:
+            found.append((i, j, iou))
+    return found
+
+
+def overlap_message(first: str, second: str, iou: float) -> LintMessage:
+    """Reported on the later region of the pair."""
+    return warn(second, f"Rect overlaps region '{first}' (IoU {iou:.2f})")
+
+
+# -----------------------------
+# Template image sizes
+# -----------------------------
+
+# (path, mtime_ns, size) -> (w, h) or None, so unchanged templates are read once
+_image_sizes = {}
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# JPEG start-of-frame markers (all but DHT, JPG and DAC in C0-CF)
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _jpeg_size(f) -> Tuple[int, int] | None:
+    f.seek(2)
+    while True:
+        b = f.read(1)
+        while b and b != b"\xff":  # skip to the next marker
+            b = f.read(1)
+        while b == b"\xff":        # fill bytes
+            b = f.read(1)
+        if not b:
+            return None
+        marker = b[0]
+        if marker in SOF_MARKERS:
+            data = f.read(7)
+            if len(data) < 7:
+                return None
+            h, w = struct.unpack(">HH", data[3:7])
+            return w, h
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            continue  # no length field
+        data = f.read(2)
+        if len(data) < 2:
+            return None
+        f.seek(struct.unpack(">H", data)[0] - 2, 1)
+
+
+def read_image_size(path) -> Tuple[int, int] | None:
+    """
+    (w, h) of an image file. PNG and JPEG are read from their headers;
+    other formats fall back to a full decode. None if it cannot be read.
+    """
+    with open(path, "rb") as f:
+        head = f.read(24)
+        if head[:8] == PNG_SIGNATURE and head[12:16] == b"IHDR":
+            w, h = struct.unpack(">II", head[16:24])
+            return w, h
+        if head[:2] == b"\xff\xd8":
+            return _jpeg_size(f)
+    img = cv2.imread(str(path), cv2.IMREAD_UNCHANGED)
+    return (img.shape[1], img.shape[0]) if img is not None else None
+
+
+def image_size(path) -> Tuple[int, int] | None:
+    """read_image_size, cached by (mtime, size); None if missing or unreadable."""
+    path = str(path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (path, st.st_mtime_ns, st.st_size)
+    if key not in _image_sizes:
+        try:
+            _image_sizes[key] = read_image_size(path)
+        except OSError:
+            return None
+    return _image_sizes[key]
+
+
+def template_images(r: Dict) -> List[str]:
+    """Template image paths of a nested-schema region."""
+    paths = []
+    tmpl = r.get("template")
+    if isinstance(tmpl, dict) and tmpl.get("image"):
+        paths.append(tmpl["image"])
+    templates = r.get("templates")
+    if isinstance(templates, dict):
+        paths.extend(img for img in templates.values() if img)
+    return paths
+
+
+def lint_template_fit(name: str, img: str, p: Path, area, label: str = "") -> List[LintMessage]:
+    """
+    The template must fit in the rect's visible area, or matching skips the
+    region every frame ("ROI smaller than template").
+    """
+    if area is None:
+        return []
+    size = image_size(p)
+    if size is None:
+        return [warn(name, f"Template image unreadable{label}: {img}")]
+    (tw, th), (aw, ah) = size, area
+    if tw > aw or th > ah:
+        return [err(name, f"Template{label} {img} is {tw}x{th}, larger than the rect's "
+                          f"visible {aw}x{ah}; it can never match")]
+    return []
+
+
 # -----------------------------
 # Template linting
 # -----------------------------
 
-def lint_template(name: str, r: Dict, base_dir: Path | None) -> List[LintMessage]:
+def lint_template(name: str, r: Dict, base_dir: Path | None, area=None) -> List[LintMessage]:
     msgs = []
     tmpl = r.get("template")
 
@@ -114,6 +399,8 @@ def lint_template(name: str, r: Dict, base_dir: Path | None) -> List[LintMessage
         p = (base_dir / img).resolve()
         if not p.exists():
             msgs.append(err(name, f"Template image not found: {img}"))
+        else:
+            msgs.extend(lint_template_fit(name, img, p, area))
 
     thresh = tmpl.get("threshold", 0.8)
     if not (0.0 < thresh <= 1.0):
@@ -122,6 +409,33 @@ def lint_template(name: str, r: Dict, base_dir: Path | None) -> List[LintMessage
     return msgs
 
 
+# -----------------------------
+# Classify (multi-template) linting
+# -----------------------------
+
+def lint_classify(name: str, r: Dict, base_dir: Path | None, area=None) -> List[LintMessage]:
+    msgs = []
+    templates = r.get("templates")
+
+    if not isinstance(templates, dict) or not templates:
+        return [err(name, "Classify region needs a 'templates' mapping of label -> image")]
+
+    if len(templates) == 1:
+        msgs.append(warn(name, "Classify region has a single template; consider type 'template'"))
+
+    for label, img in templates.items():
+        if not img:
+            msgs.append(err(name, f"Template for label '{label}' missing image"))
+        elif base_dir:
+            p = (base_dir / img).resolve()
+            if not p.exists():
+                msgs.append(err(name, f"Template image not found for '{label}': {img}"))
+            else:
+                msgs.extend(lint_template_fit(name, img, p, area, f" for '{label}'"))
+
+    return msgs
+
+
 # -----------------------------
 # OCR linting
 # -----------------------------
@@ -134,12 +448,19 @@ def lint_ocr(name: str, r: Dict) -> List[LintMessage]:
         return [err(name, "OCR region missing 'ocr' block")]
 
     text = ocr.get("text")
-    if not text:
+    if "text" not in ocr:
         msgs.append(err(name, "OCR missing 'text'"))
 
     match = ocr.get("match", "contains")
-    if match not in {"contains", "exact", "regex"}:
-        msgs.append(warn(name, f"Unknown OCR match mode '{match}'"))
+    if match not in MATCH_MODES:
+        msgs.append(err(name, f"Unknown OCR match mode '{match}'"))
+    elif text:
+        try:
+            TextMatcher(text, match, ocr.get("max_edits", 0))
+        except re.error as e:
+            msgs.append(err(name, f"Invalid OCR regex: {e}"))
+        except (TypeError, ValueError) as e:
+            msgs.append(err(name, f"Invalid OCR text settings: {e}"))
 
     conf = ocr.get("confidence", 0.5)
     if not (0.0 <= conf <= 1.0):
@@ -152,7 +473,7 @@ def lint_ocr(name: str, r: Dict) -> List[LintMessage]:
 # Hybrid linting (⭐ IMPORTANT)
 # -----------------------------
 
-def lint_hybrid(name: str, r: Dict, base_dir: Path | None) -> List[LintMessage]:
+def lint_hybrid(name: str, r: Dict, base_dir: Path | None, area=None) -> List[LintMessage]:
     msgs = []
 
     has_template = "template" in r
@@ -161,7 +482,7 @@ def lint_hybrid(name: str, r: Dict, base_dir: Path | None) -> List[LintMessage]:
     if not has_template:
         msgs.append(err(name, "Hybrid region missing 'template'"))
     else:
-        msgs.extend(lint_template(name, r, base_dir))
+        msgs.extend(lint_template(name, r, base_dir, area))
 
     if not has_ocr:
         msgs.append(err(name, "Hybrid region missing 'ocr'"))
@@ -0,0 +1,217 @@
+"""
+Persistent cache of main.analyze_region results.
+
+Recorded frames get analyzed over and over: by the UI Lab, by whole-run
+batch analysis and by ad-hoc scripts. Results are stored in one SQLite file
+shared by every tool, keyed by
+
+    frame hash     content of the frame (the PNG file, or the pixels)
+    region hash    utils.hashing.region_config_hash: settings that change
+                   what analyze_region computes
+    template hash  utils.hashing.template_hash: the template files (and OCR
+                   calibration) the region reads
+
+A result holds the confidences, template match location / size / matches,
+classify label and scores, and the OCR text and boxes. Threshold and hybrid
+aggregate are not part of the key; analyze_region re-derives
+hybrid_confidence and matched from the cached values.
+
+The file is bounded by max_bytes: once over, the least recently used
+entries are deleted down to LOW_WATER of it. Several processes may share the
+file (WAL mode); each thread needs its own ResultCache.
+
+    cache = ResultCache()
+    results = cache.for_file(frame_path)
+    analyze_region(frame, region, run_dir, results=results)
+"""
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+from utils.hashing import file_hash, region_config_hash, template_hash
+
+DEFAULT_PATH = Path(__file__).resolve().parent.parent / "debug_runs" / "result_cache.sqlite"
+MAX_BYTES = 256 * 1024 * 1024
+LOW_WATER = 0.9       # evict down to this fraction of max_bytes
+TOUCH_BATCH = 256     # last-used updates buffered before they are written
+RESULT_VERSION = 1    # bump when analyze_region's output changes meaning
+
+# Region attributes written by main.analyze_region
+RESULT_FIELDS = (
+    "template_confidence",
+    "ocr_confidence",
+    "hybrid_confidence",
+    "matched",
+    "template_match_loc",
+    "template_size",
+    "template_matches",
+    "label",
+    "label_scores",
+    "ocr_results",
+)
+
+
+def region_result(region):
+    return {f: getattr(region, f, None) for f in RESULT_FIELDS}
+
+
+def apply_result(region, result):
+    for f, v in result.items():
+        setattr(region, f, v)
+
+
+def image_hash(img) -> str:
+    """Digest of an image's pixels (shape included)."""
+    h = hashlib.blake2b(digest_size=8)
+    h.update(str(img.shape).encode())
+    h.update(np.ascontiguousarray(img).data)
+    return h.hexdigest()
+
+
+def _json_default(o):
+    # numpy scalars / arrays from OCR boxes and match locations
+    if hasattr(o, "tolist"):
+        return o.tolist()
+    return str(o)
+
+
+# -------------------------------
+# Store
+# -------------------------------
+class ResultCache:
+    def __init__(self, path=DEFAULT_PATH, max_bytes=MAX_BYTES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._touched = {}  # key -> last used, not yet written
+
+        self.db = sqlite3.connect(str(self.path), timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " frame TEXT, region TEXT, template TEXT,"
+                " payload TEXT NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL,"
+                " PRIMARY KEY (frame, region, template)) WITHOUT ROWID"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+        self._bytes = self._total_bytes()
+
+    def _total_bytes(self):
+        return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    # ---------------- Keys ----------------
+
+    @staticmethod
+    def region_keys(region, run_dir):
+        """(region hash, template hash) of a Region or regions.yaml dict."""
+        return (f"{RESULT_VERSION}-{region_config_hash(region)}",
+                template_hash(region, Path(run_dir)))
+
+    def for_file(self, path):
+        """Results for a frame stored as an image file (hashed once per mtime)."""
+        return FrameResults(self, file_hash(path))
+
+    def for_image(self, img):
+        """Results for a frame given as an array."""
+        return FrameResults(self, image_hash(img))
+
+    # ---------------- Access ----------------
+
+    def get(self, frame_hash, region_hash, tmpl_hash):
+        key = (frame_hash, region_hash, tmpl_hash)
+        row = self.db.execute(
+            "SELECT payload FROM results WHERE frame = ? AND region = ? AND template = ?", key
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched[key] = time.time()
+        if len(self._touched) >= TOUCH_BATCH:
+            self.flush()
+        return json.loads(row[0])
+
+    def put(self, frame_hash, region_hash, tmpl_hash, result):
+        payload = json.dumps(result, default=_json_default)
+        size = len(payload) + len(frame_hash) + len(region_hash) + len(tmpl_hash)
+        with self.db:
+            old = self.db.execute(
+                "SELECT size FROM results WHERE frame = ? AND region = ? AND template = ?",
+                (frame_hash, region_hash, tmpl_hash),
+            ).fetchone()
+            self.db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (frame_hash, region_hash, tmpl_hash, payload, size, time.time()),
+            )
+        self._bytes += size - (old[0] if old else 0)
+        if self._bytes > self.max_bytes:
+            self.evict()
+
+    def flush(self):
+        """Write buffered last-used times."""
+        if not self._touched:
+            return
+        with self.db:
+            self.db.executemany(
+                "UPDATE results SET used = ? WHERE frame = ? AND region = ? AND template = ?",
+                [(t, *key) for key, t in self._touched.items()],
+            )
+        self._touched.clear()
+
+    def evict(self):
+        """Drop least recently used entries until under LOW_WATER * max_bytes."""
+        self.flush()
+        self._bytes = self._total_bytes()  # other processes write too
+        excess = self._bytes - int(self.max_bytes * LOW_WATER)
+        if excess <= 0:
+            return
+        with self.db:
+            # the cutoff is the last-used time where the running size passes excess
+            row = self.db.execute(
+                "SELECT used FROM (SELECT used, SUM(size) OVER (ORDER BY used) AS total"
+                " FROM results) WHERE total >= ? ORDER BY used LIMIT 1", (excess,)
+            ).fetchone()
+            if row is not None:
+                self.db.execute("DELETE FROM results WHERE used <= ?", (row[0],))
+        self._bytes = self._total_bytes()
+
+    def clear(self):
+        with self.db:
+            self.db.execute("DELETE FROM results")
+        self._touched.clear()
+        self._bytes = 0
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def stats(self):
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return (f"Result cache: {self.hits} hits, {self.misses} misses ({rate:.0f}% hit), "
+                f"{self._bytes / 1e6:.1f} MB in {self.path}")
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+
+class FrameResults:
+    """A ResultCache bound to one frame; what analyze_region takes."""
+
+    def __init__(self, cache, frame_hash):
+        self.cache = cache
+        self.frame_hash = frame_hash
+
+    def get(self, region, run_dir):
+        return self.cache.get(self.frame_hash, *ResultCache.region_keys(region, run_dir))
+
+    def put(self, region, run_dir):
+        self.cache.put(self.frame_hash, *ResultCache.region_keys(region, run_dir), region_result(region))
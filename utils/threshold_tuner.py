@@ -0,0 +1,251 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from utils.hybrid_eval import AGGREGATE_MODES, aggregate_array
+
+# Labels written by ReplayViewer._label_event that count as ground truth
+POSITIVE = "tp"
+NEGATIVE = "fp"
+
+
+# -----------------------------
+# Labels
+# -----------------------------
+
+def load_labels(path, region_names):
+    """
+    Read labels.jsonl into (frame, region, positive) arrays.
+
+    Only tp / fp labels are kept; uncertain / ignore and regions not in
+    `region_names` are dropped. When an event was labeled more than once
+    the last label wins.
+    """
+    column = {name: i for i, name in enumerate(region_names)}
+    frames, regions, positive = [], [], []
+    with open(path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            label = rec.get("label")
+            col = column.get(rec.get("region"))
+            if col is None or label not in (POSITIVE, NEGATIVE):
+                continue
+            frames.append(rec["frame"])
+            regions.append(col)
+            positive.append(label == POSITIVE)
+
+    frames = np.asarray(frames, dtype=np.int64)
+    regions = np.asarray(regions, dtype=np.int64)
+    positive = np.asarray(positive, dtype=bool)
+
+    # last label per (frame, region): unique over the reversed arrays
+    key = frames * max(len(region_names), 1) + regions
+    _, first = np.unique(key[::-1], return_index=True)
+    keep = np.sort(len(key) - 1 - first)
+    return frames[keep], regions[keep], positive[keep]
+
+
+# -----------------------------
+# Precision / recall
+# -----------------------------
+
+def pr_curves(groups, scores, positive):
+    """
+    Precision / recall of `score >= threshold` for every distinct score of
+    every group, computed for all groups in one sort.
+
+    Returns a dict of equal-length arrays (group, threshold, tp, fp,
+    precision, recall, f1), sorted by group then descending threshold.
+    """
+    order = np.lexsort((-scores, groups))
+    g, s, y = groups[order], scores[order], positive[order]
+    n = len(g)
+    if n == 0:
+        empty = np.empty(0)
+        return {k: empty for k in ("group", "threshold", "tp", "fp", "precision", "recall", "f1")}
+
+    # segmented cumulative sums: subtract the running total at each group start
+    starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+    seg = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, n]))
+    ctp = np.cumsum(y)
+    cfp = np.cumsum(~y)
+    base_tp = np.r_[0, ctp][starts][seg]
+    base_fp = np.r_[0, cfp][starts][seg]
+    tp = ctp - base_tp
+    fp = cfp - base_fp
+
+    # a threshold is the last event of each run of equal (group, score)
+    last = np.r_[(g[1:] != g[:-1]) | (s[1:] != s[:-1]), True]
+    total_pos = np.add.reduceat(y.astype(np.int64), starts)[seg]
+
+    tp, fp, total_pos = tp[last], fp[last], total_pos[last]
+    precision = tp / np.maximum(tp + fp, 1)
+    recall = tp / np.maximum(total_pos, 1)
+    f1 = np.where(tp > 0, 2 * precision * recall / np.maximum(precision + recall, 1e-12), 0.0)
+    return {
+        "group": g[last],
+        "threshold": s[last],
+        "tp": tp,
+        "fp": fp,
+        "precision": precision,
+        "recall": recall,
+        "f1": f1,
+    }
+
+
+def best_points(curves, min_precision=None):
+    """
+    Index into `curves` of the best threshold per group: highest F1, or,
+    with min_precision, highest recall among points reaching that precision.
+    Ties go to the higher (more conservative) threshold.
+
+    Returns {group: index}; groups that cannot reach min_precision are missing.
+    """
+    if min_precision is None:
+        objective = curves["f1"]
+        ok = np.ones(len(objective), dtype=bool)
+    else:
+        objective = curves["recall"]
+        ok = curves["precision"] >= min_precision
+
+    idx = np.flatnonzero(ok)
+    order = np.lexsort((curves["threshold"][idx], objective[idx], curves["group"][idx]))
+    idx = idx[order]
+    g = curves["group"][idx]
+    last = np.r_[g[1:] != g[:-1], True]
+    return {int(grp): int(i) for grp, i in zip(g[last], idx[last])}
+
+
+def point_at(curves, group, threshold):
+    """Index of the curve point that `score >= threshold` lands on, or None."""
+    mask = (curves["group"] == group) & (curves["threshold"] >= threshold)
+    idx = np.flatnonzero(mask)
+    return int(idx[-1]) if len(idx) else None
+
+
+def cut_threshold(curves, i):
+    """
+    Threshold to store for curve point i: halfway to the next lower score
+    of the same group, so confidences that sit exactly on the chosen score
+    (or drift slightly below it) still count as matched.
+    """
+    t = float(curves["threshold"][i])
+    if i + 1 < len(curves["group"]) and curves["group"][i + 1] == curves["group"][i]:
+        t = (t + float(curves["threshold"][i + 1])) / 2.0
+    return t
+
+
+# -----------------------------
+# Tuning
+# -----------------------------
+
+class ThresholdTuner:
+    """
+    Join labels with per-frame confidences and pick thresholds.
+
+    `channels` is the (frames, regions, 3) template / OCR / hybrid array
+    from tools.batch_analysis.analyze_run; `regions` are the matching
+    regions.yaml dicts. Hybrid regions are evaluated under every aggregate
+    mode, the others on the channel that decides region.matched.
+    """
+
+    def __init__(self, regions, channels):
+        self.regions = regions
+        self.channels = channels
+
+        # one candidate per (region, aggregate mode)
+        self.candidates = []
+        for i, r in enumerate(regions):
+            if r.get("type") == "hybrid":
+                self.candidates += [(i, mode) for mode in AGGREGATE_MODES]
+            else:
+                self.candidates.append((i, None))
+        self._candidate_ids = {c: k for k, c in enumerate(self.candidates)}
+
+    def _scores(self, region, mode, frames):
+        values = self.channels[frames, region]
+        if mode is not None:
+            return aggregate_array(values[:, :2], mode)
+        kind = self.regions[region].get("type", "template")
+        return values[:, 1] if kind == "ocr" else values[:, 0]
+
+    def curves(self, frames, regions, positive):
+        """PR curves for every candidate; group ids index self.candidates."""
+        by_region = {}
+        for c, (i, _) in enumerate(self.candidates):
+            by_region.setdefault(i, []).append(c)
+
+        # frames without cached confidences (NaN) cannot be scored
+        valid = frames < self.channels.shape[0]
+        frames, regions, positive = frames[valid], regions[valid], positive[valid]
+
+        groups, scores, labels = [], [], []
+        for region, cands in by_region.items():
+            sel = regions == region
+            f = frames[sel]
+            for c in cands:
+                s = self._scores(region, self.candidates[c][1], f)
+                ok = ~np.isnan(s)
+                groups.append(np.full(ok.sum(), c, dtype=np.int64))
+                scores.append(s[ok])
+                labels.append(positive[sel][ok])
+
+        if not groups:
+            return pr_curves(np.empty(0, np.int64), np.empty(0), np.empty(0, bool))
+        return pr_curves(np.concatenate(groups), np.concatenate(scores), np.concatenate(labels))
+
+    def tune(self, frames, regions, positive, min_precision=None):
+        """
+        Best setting per region as {region index: result dict} with keys
+        threshold, aggregate, precision, recall, f1, tp, fp, labels and
+        current (the same metrics at the region's present settings).
+        Returns (results, curves).
+        """
+        curves = self.curves(frames, regions, positive)
+        best = best_points(curves, min_precision)
+        objective = curves["f1"] if min_precision is None else curves["recall"]
+
+        # best candidate per region (hybrid regions have one per mode)
+        chosen = {}
+        for c, i in best.items():
+            region = self.candidates[c][0]
+            if region not in chosen or objective[i] > objective[chosen[region][1]]:
+                chosen[region] = (c, i)
+
+        results = {}
+        for region, (c, i) in chosen.items():
+            r = self.regions[region]
+            mode = self.candidates[c][1]
+            current_mode = r.get("aggregate", "mean") if mode is not None else None
+            current_c = self._candidate_ids.get((region, current_mode))
+            now = None if current_c is None else point_at(curves, current_c, r.get("threshold", 0.7))
+            results[region] = {
+                "threshold": cut_threshold(curves, i),
+                "aggregate": mode,
+                "precision": float(curves["precision"][i]),
+                "recall": float(curves["recall"][i]),
+                "f1": float(curves["f1"][i]),
+                "tp": int(curves["tp"][i]),
+                "fp": int(curves["fp"][i]),
+                "labels": int(np.count_nonzero(regions == region)),
+                "current": None if now is None else {
+                    k: float(curves[k][now]) for k in ("precision", "recall", "f1")
+                },
+            }
+        return results, curves
+
+
+def write_thresholds(yaml_path, results, regions):
+    """Write tuned thresholds (and hybrid aggregate modes) into regions.yaml."""
+    for i, res in results.items():
+        # round down so the stored value never excludes the chosen point
+        regions[i]["threshold"] = float(np.floor(res["threshold"] * 1e4) / 1e4)
+        if res["aggregate"] is not None:
+            regions[i]["aggregate"] = res["aggregate"]
+
+    with open(Path(yaml_path), "w") as f:
+        yaml.safe_dump(regions, f, sort_keys=False)
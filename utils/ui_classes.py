@@ -0,0 +1,25 @@
+from pathlib import Path
+
+import yaml
+
+CLASSES_FILE = Path(__file__).resolve().parent.parent / "config" / "ui_classes.yaml"
+
+
+def load_classes(path=CLASSES_FILE):
+    """{class id: class name} from ui_classes.yaml."""
+    with open(path, "r") as f:
+        data = yaml.safe_load(f) or {}
+    return {int(k): str(v) for k, v in data.items()}
+
+
+def class_id(value, classes):
+    """
+    Resolve a region's `class` setting (id or name) to a class id.
+    Returns None when it is missing or unknown.
+    """
+    if value is None:
+        return None
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value if value in classes else None
+    by_name = {name: i for i, name in classes.items()}
+    return by_name.get(str(value))
@@ -1,11 +1,24 @@
+from vision.text_match import TextMatcher
+
+
 class DetectionFusion:
+    def __init__(self):
+        self._matchers = {}  # expected words -> compiled TextMatcher
+
     def validate_ocr(self, ocr_results, expected, threshold):
+        """
+        expected is a TextMatcher, or a list of words to look for (compiled
+        once per distinct list).
+        """
+        matcher = expected
+        if not isinstance(expected, TextMatcher):
+            key = tuple(expected)
+            matcher = self._matchers.get(key)
+            if matcher is None:
+                matcher = self._matchers[key] = TextMatcher(list(key))
         for item in ocr_results:
-            if item["confidence"] < threshold:
-                continue
-            for word in expected:
-                if word in item["text"]:
-                    return True, item
+            if item["confidence"] >= threshold and matcher.matches(item["text"]):
+                return True, item
         return False, None
 
     def fuse(self, img_match, ocr_ok):
@@ -2,16 +2,184 @@ import cv2
 import numpy as np
 
 class TemplateMatcher:
-    def match(self, region_img, template_img, threshold):
+    def match(self, region_img, template_img, threshold, debug=False):
         res = cv2.matchTemplate(
             region_img, template_img, cv2.TM_CCOEFF_NORMED
         )
 
         min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
 
-        return {
+        result = {
             "found": max_val >= threshold,
             "confidence": float(max_val),
             "location": max_loc,
-            "heatmap": res
+        }
+        # The float32 heatmap is as large as the ROI; only keep it for debugging.
+        if debug:
+            result["heatmap"] = res
+        return result
+
+    def match_all(self, region_img, template_img, threshold,
+                  max_results=32, overlap=0.3, debug=False):
+        """
+        Find every occurrence of the template above threshold.
+        matches are sorted by confidence and capped at max_results.
+        """
+        res = cv2.matchTemplate(
+            region_img, template_img, cv2.TM_CCOEFF_NORMED
+        )
+        th, tw = template_img.shape[:2]
+        matches = find_peaks(res, (tw, th), threshold, max_results, overlap)
+
+        result = {
+            "found": bool(matches),
+            "matches": matches,
+        }
+        if debug:
+            result["heatmap"] = res
+        return result
+
+
+def find_peaks(heatmap, size, threshold, max_results=32, overlap=0.3):
+    """
+    Peaks of a matchTemplate heatmap with non-max suppression.
+
+    size is the (width, height) of the template; two peaks whose template
+    boxes overlap by more than `overlap` (IoU) keep only the stronger one.
+    Returns [{"confidence", "location"}] sorted by confidence.
+    """
+    # local maxima above threshold (3x3 neighbourhood)
+    peaks = (heatmap >= threshold) & (heatmap >= cv2.dilate(heatmap, None))
+    ys, xs = np.nonzero(peaks)
+    if ys.size == 0:
+        return []
+
+    scores = heatmap[ys, xs]
+    order = np.argsort(-scores, kind="stable")
+    xs, ys, scores = xs[order], ys[order], scores[order]
+
+    # All boxes share the template size, so IoU only depends on the offsets.
+    tw, th = size
+    area = float(tw * th)
+    keep = []
+    idx = np.arange(scores.size)
+    while idx.size and len(keep) < max_results:
+        i = idx[0]
+        keep.append(i)
+        rest = idx[1:]
+        ix = np.maximum(tw - np.abs(xs[rest] - xs[i]), 0)
+        iy = np.maximum(th - np.abs(ys[rest] - ys[i]), 0)
+        inter = ix * iy
+        iou = inter / (2 * area - inter)
+        idx = rest[iou <= overlap]
+
+    return [
+        {"confidence": float(scores[i]), "location": (int(xs[i]), int(ys[i]))}
+        for i in keep
+    ]
+
+class TemplateBank:
+    """
+    Mutually exclusive template variants classified in one pass.
+
+    All variants are correlated against a single prepared ROI: the ROI is
+    converted and transformed to the frequency domain once, ROI statistics
+    are computed once per template size, and each template spectrum is
+    precomputed per FFT size. A variant then only costs one spectrum
+    multiply and one inverse DFT. Scores are TM_CCOEFF_NORMED, same as
+    cv2.matchTemplate.
+    """
+
+    def __init__(self, templates):
+        """
+        templates: {label: grayscale template}
+        """
+        if not templates:
+            raise ValueError("TemplateBank needs at least one template")
+
+        self.labels = list(templates)
+        self.sizes = {}
+        self._kernels = {}
+        self._norms = {}
+        self._spectra = {}
+        for label, img in templates.items():
+            img = np.asarray(img, dtype=np.float32)
+            zero_mean = img - img.mean()
+            self.sizes[label] = (img.shape[1], img.shape[0])
+            self._kernels[label] = zero_mean
+            self._norms[label] = float(np.sqrt((zero_mean.astype(np.float64) ** 2).sum()))
+
+        # labels grouped by template shape; each group shares ROI statistics
+        self._groups = {}
+        for label, kernel in self._kernels.items():
+            self._groups.setdefault(kernel.shape, []).append(label)
+
+    @property
+    def max_size(self):
+        """(width, height) a ROI must have to fit every template."""
+        return (max(w for w, _ in self.sizes.values()),
+                max(h for _, h in self.sizes.values()))
+
+    def _spectrum(self, label, fft_shape):
+        key = (label, fft_shape)
+        spectrum = self._spectra.get(key)
+        if spectrum is None:
+            kernel = self._kernels[label]
+            padded = np.zeros(fft_shape, dtype=np.float32)
+            padded[:kernel.shape[0], :kernel.shape[1]] = kernel
+            spectrum = cv2.dft(padded)
+            self._spectra[key] = spectrum
+        return spectrum
+
+    def classify(self, roi_gray):
+        """
+        Returns:
+            {"label", "confidence", "location", "size", "scores": {label: conf}}
+        or None if the ROI is smaller than the largest template.
+        """
+        roi_h, roi_w = roi_gray.shape[:2]
+        max_w, max_h = self.max_size
+        if roi_h < max_h or roi_w < max_w:
+            return None
+
+        # shared ROI preparation
+        fft_shape = (cv2.getOptimalDFTSize(roi_h), cv2.getOptimalDFTSize(roi_w))
+        padded = np.zeros(fft_shape, dtype=np.float32)
+        padded[:roi_h, :roi_w] = roi_gray
+        roi_spectrum = cv2.dft(padded)
+        roi_f = padded[:roi_h, :roi_w]
+
+        scores = {}
+        locations = {}
+        for (th, tw), labels in self._groups.items():
+            out_h, out_w = roi_h - th + 1, roi_w - tw + 1
+
+            # inverse local ROI energy around its mean, shared by the whole group
+            mean = cv2.boxFilter(roi_f, cv2.CV_32F, (tw, th), anchor=(0, 0),
+                                 borderType=cv2.BORDER_CONSTANT)[:out_h, :out_w]
+            sq_mean = cv2.sqrBoxFilter(roi_f, cv2.CV_32F, (tw, th), anchor=(0, 0),
+                                       borderType=cv2.BORDER_CONSTANT)[:out_h, :out_w]
+            energy = np.sqrt(np.maximum(sq_mean - mean * mean, 0.0) * (th * tw))
+            inv_energy = np.zeros((out_h, out_w), dtype=np.float32)
+            np.divide(1.0, energy, out=inv_energy, where=energy > 1e-3, casting="unsafe")
+
+            for label in labels:
+                product = cv2.mulSpectrums(roi_spectrum, self._spectrum(label, fft_shape),
+                                           0, conjB=True)
+                corr = cv2.idft(product, flags=cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE)
+                norm = self._norms[label]
+                ncc = cv2.multiply(corr[:out_h, :out_w], inv_energy,
+                                   scale=1.0 / norm if norm else 0.0)
+
+                _, max_val, _, max_loc = cv2.minMaxLoc(ncc)
+                scores[label] = float(min(max_val, 1.0))
+                locations[label] = max_loc
+
+        label = max(self.labels, key=scores.__getitem__)
+        return {
+            "label": label,
+            "confidence": scores[label],
+            "location": locations[label],
+            "size": self.sizes[label],
+            "scores": scores,
         }
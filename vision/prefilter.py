@@ -0,0 +1,243 @@
+import time
+
+import cv2
+import numpy as np
+
+# Stages run in this order unless configured otherwise. "histogram" is
+# not a default: it is not brightness invariant (see PrefilterCascade).
+DEFAULT_STAGES = ("stats", "coarse")
+STAGES = ("histogram", "stats", "coarse")
+# Per-region overrides accepted in regions.yaml (`prefilter: {...}`)
+OPTION_KEYS = ("stages", "hist_min_overlap", "mean_tolerance", "std_ratio", "coarse_threshold")
+
+
+class TemplateSignature:
+    """
+    Cheap statistics of a template, computed once and reused every frame.
+    """
+
+    def __init__(self, bgr, gray, bins, factor):
+        self.size = (gray.shape[1], gray.shape[0])
+        self.factor = factor
+
+        # color histogram (pixel counts per quantized BGR bin)
+        self.hist = color_histogram(bgr, bins)
+
+        # mean / std of the downsampled template
+        self.small = downsample(gray, factor)
+        self.mean = float(self.small.mean())
+        self.std = float(self.small.std())
+
+
+class CascadeStats:
+    def __init__(self, stages):
+        stages = tuple(dict.fromkeys((*stages, *STAGES)))
+        self.evaluated = {s: 0 for s in stages}
+        self.rejected = {s: 0 for s in stages}
+        self.skipped = {s: 0 for s in stages}  # could not be evaluated (template too small)
+        self.stage_time = {s: 0.0 for s in stages}
+        self.passed = 0
+        self.full_matches = 0
+        self.full_time = 0.0
+
+    def record_full(self, seconds):
+        """Time of one full matchTemplate on an ROI that passed the cascade."""
+        self.full_matches += 1
+        self.full_time += seconds
+
+    def summary(self):
+        rejected = sum(self.rejected.values())
+        checked = rejected + self.passed
+        cascade_time = sum(self.stage_time.values())
+        avg_full = self.full_time / self.full_matches if self.full_matches else 0.0
+        return {
+            "checked": checked,
+            "passed": self.passed,
+            "rejected": dict(self.rejected),
+            "skipped": dict(self.skipped),
+            "reject_rate": {
+                s: self.rejected[s] / self.evaluated[s] if self.evaluated[s] else 0.0
+                for s in self.evaluated
+            },
+            "cascade_time": cascade_time,
+            "avg_full_time": avg_full,
+            # full matches skipped, minus what the cheap checks cost
+            "time_saved": rejected * avg_full - cascade_time,
+        }
+
+    def report(self):
+        s = self.summary()
+        lines = [f"Prefilter: {s['checked']} ROIs, {s['passed']} passed to full match"]
+        for stage, n in s["rejected"].items():
+            if not self.evaluated[stage] and not self.skipped[stage]:
+                continue
+            lines.append(
+                f"  {stage:<10} rejected {n:>6} ({s['reject_rate'][stage] * 100:5.1f}% of evaluated), "
+                f"{self.stage_time[stage] * 1000:.1f} ms"
+                + (f", skipped {self.skipped[stage]} (template too small)" if self.skipped[stage] else "")
+            )
+        lines.append(
+            f"  avg full match {s['avg_full_time'] * 1000:.2f} ms, "
+            f"estimated time saved {s['time_saved'] * 1000:.1f} ms"
+        )
+        return "\n".join(lines)
+
+
+class PrefilterCascade:
+    """
+    Cheap checks that reject an ROI before the full TM_CCOEFF_NORMED match.
+
+    The stages are heuristics, not lossless bounds on the full score:
+      stats     - some template-sized window must have a similar std
+                  (within std_ratio); with mean_tolerance set, also a
+                  similar mean
+      coarse    - a heavily downsampled correlation must come close
+      histogram - the ROI must contain (most of) the template's colors
+    TM_CCOEFF_NORMED ignores brightness offsets, and so do the default
+    stages (stats without a mean tolerance, coarse). The histogram stage and
+    the mean tolerance do not: a true match on a brighter screen fails
+    them. Enable them per region (`prefilter: {stages: [...],
+    mean_tolerance: ...}`) only where brightness is stable.
+    Only ROIs that pass every stage go on to the full matcher. A stage that
+    cannot judge an ROI (e.g. the coarse stage on templates smaller than
+    4 * factor px) passes it and is counted as skipped.
+    """
+
+    def __init__(
+        self,
+        stages=DEFAULT_STAGES,
+        hist_bins=8,
+        hist_min_overlap=0.8,
+        factor=4,
+        mean_tolerance=None,
+        std_ratio=2.0,
+        coarse_threshold=0.5,
+    ):
+        self.stages = tuple(stages)
+        self.hist_bins = hist_bins
+        self.hist_min_overlap = hist_min_overlap
+        self.factor = factor
+        self.mean_tolerance = mean_tolerance
+        self.std_ratio = std_ratio
+        self.coarse_threshold = coarse_threshold
+
+        self.stats = CascadeStats(self.stages)
+        self._signatures = {}
+
+    def signature(self, tmpl):
+        """
+        Signature for a vision.template_cache.Template, cached by path/mtime.
+        """
+        cached = self._signatures.get(tmpl.path)
+        if cached is not None and cached[0] == tmpl.mtime:
+            return cached[1]
+
+        sig = TemplateSignature(tmpl.bgr, tmpl.gray, self.hist_bins, self.factor)
+        self._signatures[tmpl.path] = (tmpl.mtime, sig)
+        return sig
+
+    def check(self, tmpl, roi_bgr, roi_gray, options=None):
+        """
+        Returns (passed, rejecting_stage_or_None). `options` are a region's
+        overrides of OPTION_KEYS (see validate_options).
+        """
+        sig = self.signature(tmpl)
+        options = options or {}
+        for stage in options.get("stages", self.stages):
+            t0 = time.perf_counter()
+            ok = getattr(self, f"_check_{stage}")(sig, roi_bgr, roi_gray, options)
+            self.stats.stage_time[stage] += time.perf_counter() - t0
+            if ok is None:
+                self.stats.skipped[stage] += 1
+                continue
+            self.stats.evaluated[stage] += 1
+            if not ok:
+                self.stats.rejected[stage] += 1
+                return False, stage
+
+        self.stats.passed += 1
+        return True, None
+
+    def reset_stats(self):
+        self.stats = CascadeStats(self.stages)
+
+    # ---------------- Stages ----------------
+
+    # Each returns True (pass), False (reject) or None (cannot judge).
+
+    def _check_histogram(self, sig, roi_bgr, roi_gray, options):
+        roi_hist = color_histogram(roi_bgr, self.hist_bins)
+        total = sig.hist.sum()
+        if total == 0:
+            return None
+        overlap = np.minimum(roi_hist, sig.hist).sum() / total
+        return overlap >= options.get("hist_min_overlap", self.hist_min_overlap)
+
+    def _check_stats(self, sig, roi_bgr, roi_gray, options):
+        small = downsample(roi_gray, self.factor)
+        tw, th = sig.small.shape[1], sig.small.shape[0]
+        if small.shape[0] < th or small.shape[1] < tw:
+            return None
+
+        out_h, out_w = small.shape[0] - th + 1, small.shape[1] - tw + 1
+        small = small.astype(np.float32)
+        mean = cv2.boxFilter(small, cv2.CV_32F, (tw, th), anchor=(0, 0),
+                             borderType=cv2.BORDER_CONSTANT)[:out_h, :out_w]
+        sq_mean = cv2.sqrBoxFilter(small, cv2.CV_32F, (tw, th), anchor=(0, 0),
+                                   borderType=cv2.BORDER_CONSTANT)[:out_h, :out_w]
+        std = np.sqrt(np.maximum(sq_mean - mean * mean, 0.0))
+
+        ratio = options.get("std_ratio", self.std_ratio)
+        lo, hi = sig.std / ratio, sig.std * ratio + 1.0
+        close = (std >= lo) & (std <= hi)
+        tolerance = options.get("mean_tolerance", self.mean_tolerance)
+        if tolerance is not None:
+            close &= np.abs(mean - sig.mean) <= tolerance
+        return bool(np.any(close))
+
+    def _check_coarse(self, sig, roi_bgr, roi_gray, options):
+        # too small to say anything useful at this scale
+        if min(sig.small.shape) < 4:
+            return None
+
+        small = downsample(roi_gray, self.factor)
+        if small.shape[0] < sig.small.shape[0] or small.shape[1] < sig.small.shape[1]:
+            return None
+
+        res = cv2.matchTemplate(small, sig.small, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, _ = cv2.minMaxLoc(res)
+        return max_val >= options.get("coarse_threshold", self.coarse_threshold)
+
+
+def validate_options(cfg):
+    """
+    A region's `prefilter` value as check() options: {} for True, the dict
+    for a dict of OPTION_KEYS. Raises ValueError for anything else.
+    """
+    if cfg is True:
+        return {}
+    if not isinstance(cfg, dict):
+        raise ValueError(f"prefilter must be true or a mapping, got {cfg!r}")
+    unknown = set(cfg) - set(OPTION_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown prefilter options {sorted(unknown)}")
+    stages = cfg.get("stages")
+    if stages is not None and (not isinstance(stages, list) or not set(stages) <= set(STAGES)):
+        raise ValueError(f"prefilter stages must be a list of {STAGES}, got {stages!r}")
+    return dict(cfg)
+
+
+# -------------------------------
+# Helpers
+# -------------------------------
+def color_histogram(bgr, bins):
+    hist = cv2.calcHist([bgr], [0, 1, 2], None, [bins] * 3, [0, 256] * 3)
+    return hist.ravel()
+
+
+def downsample(gray, factor):
+    if factor <= 1:
+        return gray
+    h, w = gray.shape[:2]
+    size = (max(w // factor, 1), max(h // factor, 1))
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
@@ -0,0 +1,308 @@
+"""
+OCR preprocessing.
+
+EasyOCR's detection time grows with the pixel count, and native 4K ROIs are
+mostly background. Per region, preprocess() crops the ROI to its text band,
+scales it so text lands at a target height, converts it to gray or a
+binarized image and pads it. BoxMap maps the boxes EasyOCR reports back
+to ROI coordinates.
+
+Parameters come from the region's `ocr_preprocess` key in regions.yaml:
+either a dict with DEFAULT_PARAMS' keys or "auto", which uses what tools.calibrate_ocr
+measured on a recorded run (<run_dir>/ocr_params.yaml). Calibration tries
+candidate settings cheapest-first and keeps the fastest one whose OCR text
+still agrees with the native ROI's.
+"""
+import os
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+
+from utils.geometry import rect_to_list
+from utils.hashing import OCR_PARAMS_NAME, stable_hash
+
+PARAMS_NAME = OCR_PARAMS_NAME
+MODES = ("color", "gray", "binary")
+DEFAULT_PARAMS = {
+    "band": None,    # [x, y, w, h] of the text within the ROI
+    "scale": 1.0,    # resize factor (<= 1)
+    "mode": "color",
+    "pad": 0,        # px of replicated border
+}
+TEXT_HEIGHTS = (16, 20, 24, 32)  # calibration targets, px
+BAND_MARGIN = 0.5                # of the median text height, around the learned band
+PAD = 8
+STAT_INTERVAL = 1.0              # seconds between checks of ocr_params.yaml for edits
+
+
+def normalize_params(cfg):
+    """DEFAULT_PARAMS overridden by cfg; raises ValueError if malformed."""
+    cfg = cfg or {}
+    unknown = set(cfg) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown ocr_preprocess params {sorted(unknown)}")
+    params = dict(DEFAULT_PARAMS, **cfg)
+    if params["mode"] not in MODES:
+        raise ValueError(f"ocr_preprocess mode must be one of {MODES}, got {params['mode']!r}")
+    scale, pad = params["scale"], params["pad"]
+    if isinstance(scale, bool) or not isinstance(scale, (int, float)) or scale <= 0:
+        raise ValueError(f"ocr_preprocess scale must be a positive number, got {scale!r}")
+    if isinstance(pad, bool) or not isinstance(pad, int) or pad < 0:
+        raise ValueError(f"ocr_preprocess pad must be a non-negative integer, got {pad!r}")
+    params["scale"] = min(float(scale), 1.0)
+    if params["band"] is not None:
+        band = rect_to_list(params["band"])
+        if band is None:
+            raise ValueError(f"ocr_preprocess band must be [x, y, w, h], got {params['band']!r}")
+        params["band"] = band
+    return params
+
+
+def validate_preprocess(cfg):
+    """
+    A region's `ocr_preprocess` value as params: normalized for a dict,
+    None for "auto" (resolved per run dir) or unset. Raises ValueError for
+    anything else.
+    """
+    if cfg is None or cfg == "auto":
+        return None
+    if not isinstance(cfg, dict):
+        raise ValueError(f"ocr_preprocess must be a mapping or 'auto', got {cfg!r}")
+    return normalize_params(cfg)
+
+
+def normalize_text(results):
+    """Readtext results -> one comparable string."""
+    return " ".join(" ".join(text.lower().split()) for _, text, _ in results).strip()
+
+
+# -------------------------------
+# Pipeline
+# -------------------------------
+class BoxMap:
+    """Maps points of the preprocessed image back into the ROI."""
+
+    def __init__(self, x0=0, y0=0, scale=1.0, pad=0):
+        self.x0, self.y0 = x0, y0
+        self.scale = scale
+        self.pad = pad
+
+    def to_roi(self, box):
+        return [[(x - self.pad) / self.scale + self.x0, (y - self.pad) / self.scale + self.y0]
+                for x, y in box]
+
+    def results_to_roi(self, results):
+        return [(self.to_roi(box), text, conf) for box, text, conf in results]
+
+
+def preprocess(roi, params):
+    """Apply params to a BGR (or gray) ROI; returns (image, BoxMap)."""
+    x0 = y0 = 0
+    band = params.get("band")
+    if band is not None:
+        x, y, w, h = band
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, roi.shape[1]), min(y + h, roi.shape[0])
+        if x1 > x0 and y1 > y0:
+            roi = roi[y0:y1, x0:x1]
+        else:
+            x0 = y0 = 0
+
+    scale = params.get("scale", 1.0)
+    if scale < 1.0:
+        roi = cv2.resize(roi, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    mode = params.get("mode", "color")
+    if mode != "color" and roi.ndim == 3:
+        roi = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+    if mode == "binary":
+        _, roi = cv2.threshold(roi, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        if roi.mean() < 128:
+            roi = cv2.bitwise_not(roi)  # dark text on a light background
+
+    pad = params.get("pad", 0)
+    if pad:
+        roi = cv2.copyMakeBorder(roi, pad, pad, pad, pad, cv2.BORDER_REPLICATE)
+    return roi, BoxMap(x0, y0, scale, pad)
+
+
+# -------------------------------
+# Runtime
+# -------------------------------
+class OCRStats:
+    def __init__(self):
+        self.regions = {}  # name -> [calls, seconds, preprocessed]
+
+    def record(self, name, seconds, preprocessed):
+        entry = self.regions.setdefault(name, [0, 0.0, preprocessed])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = preprocessed
+
+    def report(self):
+        lines = ["OCR:"]
+        for name, (calls, seconds, preprocessed) in self.regions.items():
+            lines.append(f"  {name:<20} {calls:>6} calls, avg {seconds / calls * 1000:.1f} ms"
+                         + (" (preprocessed)" if preprocessed else ""))
+        return "\n".join(lines)
+
+
+class OCRPreprocessor:
+    """
+    Resolves each region's parameters (cached per run dir, reloaded when
+    ocr_params.yaml changes) and runs readtext on the preprocessed ROI.
+    Calibrated params are normalized once per file version; a malformed
+    entry is reported once and its region OCRs the native ROI.
+    """
+
+    def __init__(self):
+        self.stats = OCRStats()
+        self._files = {}  # params file -> [checked at, mtime_ns, {name: (rect hash, params)}]
+
+    def _calibrated(self, run_dir):
+        path = Path(run_dir) / PARAMS_NAME
+        cached = self._files.get(path)
+        now = time.monotonic()
+        if cached is not None and now - cached[0] < STAT_INTERVAL:
+            return cached[2]
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if cached is None or cached[1] != mtime:
+            cached = [now, mtime, self._load(path) if mtime is not None else {}]
+            self._files[path] = cached
+        cached[0] = now
+        return cached[2]
+
+    @staticmethod
+    def _load(path):
+        """region name -> (rect hash, params or None for the native ROI)."""
+        try:
+            with open(path, "r") as f:
+                data = yaml.safe_load(f) or {}
+        except (OSError, yaml.YAMLError) as e:
+            print(f"⚠️ Ignoring {path}: {e}")
+            return {}
+        if not isinstance(data, dict):
+            print(f"⚠️ Ignoring {path}: expected a mapping of region names")
+            return {}
+
+        entries = {}
+        for name, entry in data.items():
+            try:
+                params = entry.get("params")
+                entries[name] = (entry.get("rect"), normalize_params(params) if params is not None else None)
+            except (AttributeError, TypeError, ValueError) as e:
+                print(f"⚠️ Ignoring calibrated OCR params for {name} in {path}: {e}")
+        return entries
+
+    def params_for(self, region, run_dir):
+        """Parameters for region, or None to OCR the native ROI."""
+        cfg = getattr(region, "ocr_preprocess", None)
+        if isinstance(cfg, dict):
+            # normalized once by main.Region; other region objects carry the raw dict
+            params = getattr(region, "ocr_params", None)
+            return params if params is not None else normalize_params(cfg)
+        if cfg == "auto":
+            entry = self._calibrated(run_dir).get(region.name)
+            # calibrated for a different rect: the band no longer applies
+            if entry and entry[0] == rect_hash(region.rect):
+                return entry[1]
+        return None
+
+    def readtext(self, reader, roi, region, run_dir):
+        """reader.readtext on the region's preprocessed ROI, boxes in ROI coordinates."""
+        params = self.params_for(region, run_dir)
+        t0 = time.perf_counter()
+        if params is None:
+            results = reader.readtext(roi)
+        else:
+            img, box_map = preprocess(roi, params)
+            results = box_map.results_to_roi(reader.readtext(img))
+        self.stats.record(region.name, time.perf_counter() - t0, params is not None)
+        return results
+
+
+def rect_hash(rect):
+    return stable_hash(rect_to_list(rect))
+
+
+# -------------------------------
+# Calibration
+# -------------------------------
+def learn_band(results_per_roi, roi_shape):
+    """
+    Union of every detected text box, grown by BAND_MARGIN text heights and
+    clipped to the ROI; returns (band, median text height) or (None, None).
+    """
+    boxes = [np.asarray(box, dtype=np.float32) for results in results_per_roi for box, _, _ in results]
+    if not boxes:
+        return None, None
+    pts = np.concatenate(boxes)
+    heights = [b[:, 1].max() - b[:, 1].min() for b in boxes]
+    text_h = max(float(np.median(heights)), 1.0)
+    margin = max(int(text_h * BAND_MARGIN), 2)
+
+    h, w = roi_shape[:2]
+    x0 = max(int(pts[:, 0].min()) - margin, 0)
+    y0 = max(int(pts[:, 1].min()) - margin, 0)
+    x1 = min(int(np.ceil(pts[:, 0].max())) + margin, w)
+    y1 = min(int(np.ceil(pts[:, 1].max())) + margin, h)
+    return [x0, y0, x1 - x0, y1 - y0], text_h
+
+
+def _timed_texts(reader, rois, params, expected=None, min_agreement=1.0):
+    """
+    OCR every ROI; returns (texts, mean seconds, agreement with expected).
+    Stops early once min_agreement can no longer be reached.
+    """
+    texts, seconds, misses = [], 0.0, 0
+    allowed = len(rois) * (1.0 - min_agreement)
+    for i, roi in enumerate(rois):
+        t0 = time.perf_counter()
+        img = roi if params is None else preprocess(roi, params)[0]
+        results = reader.readtext(img)
+        seconds += time.perf_counter() - t0
+        texts.append((results, normalize_text(results)))
+        if expected is not None and texts[-1][1] != expected[i]:
+            misses += 1
+            if misses > allowed:
+                return texts, seconds / len(texts), 0.0
+    agreement = 1.0 - misses / len(rois) if expected is not None else 1.0
+    return texts, seconds / len(rois), agreement
+
+
+def calibrate(reader, rois, text_heights=TEXT_HEIGHTS, min_agreement=1.0):
+    """
+    Cheapest params for OCR on rois that keep the native text on at least
+    min_agreement of them. Returns a result dict, with params None when no
+    text was found to learn from.
+    """
+    native, native_time, _ = _timed_texts(reader, rois, None)
+    expected = [text for _, text in native]
+    band, text_h = learn_band([results for results, _ in native], rois[0].shape)
+    result = {"native_ms": round(native_time * 1000, 2), "params": None,
+              "ms": round(native_time * 1000, 2), "agreement": 1.0, "text_height": None}
+    if band is None:
+        return result
+
+    scales = sorted({min(1.0, round(h / text_h, 3)) for h in text_heights} | {1.0})
+    candidates = [
+        {"band": band, "scale": scale, "mode": mode, "pad": PAD}
+        for scale in scales for mode in ("binary", "gray", "color")
+    ]  # cheapest (smallest) first
+
+    best, best_time = None, native_time
+    for params in candidates:
+        _, seconds, agreement = _timed_texts(reader, rois, params, expected, min_agreement)
+        if agreement >= min_agreement and seconds < best_time:
+            best, best_time = (params, agreement), seconds
+
+    if best is not None:
+        result.update(params=best[0], ms=round(best_time * 1000, 2), agreement=best[1],
+                      text_height=round(text_h * best[0]["scale"], 1))
+    return result
@@ -0,0 +1,88 @@
+import threading
+from pathlib import Path
+
+import cv2
+
+from vision.matcher import TemplateBank
+
+
+class Template:
+    def __init__(self, path, bgr, mtime):
+        self.path = path
+        self.bgr = bgr
+        self.gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+        self.mtime = mtime
+
+    @property
+    def size(self):
+        """(width, height) of the template."""
+        return (self.bgr.shape[1], self.bgr.shape[0])
+
+
+class TemplateCache:
+    """
+    Decoded templates keyed by resolved path.
+
+    Each template is decoded (and converted to gray) once and reused until
+    its file changes on disk. Safe to share between threads and runner
+    instances.
+    """
+
+    def __init__(self):
+        self._templates = {}
+        self._banks = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """
+        Return the Template for path, or None if it cannot be read.
+        """
+        path = Path(path).resolve()
+        try:
+            mtime = path.stat().st_mtime
+        except OSError:
+            return None
+
+        with self._lock:
+            cached = self._templates.get(path)
+            if cached is not None and cached.mtime == mtime:
+                return cached
+
+        img = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        if img is None:
+            return None
+
+        tmpl = Template(path, img, mtime)
+        with self._lock:
+            self._templates[path] = tmpl
+        return tmpl
+
+    def bank(self, paths):
+        """
+        Return a TemplateBank for {label: path}, or None if any template
+        cannot be read. The bank (and its precomputed spectra) is reused
+        until one of its files changes.
+        """
+        loaded = {label: self.get(p) for label, p in paths.items()}
+        if any(t is None for t in loaded.values()):
+            return None
+
+        key = tuple((label, t.path) for label, t in loaded.items())
+        mtimes = tuple(t.mtime for t in loaded.values())
+        with self._lock:
+            cached = self._banks.get(key)
+            if cached is not None and cached[0] == mtimes:
+                return cached[1]
+
+        bank = TemplateBank({label: t.gray for label, t in loaded.items()})
+        with self._lock:
+            self._banks[key] = (mtimes, bank)
+        return bank
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+            self._banks.clear()
+
+    def __len__(self):
+        return len(self._templates)
@@ -0,0 +1,193 @@
+"""
+Expected-text matching for OCR results.
+
+A region's expected text (one phrase or a list) is compiled once, when the
+region is loaded, into a TextMatcher:
+  * contains - an Aho-Corasick automaton over every phrase, so a text is
+               scanned once however many phrases there are;
+  * exact    - a set lookup of the normalized text;
+  * regex    - all patterns joined into one compiled alternation.
+With max_edits > 0, contains / exact also accept phrases within that many
+edits (Levenshtein). Candidates come from the same automaton: a phrase cut
+into max_edits + 1 pieces keeps at least one piece intact under
+max_edits edits, so only phrases with a piece in the text are verified,
+with a distance computation that gives up past max_edits. A phrase never
+allows more than len(phrase) - 1 edits, which would match any text.
+"""
+import re
+
+MATCH_MODES = ("contains", "exact", "regex")
+
+
+def normalize(text):
+    return " ".join(str(text).lower().split())
+
+
+# -------------------------------
+# Aho-Corasick
+# -------------------------------
+class AhoCorasick:
+    """Finds every occurrence of a set of keys in one pass over the text."""
+
+    def __init__(self, keys):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]  # node -> [key index]
+        self.lengths = [len(k) for k in keys]
+        for i, key in enumerate(keys):
+            node = 0
+            for ch in key:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = nxt
+            self.out[node].append(i)
+
+        # breadth-first failure links
+        queue = list(self.goto[0].values())  # depth 1 fails to the root
+        for node in queue:
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                if node:
+                    self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def iter(self, text):
+        """Yield (key index, start) for every occurrence."""
+        node = 0
+        for pos, ch in enumerate(text):
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            for i in self.out[node]:
+                yield i, pos - self.lengths[i] + 1
+
+    def first(self, text):
+        """Index of the first key found, or None."""
+        for i, _ in self.iter(text):
+            return i
+        return None
+
+
+# -------------------------------
+# Bounded edit distance
+# -------------------------------
+def bounded_levenshtein(a, b, k, substring=False):
+    """
+    Levenshtein distance of a and b if it is <= k, else k + 1. With
+    substring=True, the best distance of a to any substring of b.
+    """
+    if not substring and abs(len(a) - len(b)) > k:
+        return k + 1
+    prev = [0] * (len(b) + 1) if substring else list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+        if min(cur) > k:
+            return k + 1
+        prev = cur
+    best = min(prev) if substring else prev[-1]
+    return best if best <= k else k + 1
+
+
+def _pieces(phrase, k):
+    """phrase cut into k + 1 near-equal pieces, with their offsets."""
+    n = k + 1
+    bounds = [round(i * len(phrase) / n) for i in range(n + 1)]
+    return [(phrase[bounds[i]:bounds[i + 1]], bounds[i]) for i in range(n) if bounds[i + 1] > bounds[i]]
+
+
+# -------------------------------
+# Matcher
+# -------------------------------
+class TextMatcher:
+    def __init__(self, expected, mode="contains", max_edits=0):
+        if mode not in MATCH_MODES:
+            raise ValueError(f"OCR match mode must be one of {MATCH_MODES}, got {mode!r}")
+        phrases = [expected] if isinstance(expected, str) else list(expected)
+        self.mode = mode
+        self.max_edits = int(max_edits) if mode != "regex" else 0
+
+        if mode == "regex":
+            self.phrases = [str(p) for p in phrases if str(p)]
+            self.regex = re.compile("|".join(f"(?:{p})" for p in self.phrases), re.IGNORECASE)
+            return
+
+        self.phrases = sorted({normalize(p) for p in phrases} - {""})
+        self.exact = set(self.phrases)
+        self.automaton = AhoCorasick(self.phrases) if mode == "contains" else None
+
+        # fuzzy: automaton over the pieces of every phrase
+        self.pieces = None
+        if self.max_edits:
+            owners, keys = [], []
+            self.edits = [min(self.max_edits, len(p) - 1) for p in self.phrases]
+            for pi, phrase in enumerate(self.phrases):
+                for piece, offset in _pieces(phrase, self.edits[pi]):
+                    keys.append(piece)
+                    owners.append((pi, offset))
+            self.pieces = AhoCorasick(keys)
+            self.piece_owners = owners
+
+    @classmethod
+    def from_config(cls, expected, mode="contains", max_edits=0):
+        """A matcher, or None when there is no expected text (any text counts)."""
+        if not expected or (not isinstance(expected, str) and not any(expected)):
+            return None
+        return cls(expected, mode or "contains", max_edits or 0)
+
+    def match(self, text):
+        """The phrase (or pattern) text matches, or None."""
+        if self.mode == "regex":
+            m = self.regex.search(str(text))
+            return m.group(0) if m else None
+
+        text = normalize(text)
+        if self.mode == "exact":
+            if text in self.exact:
+                return text
+        else:
+            i = self.automaton.first(text)
+            if i is not None:
+                return self.phrases[i]
+        return self._fuzzy(text) if self.pieces is not None else None
+
+    def _fuzzy(self, text):
+        tried = set()
+        for key, start in self.pieces.iter(text):
+            pi, offset = self.piece_owners[key]
+            phrase, k = self.phrases[pi], self.edits[pi]
+            if self.mode == "exact":
+                candidate, target = pi, text
+            else:
+                # an occurrence would start within k of start - offset
+                at = start - offset
+                candidate, target = (pi, at), text[max(at - k, 0):at + len(phrase) + k]
+            if candidate in tried:
+                continue
+            tried.add(candidate)
+            if bounded_levenshtein(phrase, target, k, substring=self.mode == "contains") <= k:
+                return phrase
+        return None
+
+    def matches(self, text):
+        return self.match(text) is not None
+
+    def confidence(self, results):
+        """
+        Best confidence among readtext results whose text matches. A phrase
+        split over several results is also looked for in their joined text,
+        at the lowest confidence of the parts.
+        """
+        best = max((conf for _, text, conf in results if self.matches(text)), default=0.0)
+        if not best and len(results) > 1 and self.matches(" ".join(text for _, text, _ in results)):
+            best = min(conf for _, _, conf in results)
+        return float(best)